@@ -1,44 +1,579 @@
 # --- Imports ---
-import os
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+import logging
+import json
+import math
+import time
+import asyncio
+import datetime
+from pathlib import Path
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
-# --- MODIFIED IMPORT ---
-from ...processing_pipeline.a_structuring import structure_document_by_page
-from ...processing_pipeline.b_extraction import extract_data_with_llm
-from ...processing_pipeline.c_validation import validate_and_enrich_data
-from ...utils.file_handler import save_temp_file
-from ...database.database import get_db
+from ...utils.file_handler import (
+    receive_uploads, is_zip_upload, save_zip_upload, UploadTooLargeError, IMAGE_EXTENSIONS, remove_temp_file,
+    release_temp_file,
+)
+from ...utils import job_queue
+from ...utils import result_cache
+from ...utils import exports
+from ...utils.llm_gateway import LLMUnavailableError
+from ...processing_pipeline.b_templates import template_stats
+from ...database.database import get_db, pool_status, SessionLocal
 from ...database import crud
-from ...core.models import StatementData
+from ...core.config import settings
+from ...core.models import (
+    JobStatus, StatementData, StatementRecord, TransactionRecord, StatementPage, TransactionPage, TransactionFilters,
+    TransactionSearchHit, TransactionSearchPage, ReextractRequest, PageArtifactRecord, ChunkArtifactRecord,
+    StatementArtifacts, StatementAggregates,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/parse")
-async def parse_statement(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    temp_file_path = save_temp_file(file)
-    
+# Sent with HTTP 503 responses so clients know when to retry a rejected upload.
+RETRY_AFTER_SECONDS = "10"
+
+
+def _job_to_status(db_job) -> JobStatus:
+    return JobStatus(
+        job_id=db_job.id,
+        filename=db_job.filename,
+        status=db_job.status,
+        stage=db_job.stage,
+        progress=db_job.progress,
+        error=db_job.error,
+        statement_id=db_job.statement_id,
+        created_at=db_job.created_at,
+        updated_at=db_job.updated_at,
+    )
+
+
+def _queue_full_error(e: Exception) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+
+def _llm_unavailable_error(e: LLMUnavailableError) -> HTTPException:
+    # Pass on the provider's Retry-After when it gave one.
+    retry_after = str(math.ceil(e.retry_after)) if e.retry_after else RETRY_AFTER_SECONDS
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": retry_after})
+
+
+# Uploads are read from the request body by receive_uploads() as it arrives,
+# instead of letting FastAPI spool it first, so the upload endpoints document
+# their multipart body for OpenAPI themselves.
+def _upload_body(field: str, description: str, many: bool = False) -> dict:
+    """The OpenAPI request body of an endpoint that takes one or many files in 'field'."""
+    schema = {"type": "string", "format": "binary"}
+    if many:
+        schema = {"type": "array", "items": schema}
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object", "required": [field], "properties": {field: {**schema, "description": description}},
+    }}}}}
+
+
+async def _receive_uploads(request: Request, field: str, max_files: int = 1) -> list:
+    """Streams the files of 'field' to the temp directory, or raises HTTP 400/413/422."""
     try:
-        # --- MODIFIED FUNCTION CALL ---
-        page_texts = structure_document_by_page(temp_file_path)
-        
-        extracted_data_dict = extract_data_with_llm(page_texts)
-        
-        pydantic_data = StatementData(**extracted_data_dict)
-        crud.save_statement_data(db=db, data=pydantic_data, filename=file.filename)
-        
-        final_data_for_frontend = validate_and_enrich_data(extracted_data_dict)
-        
-        return final_data_for_frontend
+        uploads = await receive_uploads(request, max_bytes=settings.UPLOAD_MAX_BYTES, max_files=max_files)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    remove_temp_file([upload.path for upload in uploads if upload.field != field])
+    uploads = [upload for upload in uploads if upload.field == field]
+    if not uploads:
+        raise HTTPException(status_code=422, detail=f"The request has no '{field}' file.")
+    return uploads
+
+
+async def _run_or_queue(db: Session, file_path: str | list[str], filename: str, file_hash: str, background: bool):
+    """Runs the pipeline for saved upload(s), either as a background job or awaiting the result."""
+    # --- Job Mode ---
+    # Queue the document and return straight away. The client polls
+    # /jobs/{job_id} for progress and fetches /jobs/{job_id}/result at the end.
+    if background:
+        await job_queue.wait_for_startup()
+        db_job = await asyncio.to_thread(crud.create_job, db, filename=filename)
+        try:
+            job_queue.submit_job(db_job.id, file_path, filename, file_hash=file_hash)
+        except job_queue.QueueFullError as e:
+            await asyncio.to_thread(crud.update_job, db, db_job.id, status="failed", error=str(e))
+            remove_temp_file(file_path)
+            raise _queue_full_error(e)
+        return JSONResponse(status_code=202, content=_job_to_status(db_job).model_dump(mode="json"))
+
+    # --- Blocking Mode ---
+    # The pipeline runs in a worker process; awaiting it keeps the event loop
+    # free to serve other requests in the meantime.
+    try:
+        return await job_queue.run_pipeline_in_pool(file_path, filename, file_hash=file_hash)
+
+    except job_queue.QueueFullError as e:
+        remove_temp_file(file_path)
+        raise _queue_full_error(e)
+
+    except LLMUnavailableError as e:
+        logger.warning("The LLM is unavailable.", extra={"error": str(e)})
+        raise _llm_unavailable_error(e)
 
     except Exception as e:
-        print(f"An error occurred during processing: {e}")
+        logger.exception("An error occurred during processing.")
         raise HTTPException(
             status_code=500,
             detail=f"An internal error occurred during document processing: {e}"
         )
-        
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-            print(f"Cleaned up temporary file: {temp_file_path}")
\ No newline at end of file
+
+
+@router.post("/parse", openapi_extra=_upload_body("file", "The statement (PDF or image)."))
+async def parse_statement(
+    request: Request,
+    background: bool = Query(False, description="Return a job ID immediately instead of waiting for the result."),
+    db: Session = Depends(get_db),
+):
+    [upload] = await _receive_uploads(request, "file")
+    return await _run_or_queue(db, upload.path, upload.filename, upload.sha256, background)
+
+
+@router.post(
+    "/parse/images", openapi_extra=_upload_body("files", "One photo or scan per page, in page order.", many=True),
+)
+async def parse_statement_images(
+    request: Request,
+    background: bool = Query(False, description="Return a job ID immediately instead of waiting for the result."),
+    db: Session = Depends(get_db),
+):
+    """
+    Parses one statement photographed or scanned one page per image. The
+    images are preprocessed and OCR'd in parallel and extracted together as a
+    single statement, so transactions spanning pages stay in order.
+    """
+    files = await _receive_uploads(request, "files", max_files=settings.BATCH_MAX_FILES)
+    for upload in files:
+        if Path(upload.filename).suffix.lower() not in IMAGE_EXTENSIONS:
+            remove_temp_file([upload.path for upload in files])
+            raise HTTPException(status_code=400, detail=f"'{upload.filename}' is not a PNG or JPEG image.")
+
+    paths = [upload.path for upload in files]
+    file_hash = result_cache.combined_sha256([upload.sha256 for upload in files])
+    filename = files[0].filename if len(files) == 1 else f"{files[0].filename} (+{len(files) - 1} pages)"
+    return await _run_or_queue(db, paths, filename, file_hash, background)
+
+
+@router.post("/parse/batch", openapi_extra=_upload_body("files", "PDF/image files and/or ZIP archives.", many=True))
+async def parse_statement_batch(request: Request, db: Session = Depends(get_db)):
+    """
+    Parses many statements in one request. Accepts any number of PDF/image
+    files and/or ZIP archives of them.
+
+    The documents are processed concurrently on the worker pool. All successful
+    results are then saved in one database transaction, and a manifest with the
+    outcome and timing of every document is returned.
+    """
+    batch_started = time.perf_counter()
+
+    # --- Step 1: Save every document (including ZIP members) to disk ---
+    # Entries are (filename, path, sha256); ZIP members are hashed while they
+    # are extracted, so the pipeline never reads a document just to hash it.
+    files = await _receive_uploads(request, "files", max_files=settings.BATCH_MAX_FILES)
+    documents = []
+    try:
+        for index, upload in enumerate(files):
+            if is_zip_upload(upload):
+                # Extraction is blocking file I/O, so it runs in a thread.
+                members = await asyncio.to_thread(
+                    save_zip_upload, upload.path,
+                    max_files=settings.BATCH_MAX_FILES - len(documents),
+                    max_member_bytes=settings.UPLOAD_MAX_BYTES,
+                )
+                documents.extend(members)
+            else:
+                documents.append((upload.filename, upload.path, upload.sha256))
+            if len(documents) > settings.BATCH_MAX_FILES:
+                raise ValueError(f"A batch may contain at most {settings.BATCH_MAX_FILES} documents.")
+    except ValueError as e:
+        remove_temp_file([path for _, path, _ in documents] + [upload.path for upload in files[index:]])
+        status_code = 413 if isinstance(e, UploadTooLargeError) else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+
+    # --- Step 2: Fan the documents out across the worker pool ---
+    # At most JOB_WORKERS documents of the batch are submitted at a time, so a
+    # large batch does not fill the shared queue and starve other uploads.
+    semaphore = asyncio.Semaphore(settings.JOB_WORKERS)
+
+    async def process(filename: str, path: str, file_hash: str) -> dict:
+        async with semaphore:
+            started = time.perf_counter()
+            while True:
+                try:
+                    result = await job_queue.run_pipeline_in_pool(path, filename, persist=False, file_hash=file_hash)
+                    return {"filename": filename, "result": result, "seconds": time.perf_counter() - started}
+                except job_queue.QueueFullError:
+                    # Other requests are using the pool; wait for a free slot.
+                    await asyncio.sleep(1)
+                except Exception as e:
+                    logger.warning("Batch document failed: %s", e, extra={"file": filename})
+                    return {"filename": filename, "error": str(e), "seconds": time.perf_counter() - started}
+
+    try:
+        outcomes = await asyncio.gather(*(process(*document) for document in documents))
+    except asyncio.CancelledError:
+        # The client went away. Documents still waiting for a worker are never
+        # processed, so let the temp file sweep remove them.
+        release_temp_file([path for _, path, _ in documents])
+        raise
+
+    # --- Step 3: Persist every successful document in a single transaction ---
+    # Their pages and extraction chunks are stored too, so they can be re-extracted.
+    succeeded = [outcome for outcome in outcomes if "result" in outcome]
+    if succeeded:
+        artifacts = [outcome["result"].pop("extraction_artifacts", None) for outcome in succeeded]
+        try:
+            statement_ids = await asyncio.to_thread(crud.save_statements_bulk, db, [
+                (StatementData(**outcome["result"]), outcome["filename"], outcome["result"]["source_hash"])
+                for outcome in succeeded
+            ], artifacts=artifacts)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to save the batch to the database: {e}")
+        for outcome, statement_id in zip(succeeded, statement_ids):
+            outcome["result"]["statement_id"] = statement_id
+
+    # --- Step 4: Build the manifest ---
+    manifest = []
+    for outcome in outcomes:
+        entry = {"filename": outcome["filename"], "seconds": round(outcome["seconds"], 3)}
+        if "result" in outcome:
+            result = outcome["result"]
+            entry.update(
+                status="succeeded",
+                statement_id=result["statement_id"],
+                transactions=len(result.get("transactions", [])),
+                is_consistent=result["summary"]["is_consistent"],
+            )
+        else:
+            entry.update(status="failed", error=outcome["error"])
+        manifest.append(entry)
+
+    return {
+        "total": len(manifest),
+        "succeeded": len(succeeded),
+        "failed": len(manifest) - len(succeeded),
+        "seconds": round(time.perf_counter() - batch_started, 3),
+        "files": manifest,
+    }
+
+
+def _sse_event(name: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/parse/stream", openapi_extra=_upload_body("file", "The statement (PDF or image)."))
+async def parse_statement_stream(request: Request):
+    """
+    Streaming variant of /parse. Responds with Server-Sent Events while the
+    document is processed: 'upload_saved', 'stage', 'page_structured',
+    'chunk_extracted' (with a batch of transactions), 'persisted', 'validated',
+    and finally 'result' (the same data /parse returns) or 'error'.
+    """
+    [upload] = await _receive_uploads(request, "file")
+    await job_queue.wait_for_startup()
+    try:
+        events = job_queue.start_stream(upload.path, upload.filename, file_hash=upload.sha256)
+    except job_queue.QueueFullError as e:
+        remove_temp_file(upload.path)
+        raise _queue_full_error(e)
+
+    async def event_stream():
+        yield _sse_event("upload_saved", {"filename": upload.filename})
+        async for name, data in events:
+            yield _sse_event(name, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def get_job_status(job_id: str, db: Session = Depends(get_db)):
+    db_job = crud.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return _job_to_status(db_job)
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, db: Session = Depends(get_db)):
+    db_job = crud.get_job(db, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    if db_job.status == "failed":
+        raise HTTPException(
+            status_code=500,
+            detail=f"An internal error occurred during document processing: {db_job.error}"
+        )
+    if db_job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is still {db_job.status} (stage: {db_job.stage}).")
+    return db_job.result
+
+
+@router.get("/cache/stats")
+def get_cache_stats(db: Session = Depends(get_db)):
+    return result_cache.stats(db)
+
+
+@router.get("/templates/stats")
+def get_template_stats(db: Session = Depends(get_db)):
+    return template_stats(db)
+
+
+@router.get("/db/pool")
+async def get_db_pool_status():
+    return pool_status()
+
+
+# --- Read API ---
+# Cursors are opaque to clients: pass 'next_cursor' from one page as 'cursor'
+# to get the next one. A null 'next_cursor' means there are no more rows.
+#
+# Handlers that only query the database are plain functions: FastAPI runs
+# them in its thread pool, so the (synchronous) queries never block the event
+# loop that serves uploads and streams.
+
+def transaction_filters(
+    date_from: Optional[datetime.date] = Query(None, description="Earliest transaction date (YYYY-MM-DD)."),
+    date_to: Optional[datetime.date] = Query(None, description="Latest transaction date (YYYY-MM-DD)."),
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    kind: Optional[Literal["debit", "credit"]] = Query(None, description="Only debits or only credits."),
+    q: Optional[str] = Query(None, description="Case-insensitive substring of the description."),
+) -> TransactionFilters:
+    """Collects the shared transaction filter query parameters."""
+    return TransactionFilters(
+        date_from=date_from, date_to=date_to,
+        min_amount=min_amount, max_amount=max_amount,
+        kind=kind, description=q,
+    )
+
+
+@router.get("/statements", response_model=StatementPage)
+def list_statements(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = Query(None),
+    account_number: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    rows, next_cursor = crud.list_statements(db, limit=limit, before_id=cursor, account_number=account_number)
+    return StatementPage(items=rows, next_cursor=next_cursor)
+
+
+@router.get("/statements/{statement_id}", response_model=StatementRecord)
+def get_statement(statement_id: int, db: Session = Depends(get_db)):
+    db_statement = crud.get_statement(db, statement_id)
+    if db_statement is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    return db_statement
+
+
+@router.get("/statements/{statement_id}/transactions", response_model=TransactionPage)
+def list_statement_transactions(
+    statement_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None),
+    filters: TransactionFilters = Depends(transaction_filters),
+    db: Session = Depends(get_db),
+):
+    if crud.get_statement(db, statement_id) is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    rows, next_cursor = crud.list_statement_transactions(db, statement_id, limit=limit, after_id=cursor, filters=filters)
+    return TransactionPage(items=rows, next_cursor=next_cursor)
+
+
+@router.get("/statements/{statement_id}/aggregates", response_model=StatementAggregates)
+def get_statement_aggregates(
+    statement_id: int,
+    period: Literal["day", "week", "month"] = Query("month", description="Bucket size of 'periods'; weeks start on Monday."),
+    top: int = Query(10, ge=1, le=100, description="How many counterparties to return."),
+    filters: TransactionFilters = Depends(transaction_filters),
+    db: Session = Depends(get_db),
+):
+    """
+    Debit and credit sums of a statement in total, per period, per category
+    and for its top counterparties, computed by the database. The filters are
+    the same as for the transaction listing.
+    """
+    aggregates = crud.aggregate_statement(db, statement_id, period=period, top=top, filters=filters)
+    if aggregates is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    return aggregates
+
+
+# --- Exports ---
+# Exports are streamed from the database batch by batch (see exports.py), so
+# they are only produced when a client downloads them and never held in memory.
+
+ExportFormat = Literal["csv", "xlsx", "parquet", "arrow"]
+
+
+def _export_response(stem: str, export_format: str, filters: TransactionFilters, statement_id: int | None = None):
+    """Streams the matching transactions as a file download, or raises HTTP 501 if the format is unavailable."""
+    try:
+        exports.check_format(export_format)
+    except exports.ExportUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    def body():
+        # The request's session is closed once the handler has returned, before
+        # the body is sent, so the export reads through a session of its own.
+        db = SessionLocal()
+        try:
+            batches = crud.iter_transaction_rows(db, statement_id, filters, batch_size=settings.EXPORT_BATCH_ROWS)
+            yield from exports.stream_export(export_format, batches)
+        finally:
+            db.close()
+
+    filename = exports.export_filename(stem, export_format)
+    return StreamingResponse(
+        body(), media_type=exports.FORMATS[export_format][0],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get("/statements/{statement_id}/export")
+def export_statement(
+    statement_id: int,
+    export_format: ExportFormat = Query("csv", alias="format", description="csv, xlsx, parquet or arrow (IPC stream)."),
+    filters: TransactionFilters = Depends(transaction_filters),
+    db: Session = Depends(get_db),
+):
+    """Downloads a statement's transactions (optionally filtered) as a file."""
+    if crud.get_statement(db, statement_id) is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    return _export_response(f"statement_{statement_id}", export_format, filters, statement_id)
+
+
+@router.get("/transactions/export")
+async def export_transactions(
+    export_format: ExportFormat = Query("csv", alias="format", description="csv, xlsx, parquet or arrow (IPC stream)."),
+    filters: TransactionFilters = Depends(transaction_filters),
+):
+    """Downloads the matching transactions of all stored statements as a file."""
+    return _export_response("transactions", export_format, filters)
+
+
+# --- Re-Extraction ---
+# Every stored statement keeps its structured pages and the partial results it
+# was merged from, so single pages can be extracted again (e.g. after a failed
+# validation or a manual correction) without re-uploading the document.
+
+def _parse_pages(values: List[int | str]) -> set[int]:
+    """Expands page numbers and ranges ('3', '5-7') into a set of page numbers, or raises HTTP 400."""
+    pages = set()
+    for value in values:
+        text = str(value).strip()
+        first, _, last = text.partition("-")
+        try:
+            start, end = int(first), int(last or first)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"'{text}' is not a page number or range.")
+        if start < 1 or end < start:
+            raise HTTPException(status_code=400, detail=f"'{text}' is not a valid page range.")
+        pages.update(range(start, end + 1))
+    return pages
+
+
+@router.get("/statements/{statement_id}/pages", response_model=StatementArtifacts)
+def get_statement_pages(statement_id: int, db: Session = Depends(get_db)):
+    """The stored pages of a statement and the chunks it was extracted in."""
+    if crud.get_statement(db, statement_id) is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    chunks = [
+        ChunkArtifactRecord(
+            position=row.position, source=row.source, pages=row.pages, status=row.status, error=row.error,
+            transactions=len((row.result or {}).get("transactions") or []),
+        )
+        for row in crud.list_chunk_artifacts(db, statement_id)
+    ]
+    pages = [PageArtifactRecord.model_validate(row) for row in crud.list_page_artifacts(db, statement_id)]
+    return StatementArtifacts(statement_id=statement_id, pages=pages, chunks=chunks)
+
+
+def _pages_to_reextract(db: Session, statement_id: int, request: ReextractRequest) -> set[int]:
+    """Checks a re-extraction request and returns its pages, or raises an HTTPException."""
+    if crud.get_statement(db, statement_id) is None:
+        raise HTTPException(status_code=404, detail=f"Statement {statement_id} not found.")
+    stored_pages = {row.page for row in crud.list_page_artifacts(db, statement_id)}
+    if not stored_pages:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Statement {statement_id} has no stored pages; upload the document again instead.",
+        )
+
+    pages = _parse_pages(request.pages)
+    unknown = (pages | set(request.page_text)) - stored_pages
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Statement {statement_id} has no page(s) {sorted(unknown)}.")
+    # Without stored LLM chunks (the result came from the cache) every page is
+    # extracted again, so there is always something to do.
+    llm_chunks = [row for row in crud.list_chunk_artifacts(db, statement_id) if row.source != "table"]
+    if not pages and not request.page_text and llm_chunks and not any(row.status == "failed" for row in llm_chunks):
+        raise HTTPException(status_code=400, detail="Name the pages to re-extract; no chunk of this statement failed.")
+
+    return pages
+
+
+@router.post("/statements/{statement_id}/reextract")
+async def reextract_statement(statement_id: int, request: ReextractRequest, db: Session = Depends(get_db)):
+    """
+    Extracts some pages of a stored statement again and merges them with the
+    stored results of the other pages. Returns the same data as /parse.
+    """
+    pages = await asyncio.to_thread(_pages_to_reextract, db, statement_id, request)
+    try:
+        return await job_queue.run_reextraction_in_pool(statement_id, sorted(pages), request.page_text)
+
+    except job_queue.QueueFullError as e:
+        raise _queue_full_error(e)
+
+    except LLMUnavailableError as e:
+        logger.warning("The LLM is unavailable.", extra={"error": str(e)})
+        raise _llm_unavailable_error(e)
+
+    except Exception as e:
+        logger.exception("An error occurred during re-extraction.", extra={"statement_id": statement_id})
+        raise HTTPException(status_code=500, detail=f"An internal error occurred during re-extraction: {e}")
+
+
+@router.get("/transactions/search", response_model=TransactionPage)
+def search_transactions(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None),
+    filters: TransactionFilters = Depends(transaction_filters),
+    db: Session = Depends(get_db),
+):
+    rows, next_cursor = crud.search_transactions(db, limit=limit, before_id=cursor, filters=filters)
+    return TransactionPage(items=rows, next_cursor=next_cursor)
+
+
+@router.get("/search/transactions", response_model=TransactionSearchPage)
+def full_text_search(
+    q: str = Query(..., min_length=1, description="Words to find in transaction descriptions, e.g. 'amazon' or a UPI ID."),
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranked full-text search over the descriptions of every stored transaction.
+    All words must match and the last one also matches as a prefix.
+    """
+    hits, next_offset = crud.full_text_search_transactions(db, q, limit=limit, offset=offset)
+    items = [
+        TransactionSearchHit(**TransactionRecord.model_validate(row).model_dump(), score=score)
+        for row, score in hits
+    ]
+    return TransactionSearchPage(items=items, next_offset=next_offset)
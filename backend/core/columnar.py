@@ -0,0 +1,162 @@
+# --- Imports ---
+import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable
+import numpy as np
+
+from ..utils.dates import parse_statement_date
+
+# --- Constants ---
+# Amounts are stored as integers in minor units (cents for two-decimal
+# currencies), so sums and comparisons are exact.
+MINOR_UNITS = 100
+
+# Dates are stored as days since 1970-01-01; rows whose date could not be
+# parsed get NO_DATE.
+EPOCH = datetime.date(1970, 1, 1)
+NO_DATE = np.iinfo(np.int32).min
+
+
+def to_minor_units(values: list, scale: int = MINOR_UNITS) -> np.ndarray:
+    """
+    Converts amounts (floats, numeric strings or None) to int64 minor units.
+    Missing or unparseable values become 0.
+    """
+    try:
+        # Fast path: numbers, numeric strings and None (which becomes NaN).
+        floats = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        def as_float(value) -> float:
+            try:
+                return float(value) if value is not None else 0.0
+            except (TypeError, ValueError):
+                return 0.0
+        floats = np.array([as_float(value) for value in values], dtype=np.float64)
+    # Rounding to the nearest minor unit removes the binary float error, e.g.
+    # 8313.3 * 100 = 831329.9999999999 -> 831330.
+    floats = np.nan_to_num(floats)
+    scaled = floats * scale
+    minor = np.rint(scaled)
+    # Half a minor unit (1.005, 2.675) is rounded away from zero, as written:
+    # rint() would round it to even, and the float error of the product can
+    # push it either way (1.005 * 100 = 100.49999999999999).
+    for i in np.flatnonzero(np.abs(np.abs(scaled) % 1 - 0.5) < 1e-6):
+        exact = Decimal(str(float(floats[i]))) * scale
+        minor[i] = float(exact.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return minor.astype(np.int64)
+
+
+# --- Columnar Batch ---
+
+class TransactionBatch:
+    """
+    The transactions of one statement stored column by column.
+
+    Each column is a NumPy array with one entry per row, so a statement costs a
+    few dozen bytes per transaction instead of a Python object with five boxed
+    fields, and validation can work on whole columns at once. Strings are
+    interned: each distinct description and date text is stored once, and the
+    rows hold its index.
+
+    Attributes:
+        debits, credits, balances (np.ndarray): int64 amounts in minor units.
+        dates (np.ndarray): int32 days since 1970-01-01 (NO_DATE if unparseable).
+        date_text_ids (np.ndarray): int32 index into 'date_texts' per row.
+        description_ids (np.ndarray): int32 index into 'descriptions' per row.
+        date_texts (list[str]): Distinct date strings as extracted.
+        descriptions (list[str]): Distinct descriptions.
+        scale (int): Minor units per major unit.
+    """
+
+    __slots__ = (
+        "debits", "credits", "balances", "dates", "date_text_ids", "description_ids",
+        "date_texts", "descriptions", "_date_values", "scale",
+    )
+
+    def __init__(self, debits, credits, balances, date_text_ids, description_ids, date_texts, descriptions, scale=MINOR_UNITS):
+        self.debits = debits
+        self.credits = credits
+        self.balances = balances
+        self.date_text_ids = date_text_ids
+        self.description_ids = description_ids
+        self.date_texts = date_texts
+        self.descriptions = descriptions
+        self.scale = scale
+
+        # Each distinct date string is parsed only once.
+        self._date_values = [parse_statement_date(text) for text in date_texts]
+        day_numbers = np.array(
+            [(value - EPOCH).days if value else NO_DATE for value in self._date_values], dtype=np.int32,
+        )
+        self.dates = day_numbers[date_text_ids] if len(date_text_ids) else np.zeros(0, dtype=np.int32)
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable, scale: int = MINOR_UNITS) -> "TransactionBatch":
+        """
+        Builds a batch from transaction dicts or pydantic Transaction objects.
+
+        Args:
+            transactions (Iterable): Rows with 'date', 'description', 'debit',
+                                     'credit' and 'balance'.
+            scale (int): Minor units per major unit (100 for cents).
+        """
+        rows = [row if isinstance(row, dict) else row.__dict__ for row in transactions]
+
+        def intern(values: list) -> tuple[np.ndarray, list[str]]:
+            pool: dict[str, int] = {}
+            ids = np.fromiter(
+                (pool.setdefault("" if value is None else str(value), len(pool)) for value in values),
+                dtype=np.int32, count=len(values),
+            )
+            return ids, list(pool)
+
+        date_text_ids, date_texts = intern([row.get('date') for row in rows])
+        description_ids, descriptions = intern([row.get('description') for row in rows])
+        return cls(
+            debits=to_minor_units([row.get('debit') for row in rows], scale),
+            credits=to_minor_units([row.get('credit') for row in rows], scale),
+            balances=to_minor_units([row.get('balance') for row in rows], scale),
+            date_text_ids=date_text_ids,
+            description_ids=description_ids,
+            date_texts=date_texts,
+            descriptions=descriptions,
+            scale=scale,
+        )
+
+    def __len__(self) -> int:
+        return len(self.debits)
+
+    @property
+    def net(self) -> np.ndarray:
+        """credit - debit per row, in minor units."""
+        return self.credits - self.debits
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the batch, including the interned strings."""
+        arrays = (self.debits, self.credits, self.balances, self.dates, self.date_text_ids, self.description_ids)
+        return sum(array.nbytes for array in arrays) + sum(len(text) for text in self.descriptions + self.date_texts)
+
+    def to_major(self, amounts: np.ndarray) -> list[float]:
+        """Converts minor units back to float amounts (for the API and the database)."""
+        return (amounts / self.scale).tolist()
+
+    def to_records(self, **extra) -> list[dict]:
+        """
+        Returns one dict per row in the shape of the 'transactions' table, with
+        any 'extra' columns (e.g. statement_id) added to every row.
+        """
+        debits, credits, balances = self.to_major(self.debits), self.to_major(self.credits), self.to_major(self.balances)
+        date_text_ids, description_ids = self.date_text_ids.tolist(), self.description_ids.tolist()
+        return [
+            {
+                **extra,
+                "date": self._date_values[date_text_ids[i]],
+                "date_text": self.date_texts[date_text_ids[i]],
+                "description": self.descriptions[description_ids[i]],
+                "debit": debits[i],
+                "credit": credits[i],
+                "balance": balances[i],
+            }
+            for i in range(len(self))
+        ]
@@ -1,4 +1,5 @@
 # --- Imports ---
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- Configuration Class ---
@@ -13,12 +14,178 @@ class Settings(BaseSettings):
     Attributes:
         OPENAI_API_KEY (str): The secret API key for accessing the OpenAI service.
                               It will be loaded from the .env file.
+        DATABASE_URL (str): SQLAlchemy URL of the database (SQLite or Postgres).
+        DB_POOL_SIZE (int): Connections kept open in the pool.
+        DB_MAX_OVERFLOW (int): Extra connections allowed when the pool is exhausted.
+        DB_POOL_TIMEOUT (int): Seconds to wait for a free connection.
+        DB_POOL_RECYCLE (int): Connections older than this many seconds are replaced.
+        DB_POOL_PRE_PING (bool): Test connections before use to drop stale ones.
+        SQLITE_BUSY_TIMEOUT_MS (int): How long SQLite writers wait for the file lock.
+        JOB_WORKERS (int): Number of worker processes that run the processing
+                           pipeline in the background.
+        JOB_MAX_PENDING (int): How many uploads may wait for a free worker before
+                               new requests are rejected with HTTP 503.
+        BATCH_MAX_FILES (int): Maximum number of documents in one batch upload.
+        MODEL_WARMUP (bool): Load the OCR/layout models and OpenCV at startup, before
+                             the workers are forked, instead of on the first document.
+        WORKER_PREFORK (bool): Start all pipeline workers at startup; /healthz/ready
+                               reports ready only once they are running.
+        UPLOAD_MAX_BYTES (int): Largest accepted upload; bigger files get HTTP 413.
+        TEMP_FILE_MAX_AGE_SECONDS (int): Files in temp_uploads/ older than this are
+                                         treated as orphaned and deleted, unless a
+                                         queued or running job still uses them.
+        TEMP_SWEEP_INTERVAL_SECONDS (int): How often the orphaned-file sweep runs.
+        PARTITION_WORKERS (int): Processes used to partition the pages of one PDF
+                                 in parallel. 1 keeps the original serial behaviour.
+        PARTITION_PAGES_PER_CHUNK (int): How many pages each partitioning task handles.
+        TEXT_LAYER_FAST_PATH (bool): Read the embedded text layer of digital PDF pages
+                                     instead of running hi_res OCR on them.
+        TEXT_LAYER_MIN_CHARS (int): Letters/digits a page's text layer needs to be
+                                    considered usable.
+        IMAGE_PREPROCESSING (bool): Downscale and deskew photos/scans before OCR.
+        IMAGE_TARGET_DPI (int): Resolution images are reduced to (never enlarged).
+        IMAGE_DESKEW (bool): Straighten rotated images.
+        IMAGE_DESKEW_MIN_ANGLE (float): Skews below this many degrees are left alone.
+        IMAGE_DESKEW_MAX_ANGLE (float): Estimated skews above this are ignored as implausible.
+        IMAGE_THRESHOLD (str): 'adaptive', 'otsu' or 'none'.
+        IMAGE_THRESHOLD_BLOCK_SIZE (int): Neighbourhood size (odd, in pixels) of
+                                          the adaptive threshold.
+        IMAGE_THRESHOLD_OFFSET (int): Constant subtracted from the neighbourhood mean.
+        TEMPLATES_ENABLED (bool): Try the rule-based layout templates before the LLM.
+        LLM_BASE_URL (str): The OpenAI-compatible endpoint used for extraction.
+        LLM_MODEL (str): The model used for extraction. It is part of the result
+                         cache key, so changing it invalidates cached results.
+        LLM_CHUNKED_EXTRACTION (bool): Split long documents into windows that are
+                                       extracted concurrently.
+        LLM_CHUNK_TOKENS (int): Estimated token budget of one window. Documents
+                                below it use a single prompt.
+        LLM_CHUNK_OVERLAP_TOKENS (int): Tokens repeated between adjacent windows.
+        LLM_MAX_CONCURRENCY (int): Maximum LLM requests in flight for one document.
+        TABLE_EXTRACTION (bool): Read transactions straight from the table grids
+                                 found by OCR; the LLM only gets the other text.
+        PROMPT_REDUCTION (bool): Drop repeated headers/footers and compact the page
+                                 text before it is sent to the LLM.
+        LLM_FALLBACK_MODELS (list[str]): Models tried in order when LLM_MODEL keeps
+                                         failing (rate limited, down, or unusable
+                                         output). A JSON list in the environment.
+        LLM_CONNECT_TIMEOUT (float): Seconds to connect to the LLM API.
+        LLM_READ_TIMEOUT (float): Seconds to wait for a response once connected.
+        LLM_MAX_CONNECTIONS (int): Pooled connections to the LLM API per worker.
+        LLM_MAX_RETRIES (int): Retries per model after a 429, 5xx, timeout or
+                               connection error.
+        LLM_RETRY_BASE_DELAY (float): Backoff before the first retry; it doubles
+                                      with every retry and is jittered.
+        LLM_RETRY_MAX_DELAY (float): Longest wait before a retry. A Retry-After
+                                     above it moves on to the next model instead.
+        LLM_REQUESTS_PER_MINUTE (int): LLM requests allowed per minute and model
+                                       across all workers (0 = no limit).
+        LLM_TOKENS_PER_MINUTE (int): Prompt + completion tokens allowed per minute
+                                     and model across all workers (0 = no limit).
+        CACHE_ENABLED (bool): Whether repeat uploads reuse cached pipeline results.
+        CACHE_MAX_BYTES (int): Upper bound on the total size of cached results.
+        CACHE_MAX_AGE_SECONDS (int): Cached results older than this are discarded.
+        AGGREGATES_CACHE_ENTRIES (int): Statement aggregates kept in memory by each
+                                        API process (0 = no caching).
+        EXPORT_BATCH_ROWS (int): Rows read from the database per batch while
+                                 streaming an export.
+        LOG_LEVEL (str): Minimum level of the application's log records.
+        LOG_FORMAT (str): 'text' (key=value fields) or 'json' (one object per line).
+        SERVER_TIMING (bool): Add a Server-Timing header with the pipeline stage
+                              durations to API responses.
     """
     
     # Define the setting variable that needs to be loaded.
     # Pydantic will automatically look for an environment variable with this name.
     OPENAI_API_KEY: str
 
+    # --- Database Settings ---
+    DATABASE_URL: str = "sqlite:///./intellistatement.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # --- Job Queue Settings ---
+    # The pipeline (OCR + LLM) is CPU and network heavy, so it runs in a bounded
+    # pool of worker processes instead of inside the API's event loop.
+    JOB_WORKERS: int = 2
+    JOB_MAX_PENDING: int = 8
+    BATCH_MAX_FILES: int = 500
+    MODEL_WARMUP: bool = True
+    WORKER_PREFORK: bool = True
+
+    # --- Upload Settings ---
+    UPLOAD_MAX_BYTES: int = 50 * 1024 * 1024
+    TEMP_FILE_MAX_AGE_SECONDS: int = 60 * 60
+    TEMP_SWEEP_INTERVAL_SECONDS: int = 10 * 60
+
+    # --- Structuring Settings ---
+    # Each job worker owns its own partitioning pool, so the total number of OCR
+    # processes is up to JOB_WORKERS * PARTITION_WORKERS.
+    PARTITION_WORKERS: int = 1
+    PARTITION_PAGES_PER_CHUNK: int = 5
+
+    # Most statements are born-digital. Their pages skip the layout model and OCR.
+    TEXT_LAYER_FAST_PATH: bool = True
+    TEXT_LAYER_MIN_CHARS: int = 50
+
+    # --- Image Preprocessing Settings ---
+    IMAGE_PREPROCESSING: bool = True
+    IMAGE_TARGET_DPI: int = 300
+    IMAGE_DESKEW: bool = True
+    IMAGE_DESKEW_MIN_ANGLE: float = 0.3
+    IMAGE_DESKEW_MAX_ANGLE: float = 15.0
+    IMAGE_THRESHOLD: Literal["adaptive", "otsu", "none"] = "adaptive"
+    IMAGE_THRESHOLD_BLOCK_SIZE: int = 31
+    IMAGE_THRESHOLD_OFFSET: int = 15
+
+    # --- Extraction Settings ---
+    TEMPLATES_ENABLED: bool = True
+
+    # --- LLM Settings ---
+    LLM_BASE_URL: str = "https://openrouter.ai/api/v1"
+    LLM_MODEL: str = "qwen/qwen-2.5-72b-instruct:free"
+    LLM_CHUNKED_EXTRACTION: bool = True
+    LLM_CHUNK_TOKENS: int = 6000
+    LLM_CHUNK_OVERLAP_TOKENS: int = 300
+    LLM_MAX_CONCURRENCY: int = 4
+    TABLE_EXTRACTION: bool = True
+    PROMPT_REDUCTION: bool = True
+    LLM_FALLBACK_MODELS: list[str] = []
+
+    # Every request goes through backend/utils/llm_gateway.py, which applies
+    # the timeouts, retries and the rate limits shared by all workers. The
+    # request limit matches the free OpenRouter tier.
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    LLM_READ_TIMEOUT: float = 120.0
+    LLM_MAX_CONNECTIONS: int = 8
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 30.0
+    LLM_REQUESTS_PER_MINUTE: int = 20
+    LLM_TOKENS_PER_MINUTE: int = 0
+
+    # --- Result Cache Settings ---
+    # Users often upload the same statement more than once. Results are cached by
+    # the SHA-256 of the file, so a repeat upload skips OCR and the LLM entirely.
+    CACHE_ENABLED: bool = True
+    CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    CACHE_MAX_AGE_SECONDS: int = 30 * 24 * 60 * 60
+
+    # --- Analytics Settings ---
+    # Aggregates are cached per statement and recomputed when it changes.
+    AGGREGATES_CACHE_ENTRIES: int = 256
+    # Exports stream from the database in batches, so their memory use is flat.
+    EXPORT_BATCH_ROWS: int = 5000
+
+    # --- Observability Settings ---
+    # Metrics are always collected and served on GET /metrics.
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"
+    SERVER_TIMING: bool = True
+
     # Configure Pydantic to look for a .env file in the project's root directory.
     # The .env file is where you will store your actual API key.
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
@@ -0,0 +1,69 @@
+# --- Imports ---
+import json
+import logging
+import datetime
+
+from .config import settings
+
+# --- Structured Logging ---
+# Every module logs through logging.getLogger(__name__). Context that a log
+# search might filter on (a stage, a job ID, a duration) is passed as 'extra'
+# fields rather than formatted into the message, so it comes out as separate
+# keys: key=value pairs in the 'text' format, JSON properties in 'json'.
+
+# Attributes every LogRecord has; anything else on a record came from 'extra'.
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """'2025-01-31 12:00:00,000 INFO backend.x: Message key=value ...' for terminals."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in _extra_fields(record).items())
+        if not fields:
+            return line
+        # Keep the fields on the first line, ahead of any traceback.
+        first, _, rest = line.partition("\n")
+        return f"{first} {fields}" + (f"\n{rest}" if rest else "")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """
+    Sends the application's log records to stderr in the LOG_FORMAT format.
+    Worker processes are forked from the API process and inherit this setup.
+    """
+    logger = logging.getLogger("backend")
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else KeyValueFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(settings.LOG_LEVEL.upper())
+    # The records are handled here; don't print them a second time through
+    # whatever handlers the server installed on the root logger.
+    logger.propagate = False
@@ -0,0 +1,276 @@
+# --- Imports ---
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator
+
+# --- Metrics ---
+# A small, dependency-free implementation of Prometheus counters, gauges and
+# histograms, rendered in the Prometheus text format by GET /metrics.
+#
+# The pipeline runs in worker processes, but only the API process is scraped.
+# Workers therefore never update these metrics directly: inside a worker every
+# measurement goes into a Trace (see collect()), which travels back to the API
+# process together with the result and is applied there (see apply()).
+
+# Upper bounds of the histogram buckets.
+SECONDS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_registry: dict[str, "_Metric"] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: tuple, values: tuple, le: str | None = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names, one series per label combination."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. the number of processed documents."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._series.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. the number of queued uploads."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._series.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Counts observations (e.g. durations) in cumulative buckets and keeps their sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = SECONDS_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.get(key) or ([0] * len(self.buckets), 0.0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value)
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, le=_format_value(bound))
+                yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry.values()) + "\n"
+
+
+# --- Application Metrics ---
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to handle an HTTP request.", ("method", "route", "status"),
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "job_queue_depth", "Pipeline tasks submitted to the worker pool that have not finished (running + waiting).",
+)
+PIPELINE_DOCUMENTS = Counter(
+    "pipeline_documents_total", "Documents run through the pipeline, by outcome.", ("outcome",),
+)
+PIPELINE_SECONDS = Histogram(
+    "pipeline_seconds", "Time to run the whole pipeline for one document, in the worker.",
+)
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Time spent in each pipeline stage.", ("stage",),
+)
+PIPELINE_PAGES = Histogram(
+    "pipeline_pages", "Pages per processed document.", buckets=COUNT_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds", "Duration of one LLM request.",
+)
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM request attempts, by model and outcome (ok, rate_limited, server_error, "
+    "timeout, client_error, invalid_output).", ("model", "outcome"),
+)
+LLM_THROTTLE_SECONDS = Histogram(
+    "llm_throttle_seconds", "Time an LLM request waited, by reason (rate_limit: the shared limiter, "
+    "backoff: before a retry).", ("reason",),
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens", "Tokens per LLM request, by kind (prompt or completion).", ("kind",), buckets=TOKEN_BUCKETS,
+)
+LLM_INPUT_TOKENS = Histogram(
+    "llm_input_tokens", "Estimated tokens of a document's text before (raw) and after (reduced) prompt reduction.",
+    ("text",), buckets=TOKEN_BUCKETS,
+)
+LLM_PROMPT_BYTES = Histogram(
+    "llm_prompt_bytes", "Size of the prompt sent in one LLM request.", buckets=BYTES_BUCKETS,
+)
+LLM_RESPONSE_BYTES = Histogram(
+    "llm_response_bytes", "Size of the content returned by one LLM request.", buckets=BYTES_BUCKETS,
+)
+
+
+# --- Traces ---
+
+class Trace:
+    """
+    The measurements of one pipeline run, collected where it runs (usually a
+    worker process) and applied to the metrics by the API process.
+
+    Attributes:
+        spans (list[tuple[str, float]]): (stage, seconds) in the order they ended.
+        observations (list[tuple[str, dict, float]]): (metric name, labels, value).
+        outcome (str): 'succeeded' or 'failed'.
+    """
+
+    def __init__(self):
+        self.spans: list[tuple[str, float]] = []
+        self.observations: list[tuple[str, dict, float]] = []
+        self.outcome = "succeeded"
+
+
+# The trace of the pipeline run in progress in this context, if any.
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("current_trace", default=None)
+
+# The stage spans of the HTTP request being handled, for the Server-Timing header.
+_request_spans: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_spans", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Trace]:
+    """Collects every measurement made inside the block into a new Trace."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def _update(metric: _Metric, value: float, labels: dict):
+    if isinstance(metric, Counter):
+        metric.inc(value, **labels)
+    else:
+        metric.observe(value, **labels)
+
+
+def record(metric: Histogram | Counter, value: float, **labels):
+    """
+    Observes a value (or increments a counter by it): into the current trace
+    inside collect(), directly otherwise.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        _update(metric, value, labels)
+    else:
+        trace.observations.append((metric.name, labels, value))
+
+
+@contextmanager
+def span(stage: str):
+    """Times the block as a pipeline stage (pipeline_stage_seconds and Server-Timing)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        record(STAGE_SECONDS, elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((stage, elapsed))
+
+
+def apply(trace: Trace | None):
+    """
+    Applies a trace shipped back from a worker to this process's metrics, and
+    adds its spans to the Server-Timing header of the current request.
+    """
+    if trace is None:
+        return
+    for name, labels, value in trace.observations:
+        _update(_registry[name], value, labels)
+    PIPELINE_DOCUMENTS.inc(outcome=trace.outcome)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.extend(trace.spans)
+
+
+# --- Server-Timing ---
+
+def start_request() -> list:
+    """Starts collecting stage spans for the HTTP request handled in this context."""
+    spans: list[tuple[str, float]] = []
+    _request_spans.set(spans)
+    return spans
+
+
+def server_timing(spans: list, total: float) -> str:
+    """Formats spans (seconds) as a Server-Timing header value (milliseconds)."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in spans]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
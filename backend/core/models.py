@@ -1,6 +1,7 @@
 # in backend/core/models.py
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict
+import datetime
+from typing import Dict, List, Literal, Optional, Union
 
 class Transaction(BaseModel):
     date: str
@@ -21,4 +22,138 @@ class StatementData(BaseModel):
     currency_symbol: Optional[str] = "$" # Default to $ if not found
     
     transactions: List[Transaction]
-    warnings: Optional[List[str]] = None
\ No newline at end of file
+    warnings: Optional[List[str]] = None
+
+class JobStatus(BaseModel):
+    """The public view of a background processing job."""
+    job_id: str
+    filename: Optional[str] = None
+    status: str
+    stage: str
+    progress: int
+    error: Optional[str] = None
+    statement_id: Optional[int] = None
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+
+
+# --- Read API Models ---
+
+class TransactionFilters(BaseModel):
+    """Optional filters shared by the transaction listing and search queries."""
+    date_from: Optional[datetime.date] = None
+    date_to: Optional[datetime.date] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    kind: Optional[Literal["debit", "credit"]] = None
+    description: Optional[str] = None  # case-insensitive substring
+
+class TransactionRecord(BaseModel):
+    """A stored transaction as returned by the read API."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    statement_id: int
+    date: Optional[datetime.date] = None
+    date_text: Optional[str] = None
+    description: Optional[str] = None
+    debit: float
+    credit: float
+    balance: float
+
+class StatementRecord(BaseModel):
+    """A stored statement header as returned by the read API."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    filename: Optional[str] = None
+    account_holder: Optional[str] = None
+    account_number: Optional[str] = None
+    period_start: Optional[datetime.date] = None
+    period_end: Optional[datetime.date] = None
+    beginning_balance: Optional[float] = None
+    ending_balance: Optional[float] = None
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+
+class StatementPage(BaseModel):
+    """One page of statements. Pass 'next_cursor' back to get the next page."""
+    items: List[StatementRecord]
+    next_cursor: Optional[int] = None
+
+class TransactionPage(BaseModel):
+    """One page of transactions. Pass 'next_cursor' back to get the next page."""
+    items: List[TransactionRecord]
+    next_cursor: Optional[int] = None
+
+class TransactionSearchHit(TransactionRecord):
+    """A full-text search match; higher 'score' means more relevant."""
+    score: float
+
+class TransactionSearchPage(BaseModel):
+    """One page of ranked search results. Pass 'next_offset' back to get the next page."""
+    items: List[TransactionSearchHit]
+    next_offset: Optional[int] = None
+
+
+# --- Analytics Models ---
+
+class AmountTotals(BaseModel):
+    """The number of transactions and their summed debits and credits (net = credit - debit)."""
+    count: int
+    debit: float
+    credit: float
+    net: float
+
+class PeriodTotals(AmountTotals):
+    """Totals of one day, week or month; 'period' is its first day (None for undated rows)."""
+    period: Optional[datetime.date] = None
+
+class GroupTotals(AmountTotals):
+    """Totals of one category or counterparty."""
+    name: str
+
+class StatementAggregates(BaseModel):
+    """Server-side aggregates of a statement's transactions, for charts and summaries."""
+    statement_id: int
+    period: Literal["day", "week", "month"]
+    totals: AmountTotals
+    periods: List[PeriodTotals]
+    categories: List[GroupTotals]
+    counterparties: List[GroupTotals]
+
+# --- Re-Extraction Models ---
+
+class ReextractRequest(BaseModel):
+    """
+    Pages of a stored statement to extract again. 'pages' takes page numbers
+    and ranges such as "3-5"; 'page_text' replaces the text of pages with a
+    correction (those pages are re-extracted too). With neither, the pages
+    whose extraction failed are retried.
+    """
+    pages: List[Union[int, str]] = []
+    page_text: Dict[int, str] = {}
+
+class PageArtifactRecord(BaseModel):
+    """A stored page of a statement, as it is sent to extraction."""
+    model_config = ConfigDict(from_attributes=True)
+
+    page: int
+    strategy: Optional[str] = None
+    corrected: bool = False
+    text: Optional[str] = None
+
+class ChunkArtifactRecord(BaseModel):
+    """A stored partial extraction result of a statement."""
+    position: int
+    source: str
+    pages: List[int]
+    status: str
+    error: Optional[str] = None
+    transactions: int = 0
+
+class StatementArtifacts(BaseModel):
+    """The stored pages and extraction chunks of a statement."""
+    statement_id: int
+    pages: List[PageArtifactRecord]
+    chunks: List[ChunkArtifactRecord]
@@ -0,0 +1,137 @@
+# --- Imports ---
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable
+
+from sqlalchemy import Date, case, cast, func, or_
+from sqlalchemy.orm import Session
+
+# --- Statement Analytics ---
+# The dashboard's sums per period, per counterparty and per category are
+# computed by the database with GROUP BY over the (statement_id, date) index,
+# so only a few dozen aggregate rows leave it instead of every transaction.
+# Results are cached in the API process (see cached()); the key includes the
+# statement's 'updated_at', so a re-ingested or re-extracted statement is
+# recomputed rather than served stale.
+
+PERIODS = ("day", "week", "month")
+
+# Keyword rules for the category breakdown: the first category with a keyword
+# at the start of a word of the (lower-cased) description wins, everything
+# else is 'Other'. Merchant categories come before the generic payment rails
+# (UPI, BACS, ...), which appear in the descriptions of most payments.
+CATEGORY_KEYWORDS = {
+    "Income": ("salary", "payroll", "wages", "pension", "dividend", "refund", "cashback"),
+    "Groceries": (
+        "tesco", "sainsbury", "morrisons", "asda", "aldi", "lidl", "waitrose", "grocery", "supermarket",
+        "bigbasket", "blinkit", "dmart",
+    ),
+    "Dining": (
+        "restaurant", "cafe", "coffee", "starbucks", "mcdonald", "kfc", "pizza", "swiggy", "zomato",
+        "deliveroo", "just eat", "uber eats", "foods",
+    ),
+    "Transport": (
+        "uber", "ola", "lyft", "petrol", "fuel", "parking", "railway", "trainline", "irctc", "metro", "tfl",
+        "airline", "airways",
+    ),
+    "Bills & utilities": (
+        "electric", "energy", "water", "gas", "broadband", "internet", "mobile", "vodafone", "airtel", "jio",
+        "insurance", "council tax", "rent", "mortgage", "netflix", "spotify", "subscription",
+    ),
+    "Shopping": ("amazon", "ebay", "flipkart", "myntra", "argos", "ikea", "store", "shop"),
+    "Cash": ("atm", "cash withdrawal", "cash deposit"),
+    "Fees & interest": ("fee", "charge", "interest", "commission", "penalty"),
+    "Transfers": (
+        "transfer", "upi", "neft", "imps", "rtgs", "bacs", "faster payment", "fast payment", "standing order",
+        "direct debit",
+    ),
+}
+OTHER_CATEGORY = "Other"
+_WORD_SEPARATORS = ("/", "-", "*", ".", ":", ",")
+
+# Counterparty names are the descriptions without the payment wording around
+# them: a leading rail or verb ('Paid to', 'CARD PAYMENT') and everything from
+# the first reference marker or long number on ('UPI ID: 5244...', 'REF 123').
+_LEADING_WORDS = re.compile(
+    r"^(?:(?:paid|sent|payment|transfer|received|money)\s+(?:to|from)|card\s+payment(?:\s+to)?|fast\s+payment|"
+    r"faster\s+payment|direct\s+debit|standing\s+order|debit\s+card|pos|upi|neft|imps|rtgs|bacs|dd|so)\b[\s:/-]*",
+    re.IGNORECASE,
+)
+_TRAILING_PART = re.compile(
+    r"(?:\b(?:upi\s*id|upi\s*ref|ref(?:erence)?|txn|transaction\s+id|paid\s+by|card\s+ending)\b|\d{4,}).*$",
+    re.IGNORECASE,
+)
+_NOT_NAME = re.compile(r"[^\w&' .-]+")
+_MAX_NAME_WORDS = 6
+
+# Cached results (key -> value) in least recently used order.
+_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def period_expression(db: Session, column, period: str):
+    """
+    The first day of the day/week (Monday)/month a date falls into, as a SQL
+    expression to group by. SQLite returns it as 'YYYY-MM-DD' text.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; expected one of {PERIODS}.")
+    if period == "day":
+        return column
+    if db.get_bind().dialect.name == "sqlite":
+        if period == "week":
+            # The next Sunday (or the day itself), then back to its Monday.
+            return func.date(column, "weekday 0", "-6 days")
+        return func.strftime("%Y-%m-01", column)
+    return cast(func.date_trunc(period, column), Date)
+
+
+def category_expression(column):
+    """A SQL CASE expression mapping a description to its category (see CATEGORY_KEYWORDS)."""
+    # ' ' + the description with separators turned into spaces, so that
+    # LIKE '% keyword%' finds the keyword at the start of any word.
+    words = func.lower(column)
+    for separator in _WORD_SEPARATORS:
+        words = func.replace(words, separator, " ")
+    words = " " + words
+    return case(
+        *[
+            (or_(*[words.like(f"% {keyword}%") for keyword in keywords]), category)
+            for category, keywords in CATEGORY_KEYWORDS.items()
+        ],
+        else_=OTHER_CATEGORY,
+    )
+
+
+def counterparty_name(description: str | None) -> str:
+    """
+    The merchant or person of a transaction description, e.g. 'Paid to M S
+    TIBBS FOODS UPI ID: 5244... Paid by Axis Bank' -> 'M S TIBBS FOODS'.
+    Falls back to the cleaned description if nothing is left.
+    """
+    text = " ".join((description or "").split())
+    name = _TRAILING_PART.sub("", _LEADING_WORDS.sub("", text))
+    name = " ".join(_NOT_NAME.sub(" ", name).split()[:_MAX_NAME_WORDS]).strip(" .-")
+    if not name:
+        name = " ".join(_NOT_NAME.sub(" ", text).split()[:_MAX_NAME_WORDS]).strip(" .-")
+    return name or "Unknown"
+
+
+def cached(key: tuple, max_entries: int, compute: Callable[[], Any]) -> Any:
+    """
+    Returns the cached value for the key, or computes and caches it, keeping
+    at most 'max_entries' values (0 disables the cache).
+    """
+    if max_entries <= 0:
+        return compute()
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    value = compute()
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > max_entries:
+            _cache.popitem(last=False)
+    return value
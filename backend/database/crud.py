@@ -1,11 +1,127 @@
 # --- Imports ---
+import time
+import logging
+import uuid
+import datetime
+from sqlalchemy import select, update, insert, delete, or_, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models as db_models
+from . import search
+from . import analytics
 from ..core import models as pydantic_models
+from ..core.config import settings
+from ..core.columnar import TransactionBatch
+from ..utils.dates import parse_statement_date
+
+logger = logging.getLogger(__name__)
 
 # --- CRUD Functions ---
 
-def save_statement_data(db: Session, data: pydantic_models.StatementData, filename: str) -> db_models.Statement:
+# Account numbers that mean "not found in the document". Statements are only
+# matched on their account/period when the number and both dates are real.
+_PLACEHOLDER_VALUES = {"", "N/A", "Unknown"}
+
+
+def _find_existing_statement(db: Session, data: pydantic_models.StatementData, source_hash: str | None) -> db_models.Statement | None:
+    """
+    Looks for a previously ingested copy of the same statement: first by the
+    SHA-256 of the uploaded file, then by account number and period.
+    """
+    statement = db_models.Statement
+    if source_hash:
+        existing = db.query(statement).filter(statement.source_hash == source_hash).order_by(statement.id).first()
+        if existing is not None:
+            return existing
+
+    period_start = parse_statement_date(data.period_start)
+    period_end = parse_statement_date(data.period_end)
+    if data.account_number in _PLACEHOLDER_VALUES or period_start is None or period_end is None:
+        return None
+    return (
+        db.query(statement)
+        .filter(
+            statement.account_number == data.account_number,
+            statement.period_start == period_start,
+            statement.period_end == period_end,
+        )
+        .order_by(statement.id)
+        .first()
+    )
+
+
+def _upsert_statement(
+    db: Session,
+    data: pydantic_models.StatementData,
+    filename: str,
+    source_hash: str | None = None,
+    batch: TransactionBatch | None = None,
+    statement_id: int | None = None,
+) -> int:
+    """
+    Inserts or replaces one statement without committing, so that several
+    statements can share one database transaction.
+
+    The transactions are written with a single executemany INSERT instead of
+    one ORM object per row. If the same statement was ingested before, its
+    header is updated and its old transactions are replaced, keeping its ID.
+    'batch' is the columnar form of data.transactions, if the caller has it.
+    'statement_id' names the statement to replace instead of looking it up.
+
+    Returns:
+        int: The ID of the inserted or updated statement.
+    """
+    header = dict(
+        filename=filename,
+        account_holder=data.account_holder,
+        account_number=data.account_number,
+        period_start=parse_statement_date(data.period_start),
+        period_end=parse_statement_date(data.period_end),
+        beginning_balance=data.beginning_balance,
+        ending_balance=data.ending_balance,
+        source_hash=source_hash,
+    )
+
+    if statement_id is not None:
+        db_statement = db.get(db_models.Statement, statement_id)
+    else:
+        db_statement = _find_existing_statement(db, data, source_hash)
+    if db_statement is None:
+        db_statement = db_models.Statement(**header)
+        db.add(db_statement)
+    else:
+        logger.info("Statement was ingested before; replacing its transactions.", extra={"statement_id": db_statement.id})
+        for key, value in header.items():
+            setattr(db_statement, key, value)
+        # Set explicitly: the header may be unchanged, and cached aggregates
+        # of the statement are keyed on this timestamp.
+        db_statement.updated_at = datetime.datetime.utcnow()
+        # The search index needs the old rows, so drop them from it first.
+        search.unindex_statement(db, db_statement.id)
+        db.execute(delete(db_models.Transaction).where(db_models.Transaction.statement_id == db_statement.id))
+
+    # Flush to obtain the statement's ID for the transaction rows.
+    db.flush()
+    statement_id = db_statement.id
+
+    if batch is None:
+        batch = TransactionBatch.from_transactions(data.transactions)
+    # Each distinct date string is parsed once by the batch, not once per row.
+    rows = batch.to_records(statement_id=statement_id)
+    if rows:
+        db.execute(insert(db_models.Transaction), rows)
+        search.index_statement(db, statement_id)
+    return statement_id
+
+
+def save_statement_data(
+    db: Session,
+    data: pydantic_models.StatementData,
+    filename: str,
+    source_hash: str | None = None,
+    batch: TransactionBatch | None = None,
+    statement_id: int | None = None,
+) -> int:
     """
     Saves a complete, parsed statement and its transactions to the database.
 
@@ -14,43 +130,584 @@ def save_statement_data(db: Session, data: pydantic_models.StatementData, filena
         data (pydantic_models.StatementData): The Pydantic model containing the
                                               validated data from the LLM.
         filename (str): The original filename of the uploaded document.
+        source_hash (str, optional): SHA-256 of the uploaded file. Re-ingesting
+                                     the same file updates the existing statement.
+        batch (TransactionBatch, optional): data.transactions in columnar form,
+                                            to avoid converting them again.
+        statement_id (int, optional): Replace this statement (re-extraction)
+                                      instead of looking for an earlier copy.
 
     Returns:
-        db_models.Statement: The newly created Statement record from the database.
+        int: The ID of the saved Statement record.
     """
-    print("Saving extracted data to the database...")
-    
-    # Create the main Statement record, now including the actual filename.
-    db_statement = db_models.Statement(
-        filename=filename, # <-- THIS IS THE UPDATED LINE
-        account_holder=data.account_holder,
-        account_number=data.account_number,
-        period_start=data.period_start,
-        period_end=data.period_end,
-        beginning_balance=data.beginning_balance,
-        ending_balance=data.ending_balance,
+    logger.info("Saving extracted data to the database...")
+
+    try:
+        statement_id = _upsert_statement(db, data, filename, source_hash, batch, statement_id)
+        # Commit all changes to the database in one transaction.
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logger.info("Saved statement to the database.", extra={"statement_id": statement_id, "file": filename})
+    return statement_id
+
+
+def save_statements_bulk(
+    db: Session,
+    items: list[tuple[pydantic_models.StatementData, str, str | None]],
+    artifacts: list[dict | None] | None = None,
+) -> list[int]:
+    """
+    Saves many parsed statements in a single database transaction: either all
+    of them are stored or, if anything fails, none are.
+
+    Args:
+        db (Session): The database session.
+        items (list): (StatementData, filename, source_hash) tuples.
+        artifacts (list, optional): Per item, its extraction artifacts
+            ({'pages': ..., 'chunks': ...}, see save_extraction_artifacts) or
+            None, so the statements can be re-extracted later.
+
+    Returns:
+        list[int]: The IDs of the saved statements, in the order given.
+    """
+    logger.info("Saving statements to the database in one transaction...", extra={"statements": len(items)})
+    artifacts = artifacts or [None] * len(items)
+    try:
+        statement_ids = [_upsert_statement(db, data, filename, source_hash) for data, filename, source_hash in items]
+        for statement_id, item_artifacts in zip(statement_ids, artifacts):
+            if item_artifacts is not None:
+                _write_extraction_artifacts(db, statement_id, item_artifacts.get("pages"), item_artifacts.get("chunks"))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info("Saved statements to the database.", extra={"statement_ids": statement_ids})
+    return statement_ids
+
+
+# --- Extraction Artifacts ---
+# The pages and partial extraction results of a statement, kept so that some
+# of its pages can be re-extracted later without redoing the others.
+
+def save_extraction_artifacts(db: Session, statement_id: int, pages: list[dict] | None = None, chunks: list[dict] | None = None):
+    """
+    Replaces the stored pages and/or chunks of a statement (None leaves them as they are).
+
+    Args:
+        db (Session): The database session.
+        statement_id (int): The statement the artifacts belong to.
+        pages (list[dict], optional): Structured pages ('page', 'text' and
+            optionally 'strategy', 'elements' and 'corrected').
+        chunks (list[dict], optional): Extraction chunks in merge order (see
+            b_extraction.extract_chunks).
+    """
+    try:
+        _write_extraction_artifacts(db, statement_id, pages, chunks)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    logger.info(
+        "Saved extraction artifacts.",
+        extra={
+            "statement_id": statement_id,
+            "pages": None if pages is None else len(pages),
+            "chunks": None if chunks is None else len(chunks),
+        },
     )
-    
-    # Create the associated Transaction records.
-    for trans in data.transactions:
-        db_transaction = db_models.Transaction(
-            date=trans.date,
-            description=trans.description,
-            debit=trans.debit,
-            credit=trans.credit,
-            balance=trans.balance,
-            statement=db_statement # This links the transaction to the statement
-        )
-        db.add(db_transaction)
-        
-    # Add the main statement record to the session.
-    db.add(db_statement)
-    
-    # Commit all changes to the database.
+
+
+def _write_extraction_artifacts(db: Session, statement_id: int, pages: list[dict] | None, chunks: list[dict] | None):
+    """Writes the artifacts of save_extraction_artifacts without committing."""
+    if pages is not None:
+        db.execute(delete(db_models.PageArtifact).where(db_models.PageArtifact.statement_id == statement_id))
+        if pages:
+            db.execute(insert(db_models.PageArtifact), [
+                {
+                    "statement_id": statement_id,
+                    "page": page["page"],
+                    "strategy": page.get("strategy"),
+                    "text": page["text"],
+                    "elements": page.get("elements"),
+                    "corrected": bool(page.get("corrected")),
+                }
+                for page in pages
+            ])
+    if chunks is not None:
+        db.execute(delete(db_models.ChunkArtifact).where(db_models.ChunkArtifact.statement_id == statement_id))
+        if chunks:
+            db.execute(insert(db_models.ChunkArtifact), [
+                {
+                    "statement_id": statement_id,
+                    "position": position,
+                    "source": chunk["source"],
+                    "pages": chunk["pages"],
+                    "status": chunk["status"],
+                    "result": chunk.get("result"),
+                    "error": chunk.get("error"),
+                }
+                for position, chunk in enumerate(chunks)
+            ])
+
+
+def list_page_artifacts(db: Session, statement_id: int) -> list[db_models.PageArtifact]:
+    """Returns the stored pages of a statement in page order."""
+    artifact = db_models.PageArtifact
+    return db.query(artifact).filter(artifact.statement_id == statement_id).order_by(artifact.page).all()
+
+
+def list_chunk_artifacts(db: Session, statement_id: int) -> list[db_models.ChunkArtifact]:
+    """Returns the stored extraction chunks of a statement in merge order."""
+    artifact = db_models.ChunkArtifact
+    return db.query(artifact).filter(artifact.statement_id == statement_id).order_by(artifact.position).all()
+
+
+# --- Read Functions ---
+
+def _escape_like(value: str) -> str:
+    """Escapes LIKE wildcards so user input is matched literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _apply_transaction_filters(query, filters: pydantic_models.TransactionFilters):
+    """Adds the WHERE clauses for the given filters to a Transaction query."""
+    transaction = db_models.Transaction
+    if filters.date_from is not None:
+        query = query.filter(transaction.date >= filters.date_from)
+    if filters.date_to is not None:
+        query = query.filter(transaction.date <= filters.date_to)
+    if filters.kind == "debit":
+        query = query.filter(transaction.debit > 0)
+    elif filters.kind == "credit":
+        query = query.filter(transaction.credit > 0)
+
+    # The amount of a row is its debit or its credit, whichever is set.
+    if filters.min_amount is not None or filters.max_amount is not None:
+        def in_range(column):
+            condition = column > 0
+            if filters.min_amount is not None:
+                condition = condition & (column >= filters.min_amount)
+            if filters.max_amount is not None:
+                condition = condition & (column <= filters.max_amount)
+            return condition
+
+        if filters.kind == "debit":
+            query = query.filter(in_range(transaction.debit))
+        elif filters.kind == "credit":
+            query = query.filter(in_range(transaction.credit))
+        else:
+            query = query.filter(or_(in_range(transaction.debit), in_range(transaction.credit)))
+
+    if filters.description:
+        query = query.filter(transaction.description.ilike(f"%{_escape_like(filters.description)}%", escape="\\"))
+    return query
+
+
+def list_statements(db: Session, limit: int, before_id: int | None = None, account_number: str | None = None):
+    """
+    Returns one page of statements, newest first, using keyset pagination.
+
+    Args:
+        db (Session): The database session.
+        limit (int): Maximum number of statements to return.
+        before_id (int, optional): Cursor: only statements with a smaller ID.
+        account_number (str, optional): Only statements of this account.
+
+    Returns:
+        tuple: (list of Statement rows, cursor for the next page or None).
+    """
+    statement = db_models.Statement
+    query = db.query(statement)
+    if before_id is not None:
+        query = query.filter(statement.id < before_id)
+    if account_number:
+        query = query.filter(statement.account_number == account_number)
+
+    # Fetch one extra row to know whether there is a next page.
+    rows = query.order_by(statement.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def get_statement(db: Session, statement_id: int) -> db_models.Statement | None:
+    """Returns the Statement with the given ID, or None if it does not exist."""
+    return db.get(db_models.Statement, statement_id)
+
+
+def list_statement_transactions(db: Session, statement_id: int, limit: int, after_id: int | None = None, filters: pydantic_models.TransactionFilters | None = None):
+    """
+    Returns one page of a statement's transactions in statement order, using
+    keyset pagination on the (statement_id, id) index.
+
+    Returns:
+        tuple: (list of Transaction rows, cursor for the next page or None).
+    """
+    transaction = db_models.Transaction
+    query = db.query(transaction).filter(transaction.statement_id == statement_id)
+    if after_id is not None:
+        query = query.filter(transaction.id > after_id)
+    query = _apply_transaction_filters(query, filters or pydantic_models.TransactionFilters())
+
+    rows = query.order_by(transaction.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def search_transactions(db: Session, limit: int, before_id: int | None = None, filters: pydantic_models.TransactionFilters | None = None):
+    """
+    Searches transactions across all statements, most recently stored first,
+    using keyset pagination on the primary key.
+
+    Returns:
+        tuple: (list of Transaction rows, cursor for the next page or None).
+    """
+    transaction = db_models.Transaction
+    query = db.query(transaction)
+    if before_id is not None:
+        query = query.filter(transaction.id < before_id)
+    query = _apply_transaction_filters(query, filters or pydantic_models.TransactionFilters())
+
+    rows = query.order_by(transaction.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def iter_transaction_rows(
+    db: Session,
+    statement_id: int | None = None,
+    filters: pydantic_models.TransactionFilters | None = None,
+    batch_size: int = 5000,
+):
+    """
+    Yields the matching transactions (of one statement, or of all of them) in
+    batches of at most 'batch_size' rows, in storage order. Each batch is one
+    keyset-paginated query, so memory use does not grow with the result.
+
+    Yields:
+        list[tuple]: (statement_id, date, date_text, description, debit,
+                     credit, balance) rows.
+    """
+    transaction = db_models.Transaction
+    columns = (
+        transaction.id, transaction.statement_id, transaction.date, transaction.date_text,
+        transaction.description, transaction.debit, transaction.credit, transaction.balance,
+    )
+    filters = filters or pydantic_models.TransactionFilters()
+    after_id = 0
+    while True:
+        query = db.query(*columns).filter(transaction.id > after_id)
+        if statement_id is not None:
+            query = query.filter(transaction.statement_id == statement_id)
+        rows = _apply_transaction_filters(query, filters).order_by(transaction.id).limit(batch_size).all()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield [tuple(row[1:]) for row in rows]
+        if len(rows) < batch_size:
+            return
+
+
+# --- Aggregation Functions ---
+
+def _totals(count, debit, credit) -> dict:
+    debit, credit = round(debit or 0.0, 2), round(credit or 0.0, 2)
+    return {"count": count, "debit": debit, "credit": credit, "net": round(credit - debit, 2)}
+
+
+def _as_date(value) -> datetime.date | None:
+    # SQLite returns the computed week/month starts as 'YYYY-MM-DD' text.
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
+
+
+def aggregate_statement(
+    db: Session,
+    statement_id: int,
+    period: str = "month",
+    top: int = 10,
+    filters: pydantic_models.TransactionFilters | None = None,
+) -> dict | None:
+    """
+    Sums a statement's debits and credits in total, per day/week/month, per
+    category and for its top counterparties, with GROUP BY queries (see
+    analytics.py). Results are cached until the statement changes.
+
+    Args:
+        db (Session): The database session.
+        statement_id (int): The statement to aggregate.
+        period (str): 'day', 'week' (starting on Monday) or 'month'.
+        top (int): How many counterparties to return, by turnover.
+        filters (TransactionFilters, optional): Only aggregate matching rows.
+
+    Returns:
+        dict | None: 'totals', 'periods', 'categories' and 'counterparties'
+                     (each with 'count', 'debit', 'credit' and 'net'), or None
+                     if the statement does not exist.
+    """
+    db_statement = db.get(db_models.Statement, statement_id)
+    if db_statement is None:
+        return None
+    filters = filters or pydantic_models.TransactionFilters()
+    key = ("statement", statement_id, db_statement.updated_at, period, top, filters.model_dump_json())
+    return analytics.cached(
+        key, settings.AGGREGATES_CACHE_ENTRIES, lambda: _aggregate_statement(db, statement_id, period, top, filters),
+    )
+
+
+def _aggregate_statement(db: Session, statement_id: int, period: str, top: int, filters: pydantic_models.TransactionFilters) -> dict:
+    transaction = db_models.Transaction
+
+    def grouped(*columns):
+        query = db.query(
+            *columns, func.count(transaction.id), func.sum(transaction.debit), func.sum(transaction.credit),
+        ).filter(transaction.statement_id == statement_id)
+        return _apply_transaction_filters(query, filters)
+
+    totals = _totals(*grouped().one())
+
+    bucket = analytics.period_expression(db, transaction.date, period).label("period")
+    periods = [
+        {"period": _as_date(value), **_totals(count, debit, credit)}
+        for value, count, debit, credit in grouped(bucket).group_by(bucket).all()
+    ]
+    # Undated rows (unparseable dates) go last.
+    periods.sort(key=lambda row: (row["period"] is None, row["period"] or datetime.date.min))
+
+    category = analytics.category_expression(transaction.description).label("category")
+    categories = [
+        {"name": name, **_totals(count, debit, credit)}
+        for name, count, debit, credit in grouped(category).group_by(category).all()
+    ]
+    categories.sort(key=lambda row: row["debit"] + row["credit"], reverse=True)
+
+    # The database groups identical descriptions; descriptions that differ only
+    # in references or numbers are then folded into one counterparty here.
+    counterparties: dict[str, dict] = {}
+    for description, count, debit, credit in grouped(transaction.description).group_by(transaction.description).all():
+        name = analytics.counterparty_name(description)
+        row = counterparties.setdefault(name.casefold(), {"name": name, "count": 0, "debit": 0.0, "credit": 0.0})
+        row["count"] += count
+        row["debit"] += debit or 0.0
+        row["credit"] += credit or 0.0
+    ranked = sorted(counterparties.values(), key=lambda row: row["debit"] + row["credit"], reverse=True)[:top]
+
+    return {
+        "statement_id": statement_id,
+        "period": period,
+        "totals": totals,
+        "periods": periods,
+        "categories": categories,
+        "counterparties": [
+            {"name": row["name"], **_totals(row["count"], row["debit"], row["credit"])} for row in ranked
+        ],
+    }
+
+
+def full_text_search_transactions(db: Session, query: str, limit: int, offset: int = 0):
+    """
+    Searches transaction descriptions across all statements through the
+    full-text index, most relevant first.
+
+    Ranked results cannot use keyset pagination on the ID, so pages are
+    addressed by offset instead.
+
+    Returns:
+        tuple: (list of (Transaction row, score) pairs, offset of the next page or None).
+    """
+    matches = search.search_descriptions(db, query, limit=limit + 1, offset=offset)
+    next_offset = offset + limit if len(matches) > limit else None
+    matches = matches[:limit]
+
+    by_id = {
+        row.id: row
+        for row in db.query(db_models.Transaction).filter(db_models.Transaction.id.in_([id_ for id_, _ in matches]))
+    }
+    # The index can briefly list a row another process has just deleted; skip it.
+    hits = [(by_id[id_], score) for id_, score in matches if id_ in by_id]
+    return hits, next_offset
+
+
+# --- Job CRUD Functions ---
+
+def create_job(db: Session, filename: str) -> db_models.Job:
+    """
+    Creates a new background job record in the 'queued' state.
+
+    Args:
+        db (Session): The database session.
+        filename (str): The original filename of the uploaded document.
+
+    Returns:
+        db_models.Job: The newly created Job record.
+    """
+    db_job = db_models.Job(id=str(uuid.uuid4()), filename=filename, status="queued", stage="queued", progress=0)
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: str) -> db_models.Job | None:
+    """Returns the Job with the given ID, or None if it does not exist."""
+    return db.get(db_models.Job, job_id)
+
+
+def update_job(db: Session, job_id: str, **fields) -> db_models.Job | None:
+    """
+    Updates the given columns of a Job record and commits the change.
+
+    Args:
+        db (Session): The database session.
+        job_id (str): The ID of the job to update.
+        **fields: Column values to set, e.g. status="running", stage="extracting".
+
+    Returns:
+        db_models.Job | None: The updated Job, or None if it does not exist.
+    """
+    db_job = db.get(db_models.Job, job_id)
+    if db_job is None:
+        return None
+    for key, value in fields.items():
+        setattr(db_job, key, value)
+    db.commit()
+    return db_job
+
+
+def fail_unfinished_jobs(db: Session, reason: str) -> int:
+    """
+    Marks every 'queued' or 'running' job as failed.
+
+    The worker pool lives in memory, so jobs that were in flight when the server
+    stopped can never finish. This is called at startup so clients polling those
+    jobs get a clear error instead of waiting forever.
+
+    Returns:
+        int: The number of jobs that were marked as failed.
+    """
+    count = (
+        db.query(db_models.Job)
+        .filter(db_models.Job.status.in_(("queued", "running")))
+        .update({"status": "failed", "error": reason}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
+# --- Stat Counter Functions ---
+
+def increment_stat(db: Session, name: str, count: int = 1, total: float = 0.0):
+    """
+    Atomically adds to a named counter in the 'pipeline_stats' table, creating
+    it on first use. Safe to call from several worker processes at once.
+
+    Args:
+        db (Session): The database session.
+        name (str): The counter name, e.g. 'cache.structure.hit'.
+        count (int): How much to add to the counter.
+        total (float): How much to add to the counter's running total (e.g. seconds).
+    """
+    stat = db_models.PipelineStat
+    values = {"count": stat.count + count, "total": stat.total + total}
+    if db.execute(update(stat).where(stat.name == name).values(**values)).rowcount == 0:
+        try:
+            db.add(stat(name=name, count=count, total=total))
+            db.commit()
+            return
+        except IntegrityError:
+            # Another process created the row first; add to theirs instead.
+            db.rollback()
+            db.execute(update(stat).where(stat.name == name).values(**values))
     db.commit()
-    
-    # Refresh the statement object to get its newly assigned ID from the database.
-    db.refresh(db_statement)
-    
-    print(f"Successfully saved Statement ID: {db_statement.id} for file '{filename}' to the database.")
-    return db_statement
\ No newline at end of file
+
+
+def get_stats(db: Session, prefix: str = "") -> dict:
+    """Returns {name: {'count': ..., 'total': ...}} for counters starting with prefix."""
+    stat = db_models.PipelineStat
+    rows = db.query(stat).filter(stat.name.startswith(prefix)).all()
+    return {row.name: {"count": row.count, "total": row.total} for row in rows}
+
+
+# --- Shared Rate Limits ---
+# Token buckets in the 'rate_limits' table. A bucket holds up to 'capacity'
+# tokens and refills at 'per_second'. Updates use optimistic concurrency: a
+# process reads the bucket, computes the new level and writes it only if no
+# other process changed the row in between, retrying otherwise. That works the
+# same on SQLite and Postgres and never holds a lock while waiting.
+
+def _change_bucket(db: Session, name: str, capacity: float, per_second: float, change) -> tuple[float, bool]:
+    """
+    Applies change(current tokens) -> new tokens (or None to leave the bucket
+    alone) to a bucket after refilling it. When another process changes the
+    bucket in between, the change is decided again on the new level.
+
+    Returns:
+        tuple[float, bool]: The refilled level the final attempt saw, and
+                            whether that attempt changed the bucket.
+    """
+    bucket = db_models.RateLimitBucket
+    while True:
+        now = time.time()
+        row = db.execute(select(bucket.tokens, bucket.updated_at).where(bucket.name == name)).first()
+        if row is None:
+            new = change(capacity)
+            try:
+                db.add(bucket(name=name, tokens=capacity if new is None else new, updated_at=now))
+                db.commit()
+                return capacity, new is not None
+            except IntegrityError:
+                # Another process created the bucket first; use theirs.
+                db.rollback()
+                continue
+
+        tokens = min(capacity, row.tokens + max(0.0, now - row.updated_at) * per_second)
+        new = change(tokens)
+        if new is None:
+            db.rollback()  # Ends the read transaction.
+            return tokens, False
+        result = db.execute(
+            update(bucket)
+            .where(bucket.name == name, bucket.updated_at == row.updated_at)
+            .values(tokens=new, updated_at=now)
+        )
+        db.commit()
+        if result.rowcount == 1:
+            return tokens, True
+
+
+def take_tokens(db: Session, name: str, cost: float, capacity: float, per_second: float, force: bool = False) -> float:
+    """
+    Takes 'cost' tokens from a shared bucket, creating it full on first use.
+
+    Args:
+        db (Session): The database session.
+        name (str): The bucket name, e.g. 'llm.requests:gpt-4o-mini'.
+        cost (float): Tokens to take. Costs above the capacity are capped to it.
+        capacity (float): Most tokens the bucket holds (the allowed burst).
+        per_second (float): Refill rate.
+        force (bool): Take the tokens even if the bucket runs negative (to
+                      charge for work that has already happened).
+
+    Returns:
+        float: 0.0 if the tokens were taken, otherwise the seconds until
+               enough tokens will be available (nothing is taken then).
+    """
+    cost = min(cost, capacity)
+
+    def change(tokens: float):
+        return tokens - cost if tokens >= cost or force else None
+
+    tokens, taken = _change_bucket(db, name, capacity, per_second, change)
+    return 0.0 if taken else (cost - tokens) / per_second
+
+
+def drain_bucket(db: Session, name: str, capacity: float, per_second: float, seconds: float):
+    """
+    Empties a shared bucket so that its next token becomes available after
+    'seconds', e.g. when the provider answered HTTP 429 with a Retry-After.
+    """
+    penalty = 1 - seconds * per_second
+    _change_bucket(db, name, capacity, per_second, lambda tokens: penalty if tokens > penalty else None)
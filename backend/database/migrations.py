@@ -0,0 +1,117 @@
+# --- Imports ---
+import logging
+from sqlalchemy import inspect, text, String
+from sqlalchemy.engine import Connection, Engine
+
+from .database import Base
+from ..utils.dates import parse_statement_date
+
+logger = logging.getLogger(__name__)
+
+# --- Schema Upgrades ---
+# create_all() only creates missing tables; it never changes existing ones.
+# A database created by an older version therefore lacks the columns and
+# indexes added since, and the first insert fails. upgrade_schema() runs at
+# startup, after create_all(), and brings such a database up to date:
+#
+#   - missing columns are added (nullable, so existing rows stay valid),
+#   - missing indexes are created,
+#   - dates that older versions stored as text ('01/31/2025', or 'mm/dd/yyyy'
+#     when the LLM found none) are parsed into real dates. The extracted text
+#     of transaction dates is kept in 'date_text'. On Postgres the columns are
+#     then converted to DATE; SQLite stores both in the same way.
+
+# Rows updated per UPDATE during the date backfill.
+BACKFILL_BATCH_ROWS = 5000
+
+# Per table: the columns that hold real dates now and held the extracted text
+# before, mapped to the column their original text is copied to (if any), and
+# the column added in the same release. SQLite keeps a column's declared type,
+# so there the dates are converted when that column is added.
+_DATE_COLUMNS = {
+    "transactions": ({"date": "date_text"}, "date_text"),
+    "statements": ({"period_start": None, "period_end": None}, "updated_at"),
+}
+
+
+def upgrade_schema(engine: Engine) -> list[str]:
+    """
+    Adds the columns and indexes an existing database is missing and converts
+    its text dates (see the section comment).
+
+    Returns:
+        list[str]: The changes made, e.g. ['transactions.date_text'] (empty if
+                   the database was already up to date).
+    """
+    changes: list[str] = []
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue  # Just created by create_all(), so it is complete.
+            columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+
+            added = []
+            for column in table.columns:
+                if column.name not in columns:
+                    column_type = column.type.compile(dialect=connection.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                    added.append(column.name)
+            changes.extend(f"{table.name}.{name}" for name in added)
+
+            date_columns, added_with = _DATE_COLUMNS.get(table.name, ({}, None))
+            if connection.dialect.name == "sqlite":
+                text_dates = date_columns if added_with in added else {}
+            else:
+                text_dates = {
+                    name: target for name, target in date_columns.items()
+                    if name in columns and isinstance(columns[name]["type"], String)
+                }
+            if text_dates:
+                _backfill_dates(connection, table.name, text_dates)
+                changes.extend(f"{table.name}.{name} (dates)" for name in text_dates)
+            if "updated_at" in added and "created_at" in columns:
+                connection.execute(text(f"UPDATE {table.name} SET updated_at = created_at"))
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(connection)
+                    changes.append(index.name)
+
+    if changes:
+        logger.info("Upgraded the database schema.", extra={"changes": changes})
+    return changes
+
+
+def _backfill_dates(connection: Connection, table: str, columns: dict[str, str | None]):
+    """Parses the text dates of 'columns' into ISO dates, copying the text to its target column first."""
+    names = list(columns)
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text(f"SELECT id, {', '.join(names)} FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_ROWS},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for row in rows:
+            values = {"id": row[0]}
+            for name, value in zip(names, row[1:]):
+                parsed = parse_statement_date(value) if isinstance(value, str) else value
+                values[name] = parsed.isoformat() if parsed is not None else None
+                if columns[name] is not None:
+                    values[columns[name]] = value
+            updates.append(values)
+        assignments = ", ".join(
+            [f"{name} = :{name}" for name in names] + [f"{target} = :{target}" for target in columns.values() if target]
+        )
+        connection.execute(text(f"UPDATE {table} SET {assignments} WHERE id = :id"), updates)
+
+    if connection.dialect.name == "postgresql":
+        for name in names:
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {name} TYPE DATE USING {name}::date"))
+    logger.info("Converted text dates.", extra={"table": table, "columns": names})
@@ -1,6 +1,6 @@
 # --- Imports ---
 import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, ForeignKey, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -13,12 +13,16 @@ class Statement(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, index=True)
     account_holder = Column(String)
-    account_number = Column(String)
-    period_start = Column(String)
-    period_end = Column(String)
+    account_number = Column(String, index=True)
+    # Real dates (None when the statement did not state a usable period).
+    period_start = Column(Date)
+    period_end = Column(Date)
     beginning_balance = Column(Float)
     ending_balance = Column(Float)
+    # SHA-256 of the uploaded file, used to recognise a re-ingested statement.
+    source_hash = Column(String(64), index=True, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     # This creates the one-to-many relationship.
     # A single Statement can have multiple Transaction records.
@@ -29,7 +33,10 @@ class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(String)
+    # The normalised date, used for filtering and sorting, and the date exactly
+    # as extracted (it may include a time or be unparseable).
+    date = Column(Date)
+    date_text = Column(String)
     description = Column(String)
     debit = Column(Float)
     credit = Column(Float)
@@ -39,4 +46,129 @@ class Transaction(Base):
     statement_id = Column(Integer, ForeignKey("statements.id"))
     
     # This defines the many-to-one relationship back to the Statement.
-    statement = relationship("Statement", back_populates="transactions")
\ No newline at end of file
+    statement = relationship("Statement", back_populates="transactions")
+
+    # Indexes for the read API: rows of one statement in order, rows of one
+    # statement in a date range, and cross-statement date/amount filters.
+    __table_args__ = (
+        Index("ix_transactions_statement_id_id", "statement_id", "id"),
+        Index("ix_transactions_statement_id_date", "statement_id", "date"),
+        Index("ix_transactions_date_id", "date", "id"),
+        Index("ix_transactions_debit", "debit"),
+        Index("ix_transactions_credit", "credit"),
+    )
+
+class PageArtifact(Base):
+    """
+    Defines the 'page_artifacts' table: the structured text of every page of a
+    stored statement, so that pages can be re-extracted without running the
+    structuring stage (OCR) again.
+    """
+    __tablename__ = "page_artifacts"
+
+    id = Column(Integer, primary_key=True)
+    statement_id = Column(Integer, ForeignKey("statements.id"), nullable=False)
+    page = Column(Integer, nullable=False)
+    # The structuring strategy ('fast' for the PDF text layer, 'hi_res' for OCR) or 'corrected'.
+    strategy = Column(String)
+    text = Column(Text)
+    # The page's elements as recorded by structuring (None once corrected).
+    elements = Column(JSON, nullable=True)
+    # True once a user replaced the structured text with a correction.
+    corrected = Column(Boolean, default=False)
+
+    __table_args__ = (
+        Index("ix_page_artifacts_statement_id_page", "statement_id", "page", unique=True),
+    )
+
+class ChunkArtifact(Base):
+    """
+    Defines the 'chunk_artifacts' table: the partial extraction results a
+    stored statement was merged from (one per LLM call, plus one for the
+    transactions read from table grids). Re-extraction reuses the ones whose
+    pages were not changed.
+    """
+    __tablename__ = "chunk_artifacts"
+
+    id = Column(Integer, primary_key=True)
+    statement_id = Column(Integer, ForeignKey("statements.id"), nullable=False)
+    # The order the chunks are merged in.
+    position = Column(Integer, nullable=False)
+    # One of: 'table', 'llm', 'template'.
+    source = Column(String)
+    # The page numbers the chunk was extracted from.
+    pages = Column(JSON)
+    # One of: 'ok', 'failed'. Failed chunks have an 'error' and no 'result'.
+    status = Column(String, default="ok")
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_chunk_artifacts_statement_id_position", "statement_id", "position"),
+    )
+
+class Job(Base):
+    """Defines the 'jobs' table that tracks background processing jobs."""
+    __tablename__ = "jobs"
+
+    # A UUID string, so job IDs cannot be guessed by enumerating integers.
+    id = Column(String(36), primary_key=True, index=True)
+    filename = Column(String)
+
+    # One of: 'queued', 'running', 'succeeded', 'failed'.
+    status = Column(String, index=True, default="queued")
+
+    # The pipeline stage currently running (e.g. 'structuring', 'extracting')
+    # and an approximate completion percentage for the frontend.
+    stage = Column(String, default="queued")
+    progress = Column(Integer, default=0)
+
+    # The final, enriched statement data once the job has succeeded.
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    # Links the job to the statement it produced, once it has been saved.
+    statement_id = Column(Integer, ForeignKey("statements.id"), nullable=True)
+
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class CacheEntry(Base):
+    """Defines the 'cache_entries' table that stores reusable pipeline results."""
+    __tablename__ = "cache_entries"
+
+    # The cache key, e.g. 'structure:<sha256 of file>:<pipeline version>'.
+    key = Column(String, primary_key=True)
+    kind = Column(String, index=True)
+    payload = Column(JSON)
+    size_bytes = Column(Integer)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+    last_accessed_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
+
+class PipelineStat(Base):
+    """
+    Defines the 'pipeline_stats' table: simple named counters shared by all
+    worker processes (e.g. cache hits and misses).
+    """
+    __tablename__ = "pipeline_stats"
+
+    name = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    total = Column(Float, default=0.0)
+
+class RateLimitBucket(Base):
+    """
+    Defines the 'rate_limits' table: token buckets shared by all worker
+    processes, so a rate limit holds for the whole deployment (e.g. the LLM
+    provider's requests per minute) rather than per process.
+    """
+    __tablename__ = "rate_limits"
+
+    name = Column(String, primary_key=True)
+    # Tokens left at 'updated_at' (a Unix timestamp). Negative after a penalty,
+    # i.e. when the provider asked us to back off for a while.
+    tokens = Column(Float, default=0.0)
+    updated_at = Column(Float, default=0.0)
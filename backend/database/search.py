@@ -0,0 +1,164 @@
+# --- Imports ---
+import logging
+import re
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# --- Full-Text Search over Transaction Descriptions ---
+# SQLite: an external-content FTS5 table ('transactions_fts') whose rowids are
+# the transaction IDs. It stores only the index, not a second copy of the text,
+# and crud keeps it in sync whenever transactions are inserted or replaced.
+# Postgres: a GIN index on to_tsvector(description), which the database keeps
+# up to date by itself.
+#
+# A MATCH query only touches the posting lists of its terms, so a search stays
+# in the low milliseconds even with millions of rows, as long as the page size
+# is bounded (see MAX_RESULTS).
+
+FTS_TABLE = "transactions_fts"
+PG_INDEX = "ix_transactions_description_fts"
+MAX_RESULTS = 200
+
+# Per-process cache of whether the SQLite FTS table exists.
+_fts_ready = False
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """
+    Creates the full-text index if it does not exist yet and fills it with the
+    transactions that are already stored. Called once at startup.
+
+    Returns:
+        bool: True if full-text search is available, False if the database
+              does not support it (searches then fall back to LIKE).
+    """
+    global _fts_ready
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+            ).first()
+            if exists is None:
+                try:
+                    connection.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "description, content='transactions', content_rowid='id')"
+                    ))
+                except Exception as e:
+                    logger.warning("SQLite FTS5 is not available, description search will use LIKE: %s", e)
+                    return False
+                # Index the rows that were stored before the index existed.
+                connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                logger.info("Created the transaction full-text index.")
+            _fts_ready = True
+            return True
+
+        if engine.dialect.name == "postgresql":
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON transactions "
+                "USING GIN (to_tsvector('simple', coalesce(description, '')))"
+            ))
+            return True
+
+    return False
+
+
+def _sqlite_fts_ready(db: Session) -> bool:
+    """Returns True if this SQLite database has the FTS table (cached once found)."""
+    global _fts_ready
+    if not _fts_ready:
+        _fts_ready = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first() is not None
+    return _fts_ready
+
+
+# --- Keeping the Index in Sync ---
+
+def index_statement(db: Session, statement_id: int):
+    """Adds a statement's transactions to the index. Call after inserting them."""
+    if db.get_bind().dialect.name == "sqlite" and _sqlite_fts_ready(db):
+        db.execute(
+            text(f"INSERT INTO {FTS_TABLE}(rowid, description) SELECT id, description FROM transactions WHERE statement_id = :sid"),
+            {"sid": statement_id},
+        )
+
+
+def unindex_statement(db: Session, statement_id: int):
+    """Removes a statement's transactions from the index. Call before deleting them."""
+    if db.get_bind().dialect.name == "sqlite" and _sqlite_fts_ready(db):
+        # External-content FTS5 tables need the old values to remove a row.
+        db.execute(
+            text(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description) "
+                "SELECT 'delete', id, description FROM transactions WHERE statement_id = :sid"
+            ),
+            {"sid": statement_id},
+        )
+
+
+# --- Searching ---
+
+def _terms(query: str) -> list[str]:
+    """Splits a user query into search terms, dropping FTS operators and punctuation."""
+    return re.findall(r"\w+", query.lower())
+
+
+def search_descriptions(db: Session, query: str, limit: int, offset: int = 0) -> list[tuple[int, float]]:
+    """
+    Runs a ranked full-text search over transaction descriptions.
+
+    Every term must match; the last term also matches as a prefix, so partial
+    input like 'amaz' finds 'AMAZON'. Punctuation splits terms, so a UPI ID
+    like 'name@okaxis' matches as 'name' followed by 'okaxis'.
+
+    Args:
+        db (Session): The database session.
+        query (str): The user's search text.
+        limit (int): Page size (capped at MAX_RESULTS).
+        offset (int): Number of ranked results to skip.
+
+    Returns:
+        list[tuple[int, float]]: (transaction ID, relevance score) pairs, best
+                                 match first. Higher scores are better.
+    """
+    terms = _terms(query)
+    if not terms:
+        return []
+    limit = min(limit, MAX_RESULTS)
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite" and _sqlite_fts_ready(db):
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        rows = db.execute(
+            text(
+                f"SELECT rowid, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+                f"WHERE {FTS_TABLE} MATCH :match ORDER BY rank LIMIT :limit OFFSET :offset"
+            ),
+            {"match": match, "limit": limit, "offset": offset},
+        ).all()
+        # bm25() is lower-is-better; flip it so all backends rank high-to-low.
+        return [(row[0], -row[1]) for row in rows]
+
+    if dialect == "postgresql":
+        tsquery = " & ".join(terms) + ":*"
+        rows = db.execute(
+            text(
+                "SELECT id, ts_rank(to_tsvector('simple', coalesce(description, '')), to_tsquery('simple', :q)) AS rank "
+                "FROM transactions WHERE to_tsvector('simple', coalesce(description, '')) @@ to_tsquery('simple', :q) "
+                "ORDER BY rank DESC, id DESC LIMIT :limit OFFSET :offset"
+            ),
+            {"q": tsquery, "limit": limit, "offset": offset},
+        ).all()
+        return [(row[0], float(row[1])) for row in rows]
+
+    # No full-text support: unranked substring match, newest first.
+    pattern = "%" + "%".join(terms) + "%"
+    rows = db.execute(
+        text("SELECT id FROM transactions WHERE lower(description) LIKE :pattern ORDER BY id DESC LIMIT :limit OFFSET :offset"),
+        {"pattern": pattern, "limit": limit, "offset": offset},
+    ).all()
+    return [(row[0], 0.0) for row in rows]
@@ -1,24 +1,177 @@
 # --- Imports ---
-from fastapi import FastAPI
+import time
+import logging
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from .api.v1 import endpoints
 from .database import database # <-- NEW IMPORT
+from .database import crud
+from .database import search
+from .database import migrations
+from .utils import job_queue
+from .utils.file_handler import sweep_temp_dir
+from .core.config import settings
+from .core import metrics
+from .core.log_config import configure_logging
 
-# --- Create Database Tables ---
-# This line tells SQLAlchemy to create all the tables defined in our
-# database/models.py file if they don't already exist.
-database.Base.metadata.create_all(bind=database.engine)
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# --- Readiness State ---
+# Filled in by the startup phase and reported by /healthz/ready. Load balancers
+# should only route traffic to instances that report ready.
+readiness = {"ready": False, "stage": "starting", "warmup_seconds": None, "workers": [], "error": None}
+
+# --- Temp File Sweeper ---
+async def sweep_temp_files_periodically():
+    """
+    Deletes orphaned uploads from temp_uploads/ at startup and then every
+    TEMP_SWEEP_INTERVAL_SECONDS, until the application shuts down.
+    """
+    while True:
+        try:
+            removed = await asyncio.to_thread(sweep_temp_dir, settings.TEMP_FILE_MAX_AGE_SECONDS)
+            if removed:
+                logger.info("Removed orphaned temporary files.", extra={"files": removed})
+        except Exception:
+            logger.exception("Temporary file sweep failed.")
+        await asyncio.sleep(settings.TEMP_SWEEP_INTERVAL_SECONDS)
+
+# --- Warm-Up ---
+async def warm_up():
+    """
+    Preloads the OCR/layout models and OpenCV in this process, then starts the
+    pipeline workers, which are forked from it and so inherit the loaded
+    models. Marks the instance ready when done.
+
+    Runs in the background so the server answers /healthz/live right away.
+    """
+    try:
+        if settings.MODEL_WARMUP:
+            readiness["stage"] = "loading_models"
+            # Imported here: the pipeline libraries are heavy and only needed
+            # in the API process when it warms them up for its workers.
+            from .processing_pipeline.a_structuring import warm_up as warm_up_models
+            readiness["warmup_seconds"] = round(await asyncio.to_thread(warm_up_models), 2)
+        if settings.WORKER_PREFORK:
+            readiness["stage"] = "starting_workers"
+            readiness["workers"] = await asyncio.to_thread(job_queue.start_workers, settings.MODEL_WARMUP)
+        readiness["stage"] = "ready"
+    except Exception as e:
+        # The models will still be loaded lazily on the first document, so a
+        # failed warm-up makes the instance slow, not broken.
+        logger.exception("Warm-up failed; models will load on first use.")
+        readiness["stage"] = "ready_cold"
+        readiness["error"] = str(e)
+    finally:
+        # Requests that arrived during the warm-up were held back until now.
+        job_queue.startup_finished.set()
+    readiness["ready"] = True
+
+# --- Application Lifespan ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Runs setup code before the server starts accepting requests and cleanup
+    code after it stops.
+    """
+    # Create the tables defined in database/models.py if they don't exist yet.
+    # Doing it here rather than at import time keeps importing the app cheap.
+    database.Base.metadata.create_all(bind=database.engine)
+    # ...and add the columns and indexes that a database created by an older
+    # version is missing (create_all never changes existing tables).
+    migrations.upgrade_schema(database.engine)
+
+    # Jobs that were queued or running when the server last stopped were lost
+    # together with the in-memory worker pool, so mark them as failed.
+    db = database.SessionLocal()
+    try:
+        stale = crud.fail_unfinished_jobs(db, reason="Interrupted by a server restart. Please upload the document again.")
+        if stale:
+            logger.warning("Marked interrupted jobs as failed.", extra={"jobs": stale})
+    finally:
+        db.close()
+
+    # Create the full-text index over transaction descriptions (and index any
+    # rows stored before it existed).
+    search.ensure_search_index(database.engine)
+
+    sweeper = asyncio.create_task(sweep_temp_files_periodically())
+    warmer = asyncio.create_task(warm_up())
+
+    yield
+
+    sweeper.cancel()
+    warmer.cancel()
+
+    # Stop the pipeline worker processes.
+    job_queue.shutdown_executor()
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="IntelliStatement API",
     description="The backend service for the IntelliStatement application, handling PDF/image processing and data extraction.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+# --- Request Metrics ---
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Times every request for http_request_seconds and, if SERVER_TIMING is on,
+    reports the pipeline stage durations of the request in a Server-Timing
+    header (browsers show it in the network panel's timing tab).
+    """
+    started = time.perf_counter()
+    spans = metrics.start_request()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    # Label by route template ('/api/v1/statements/{statement_id}'), not the
+    # raw path, so each endpoint is one series.
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        elapsed, method=request.method, route=getattr(route, "path", "unmatched"), status=response.status_code,
+    )
+    if settings.SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing(spans, elapsed)
+    return response
+
 # --- Root Endpoint ---
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the IntelliStatement Backend API!"}
 
+# --- Health Endpoints ---
+@app.get("/healthz/live", tags=["Health"])
+async def liveness():
+    """The process is up and serving requests (it may still be warming up)."""
+    return {"status": "alive"}
+
+@app.get("/healthz/ready", tags=["Health"])
+async def readiness_check():
+    """
+    200 once the models are loaded, the workers are running and the database
+    answers; 503 before that, so load balancers only route to warm instances.
+    """
+    database_ok = True
+    try:
+        await asyncio.to_thread(database.ping)
+    except Exception as e:
+        database_ok = False
+        logger.warning("Readiness check: database unavailable: %s", e)
+
+    ready = readiness["ready"] and database_ok
+    return JSONResponse(status_code=200 if ready else 503, content={**readiness, "ready": ready, "database": database_ok})
+
+# --- Metrics Endpoint ---
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def get_metrics():
+    """Request, pipeline stage, LLM and queue metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # --- Include API Routers ---
 app.include_router(endpoints.router, prefix="/api/v1", tags=["Processing"])
\ No newline at end of file
@@ -0,0 +1,160 @@
+# --- Imports ---
+import logging
+import time
+from io import BytesIO
+import cv2
+import numpy as np
+from PIL import Image
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Image Preprocessing ---
+# Phone photos of statements are typically 12 MP or more, slightly rotated and
+# unevenly lit. OCR time grows with the pixel count, and neither rotation nor
+# shadows help accuracy, so every image goes through these steps first:
+#
+#   1. Downscale to about IMAGE_TARGET_DPI (300 DPI is what OCR engines are
+#      tuned for; more pixels only cost time).
+#   2. Deskew, so text lines are horizontal.
+#   3. Threshold to black and white. Adaptive thresholding copes with shadows
+#      and gradients that defeat a single global (Otsu) threshold.
+#   4. Encode as PNG, which is lossless, so no JPEG artefacts reach the OCR.
+
+# An A4/Letter page is about 11 inches on its long side.
+_PAGE_LONG_SIDE_INCHES = 11.0
+
+
+def _image_dpi(image_bytes: bytes) -> float | None:
+    """Returns the DPI stored in the image metadata, if it is plausible."""
+    try:
+        with Image.open(BytesIO(image_bytes)) as img:
+            dpi = img.info.get("dpi")
+    except Exception:
+        return None
+    if not dpi:
+        return None
+    value = float(dpi[0])
+    # Cameras write 72 (or 0/1) regardless of what they photographed, so values
+    # that low say nothing about the real resolution of the page.
+    return value if value > 100 else None
+
+
+def downscale(gray: np.ndarray, dpi: float | None) -> np.ndarray:
+    """
+    Shrinks the image to roughly IMAGE_TARGET_DPI.
+
+    With a known DPI (scans) the scale follows from it. Otherwise (photos) the
+    image is assumed to show one page, so its long side is capped at the
+    number of pixels a page has at the target DPI. Images are never enlarged.
+    """
+    height, width = gray.shape[:2]
+    if dpi:
+        scale = settings.IMAGE_TARGET_DPI / dpi
+    else:
+        scale = (settings.IMAGE_TARGET_DPI * _PAGE_LONG_SIDE_INCHES) / max(height, width)
+    if scale >= 1.0:
+        return gray
+    # INTER_AREA averages the source pixels, which keeps thin strokes legible.
+    return cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+
+def estimate_skew(gray: np.ndarray) -> float:
+    """
+    Estimates the rotation of the text in degrees (positive = counter-clockwise).
+
+    The ink pixels are fitted with the minimum-area rectangle; for a page of
+    text lines its angle is the skew. Works on a reduced copy, since the angle
+    does not need full resolution.
+    """
+    small = gray
+    long_side = max(gray.shape[:2])
+    if long_side > 1000:
+        factor = 1000 / long_side
+        small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+    # Ink becomes white (an adaptive threshold, so shadows do not count as ink);
+    # a wide horizontal close merges letters into text lines.
+    ink = cv2.adaptiveThreshold(small, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 25, 15)
+    ink = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    points = cv2.findNonZero(ink)
+    if points is None or len(points) < 100:
+        return 0.0
+
+    (_, _), (width, height), angle = cv2.minAreaRect(points)
+    # Normalise OpenCV's rectangle angle to the rotation of its long side.
+    if width < height:
+        angle -= 90
+    while angle > 45:
+        angle -= 90
+    while angle < -45:
+        angle += 90
+    return -angle
+
+
+def deskew(gray: np.ndarray) -> np.ndarray:
+    """Rotates the image so the text is horizontal, if it is noticeably skewed."""
+    angle = estimate_skew(gray)
+    if abs(angle) < settings.IMAGE_DESKEW_MIN_ANGLE or abs(angle) > settings.IMAGE_DESKEW_MAX_ANGLE:
+        # Tiny angles are not worth the resampling; huge ones are more likely
+        # a misreading (e.g. a photo of a table) than a real skew.
+        return gray
+    height, width = gray.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), -angle, 1.0)
+    # Fill the uncovered corners with white instead of black.
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def threshold(gray: np.ndarray) -> np.ndarray:
+    """Converts the image to black and white using the configured method."""
+    method = settings.IMAGE_THRESHOLD
+    if method == "adaptive":
+        # Each pixel is compared with a Gaussian-weighted mean of its
+        # neighbourhood, so shadows and gradients do not swallow the text.
+        return cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+            settings.IMAGE_THRESHOLD_BLOCK_SIZE, settings.IMAGE_THRESHOLD_OFFSET,
+        )
+    if method == "otsu":
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    return gray
+
+
+def preprocess_image(image_bytes: bytes) -> bytes:
+    """
+    Prepares an encoded image (JPEG/PNG bytes) for OCR: downscale, deskew and
+    threshold, as configured in the IMAGE_* settings.
+
+    Everything happens in memory: the bytes are decoded with cv2.imdecode and
+    the result is returned as PNG bytes, ready to be handed to the partitioner
+    as a file object.
+
+    Raises:
+        ValueError: If the bytes are not a decodable image.
+    """
+    started = time.perf_counter()
+    gray = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError("The image could not be decoded.")
+    original_shape = gray.shape
+
+    if settings.IMAGE_PREPROCESSING:
+        gray = downscale(gray, _image_dpi(image_bytes))
+        if settings.IMAGE_DESKEW:
+            gray = deskew(gray)
+    gray = threshold(gray)
+
+    ok, encoded = cv2.imencode(".png", gray)
+    if not ok:
+        raise ValueError("The preprocessed image could not be encoded.")
+    logger.info(
+        "Preprocessed image.",
+        extra={
+            "input_size": f"{original_shape[1]}x{original_shape[0]}",
+            "output_size": f"{gray.shape[1]}x{gray.shape[0]}",
+            "ms": round((time.perf_counter() - started) * 1000),
+        },
+    )
+    return encoded.tobytes()
@@ -1,73 +1,342 @@
 # --- Imports ---
-import os
-import uuid
+import logging
+import time
 import mimetypes
+import threading
+import multiprocessing
+from io import BytesIO
 from pathlib import Path
+from html.parser import HTMLParser
+from typing import BinaryIO
 from collections import defaultdict
-from PIL import Image
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import cv2
 import numpy as np
+from pypdf import PdfReader, PdfWriter
 from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.image import partition_image
 from unstructured.partition.auto import partition
+from .a_preprocessing import preprocess_image
+from ..core.config import settings
 
-# --- Helper for Preprocessing ---
-def preprocess_image(image_path: str) -> str:
-    """Applies basic preprocessing (grayscale, thresholding) to an image."""
-    img = cv2.imread(image_path)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-    
-    # Save to a unique temporary file to avoid conflicts
-    preprocessed_path = f"temp_uploads/preprocessed_{uuid.uuid4()}.jpg"
-    cv2.imwrite(preprocessed_path, thresh)
-    return preprocessed_path
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Bump this whenever a change here alters the text produced for a document.
+# It is part of the result cache key, so old cached page texts are not reused.
+STRUCTURING_VERSION = "6"
+
+# Settings that change the text produced for a document. Their values are
+# part of the cache key too (see result_cache.settings_fingerprint).
+STRUCTURING_SETTINGS = (
+    "TEXT_LAYER_FAST_PATH", "TEXT_LAYER_MIN_CHARS",
+    "IMAGE_PREPROCESSING", "IMAGE_TARGET_DPI", "IMAGE_DESKEW", "IMAGE_DESKEW_MIN_ANGLE",
+    "IMAGE_DESKEW_MAX_ANGLE", "IMAGE_THRESHOLD", "IMAGE_THRESHOLD_BLOCK_SIZE", "IMAGE_THRESHOLD_OFFSET",
+)
+
+# --- Partitioning Pool ---
+# Created on first use and then reused by every document this process handles,
+# so the cost of starting worker processes is only paid once.
+_partition_pool: ProcessPoolExecutor | None = None
+_partition_pool_lock = threading.Lock()
+
+def get_partition_pool() -> ProcessPoolExecutor:
+    """Returns the shared page-partitioning pool, creating it on first use."""
+    global _partition_pool
+    with _partition_pool_lock:
+        if _partition_pool is None:
+            logger.info("Starting page partitioning pool.", extra={"processes": settings.PARTITION_WORKERS})
+            # Forked children inherit the models this process has already loaded.
+            context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+            _partition_pool = ProcessPoolExecutor(max_workers=settings.PARTITION_WORKERS, mp_context=context)
+        return _partition_pool
+
+# --- Model Warm-Up ---
+# unstructured loads its layout-detection model and the OCR engine lazily, on
+# the first hi_res call in each process, which makes the first document after
+# a deploy take far longer than the rest. warm_up() pays that cost up front.
+# Processes forked afterwards (the pipeline workers and their partitioning
+# pools) inherit the loaded models, so they are warm from the start.
+_models_warm = False
+
+def _sample_page() -> bytes:
+    """A small synthetic statement page as PNG bytes, used to exercise the models."""
+    page = np.full((400, 600), 255, np.uint8)
+    for i, line in enumerate(["Date Description Amount Balance", "01/02/2025 Card Payment 12.50 987.50"]):
+        cv2.putText(page, line, (20, 60 + i * 40), cv2.FONT_HERSHEY_SIMPLEX, 0.6, 0, 1)
+    return cv2.imencode(".png", page)[1].tobytes()
+
+def warm_up() -> float:
+    """
+    Loads and exercises OpenCV, the layout model and the OCR engine once in
+    this process. Does nothing if this process (or its parent, before it was
+    forked) already did it.
+
+    Returns:
+        float: Seconds spent warming up (0.0 if already warm).
+    """
+    global _models_warm
+    if _models_warm:
+        return 0.0
+    started = time.perf_counter()
+    sample = _sample_page()
+    preprocess_image(sample)
+    partition_image(file=BytesIO(sample), strategy="hi_res", infer_table_structure=True)
+    _models_warm = True
+    elapsed = time.perf_counter() - started
+    logger.info("OCR and layout models warmed up.", extra={"seconds": round(elapsed, 2)})
+    return elapsed
+
+# --- Elements ---
+# Pages keep their elements, not just the joined text: the element category
+# ('Header', 'Footer', 'Table', 'NarrativeText', ...) lets the extraction stage
+# drop boilerplate before it reaches the LLM, and tables keep the cell grid
+# that infer_table_structure computed. Elements are plain dicts, so they are
+# cheap to send back from a pool worker and can be stored in the result cache.
+
+class _TableParser(HTMLParser):
+    """Collects the cell texts of an HTML table, row by row."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows: list[list[str]] = []
+        self._cell: list[str] | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self.rows.append([])
+        elif tag in ("td", "th"):
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            if not self.rows:
+                self.rows.append([])
+            self.rows[-1].append(" ".join("".join(self._cell).split()))
+            self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+def table_rows(html: str) -> list[list[str]]:
+    """Parses a table's 'text_as_html' into rows of cell texts, skipping empty rows."""
+    parser = _TableParser()
+    parser.feed(html)
+    parser.close()
+    return [row for row in parser.rows if any(row)]
+
+def _element_dict(el) -> dict:
+    """The parts of an unstructured element that the later stages use."""
+    element = {"category": getattr(el, "category", None), "text": el.text}
+    html = getattr(el.metadata, "text_as_html", None)
+    if element["category"] == "Table" and html:
+        element["rows"] = table_rows(html)
+    return element
+
+def _page_output(page_num: int, elements: list[dict], strategy: str) -> dict:
+    return {
+        "page": page_num,
+        "text": "\n\n".join(element["text"] for element in elements),
+        "strategy": strategy,
+        "elements": elements,
+    }
+
+# --- Helpers for Images ---
+def _ocr_image(image: bytes) -> list[dict]:
+    """OCRs one preprocessed image; returns its elements, tables with their cell grids."""
+    return [
+        _element_dict(el)
+        for el in partition_image(file=BytesIO(image), strategy="hi_res", infer_table_structure=True)
+    ]
+
+def _partition_image_bytes(image_bytes: bytes) -> list[dict]:
+    """Preprocesses one encoded image in memory and OCRs it; returns its elements."""
+    return _ocr_image(preprocess_image(image_bytes))
+
+def _partition_image_file(image_path: str) -> list[dict]:
+    """Pool-friendly wrapper of _partition_image_bytes for an image on disk."""
+    return _partition_image_bytes(Path(image_path).read_bytes())
+
+def structure_images_by_page(image_paths: list[str]) -> list[dict]:
+    """
+    Structures a statement photographed one page per image. Image i becomes
+    page i + 1.
+
+    With PARTITION_WORKERS > 1 every image is preprocessed and OCR'd on the
+    shared pool in parallel. Otherwise the preprocessing (OpenCV releases the
+    GIL) still runs on threads and only the OCR is serial.
+    """
+    logger.info("Structuring page images.", extra={"images": len(image_paths)})
+    if settings.PARTITION_WORKERS > 1 and len(image_paths) > 1:
+        elements_by_page = list(get_partition_pool().map(_partition_image_file, image_paths))
+    else:
+        with ThreadPoolExecutor(max_workers=min(4, len(image_paths)) or 1) as threads:
+            preprocessed = list(threads.map(lambda p: preprocess_image(Path(p).read_bytes()), image_paths))
+        elements_by_page = [_ocr_image(image) for image in preprocessed]
+
+    page_outputs = [
+        _page_output(page_num, elements, "hi_res")
+        for page_num, elements in enumerate(elements_by_page, start=1)
+    ]
+    logger.info("Structuring complete.", extra={"pages": len(page_outputs)})
+    return page_outputs
+
+# --- Helpers for PDF Partitioning ---
+def _partition_pdf_file(source: str | BinaryIO, strategy: str) -> list:
+    """
+    Runs partition_pdf with the options that belong to each strategy. 'source'
+    is either a path or an in-memory file object.
+    """
+    target = {"filename": source} if isinstance(source, str) else {"file": source}
+    if strategy == "hi_res":
+        return partition_pdf(**target, strategy="hi_res", infer_table_structure=True)
+    # 'fast' reads the embedded text layer with pdfminer: no layout model, no OCR.
+    return partition_pdf(**target, strategy="fast")
+
+def detect_page_strategies(file_path: str) -> list[str]:
+    """
+    Decides per page whether the embedded text layer is good enough to use.
+
+    Born-digital statements carry a text layer that pypdf can read in a few
+    milliseconds. Pages with at least TEXT_LAYER_MIN_CHARS letters/digits use the
+    cheap 'fast' strategy; scanned or image-only pages need 'hi_res' OCR.
+
+    Returns:
+        list[str]: One strategy ('fast' or 'hi_res') per page, in page order.
+    """
+    strategies = []
+    for page in PdfReader(file_path).pages:
+        try:
+            text = page.extract_text() or ""
+        except Exception:
+            # A broken text layer is treated the same as a missing one.
+            text = ""
+        usable_chars = sum(ch.isalnum() for ch in text)
+        strategies.append("fast" if usable_chars >= settings.TEXT_LAYER_MIN_CHARS else "hi_res")
+    return strategies
+
+def _plan_page_ranges(strategies: list[str]) -> list[tuple[int, int, str]]:
+    """
+    Groups consecutive pages that share a strategy into (first, last, strategy)
+    ranges of at most PARTITION_PAGES_PER_CHUNK pages (1-based, inclusive).
+    """
+    chunk = max(1, settings.PARTITION_PAGES_PER_CHUNK)
+    ranges = []
+    for page_num, strategy in enumerate(strategies, start=1):
+        if ranges:
+            first, last, current = ranges[-1]
+            if current == strategy and last - first + 1 < chunk:
+                ranges[-1] = (first, page_num, strategy)
+                continue
+        ranges.append((page_num, page_num, strategy))
+    return ranges
+
+def _partition_pdf_range(file_path: str, first_page: int, last_page: int, strategy: str) -> list[tuple[int, dict]]:
+    """
+    Partitions pages first_page..last_page (1-based, inclusive) of a PDF.
+
+    Can run inside a pool worker: the page range is copied into its own small
+    in-memory PDF, partitioned, and the element page numbers are shifted back
+    to their position in the original document. Returns plain (page, element)
+    pairs, which are cheap to send back to the parent process.
+    """
+    reader = PdfReader(file_path)
+    writer = PdfWriter()
+    for index in range(first_page - 1, last_page):
+        writer.add_page(reader.pages[index])
+
+    range_pdf = BytesIO()
+    writer.write(range_pdf)
+    range_pdf.seek(0)
+    elements = _partition_pdf_file(range_pdf, strategy)
+    return [((el.metadata.page_number or 1) + first_page - 1, _element_dict(el)) for el in elements]
+
+def _partition_pdf_pages(file_path: str) -> tuple[list[tuple[int, dict]], dict[int, str]]:
+    """
+    Partitions a PDF page range by page range, choosing the cheapest usable
+    strategy for each range and running the ranges on the shared pool when
+    PARTITION_WORKERS > 1.
+
+    Returns:
+        tuple: (page, element) pairs in document order, and the strategy used per page.
+    """
+    if settings.TEXT_LAYER_FAST_PATH:
+        strategies = detect_page_strategies(file_path)
+    else:
+        strategies = ["hi_res"] * len(PdfReader(file_path).pages)
+    strategy_by_page = dict(enumerate(strategies, start=1))
+    logger.info("Page strategies chosen.", extra={"fast": strategies.count('fast'), "hi_res": strategies.count('hi_res')})
+
+    # Serial and only one strategy needed: partition the file as a whole, as
+    # before, instead of paying for splitting it into ranges.
+    if settings.PARTITION_WORKERS <= 1 and len(set(strategies)) == 1:
+        elements = _partition_pdf_file(file_path, strategies[0])
+        return [(el.metadata.page_number or 1, _element_dict(el)) for el in elements], strategy_by_page
+
+    ranges = _plan_page_ranges(strategies)
+    if settings.PARTITION_WORKERS > 1:
+        logger.info(
+            "Partitioning pages in parallel.",
+            extra={"pages": len(strategies), "ranges": len(ranges), "processes": settings.PARTITION_WORKERS},
+        )
+        pool = get_partition_pool()
+        futures = [pool.submit(_partition_pdf_range, file_path, *page_range) for page_range in ranges]
+        results = [future.result() for future in futures]
+    else:
+        results = [_partition_pdf_range(file_path, *page_range) for page_range in ranges]
+
+    # Collecting in range order keeps the elements in document order.
+    pairs = []
+    for range_pairs in results:
+        pairs.extend(range_pairs)
+    return pairs, strategy_by_page
 
 # --- Core Function ---
 def structure_document_by_page(file_path: str) -> list[dict]:
     """
     Enhanced dispatcher: Detects type via ext + MIME, preprocesses images, and returns enriched page data.
+
+    Each page dict also records the partitioning 'strategy' that produced it
+    ('fast' for a usable text layer, 'hi_res' for OCR) and its 'elements'
+    ({'category', 'text'}, plus 'rows' for tables) in reading order.
     """
-    print(f"Structuring document: {file_path}")
+    logger.info("Structuring document.", extra={"path": file_path})
     path = Path(file_path)
     file_ext = path.suffix.lower()
     mime_type, _ = mimetypes.guess_type(file_path)
     
     elements = []
-    temp_files_to_clean = []
-
-    try:
-        if file_ext == ".pdf" or mime_type == "application/pdf":
-            print("PDF detected. Using partition_pdf.")
-            elements = partition_pdf(filename=file_path, strategy="hi_res", infer_table_structure=True)
-        
-        elif file_ext in [".png", ".jpg", ".jpeg"] or (mime_type and mime_type.startswith("image/")):
-            print("Image detected. Preprocessing and using partition_image.")
-            preprocessed_path = preprocess_image(file_path)
-            temp_files_to_clean.append(preprocessed_path)
-            elements = partition_image(filename=preprocessed_path, strategy="hi_res")
-
-        else:
-            print(f"Unknown type ({file_ext}/{mime_type}). Falling back to auto-partition.")
-            elements = partition(filename=file_path, strategy="hi_res")
-
-        # Group elements by page number
-        pages_data = defaultdict(list)
-        for el in elements:
-            page_num = el.metadata.page_number or 1
-            pages_data[page_num].append(el.text)
-
-        # Combine text for each page
-        page_outputs = []
-        for page_num in sorted(pages_data.keys()):
-            full_text = "\n\n".join(pages_data[page_num])
-            page_outputs.append({"page": page_num, "text": full_text})
-        
-        print(f"Structuring complete: {len(page_outputs)} pages found.")
-        return page_outputs
-
-    finally:
-        # Clean up any temporary preprocessed images
-        for temp_file in temp_files_to_clean:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
\ No newline at end of file
+    page_elements = None
+    # Images and other files always go through hi_res; PDFs report per page.
+    strategy_by_page = defaultdict(lambda: "hi_res")
+
+    if file_ext == ".pdf" or mime_type == "application/pdf":
+        logger.info("PDF detected. Using partition_pdf.")
+        page_elements, strategy_by_page = _partition_pdf_pages(file_path)
+    
+    elif file_ext in [".png", ".jpg", ".jpeg"] or (mime_type and mime_type.startswith("image/")):
+        logger.info("Image detected. Preprocessing and using partition_image.")
+        # The preprocessed image never touches the disk.
+        page_elements = [(1, element) for element in _partition_image_bytes(path.read_bytes())]
+
+    else:
+        logger.info("Unknown type (%s/%s). Falling back to auto-partition.", file_ext, mime_type)
+        elements = partition(filename=file_path, strategy="hi_res")
+
+    # The PDF path already returns (page, element) pairs.
+    if page_elements is None:
+        page_elements = [(el.metadata.page_number or 1, _element_dict(el)) for el in elements]
+
+    # Group elements by page number
+    pages_data = defaultdict(list)
+    for page_num, element in page_elements:
+        pages_data[page_num].append(element)
+
+    # Combine text for each page
+    page_outputs = []
+    for page_num in sorted(pages_data.keys()):
+        page_outputs.append(_page_output(page_num, pages_data[page_num], strategy_by_page[page_num]))
+    
+    logger.info("Structuring complete.", extra={"pages": len(page_outputs)})
+    return page_outputs
@@ -1,41 +1,32 @@
 # --- Imports ---
-import openai
+import re
+import asyncio
+import hashlib
+import logging
 from ..core.models import StatementData
 from ..core.config import settings
-from typing import List, Dict
+from .b_reduction import reduce_pages, REDUCTION_VERSION
+from .b_tables import extract_table_transactions, TABLES_VERSION
+from ..utils import llm_gateway
+from ..utils.llm_gateway import estimate_tokens
+from ..utils.dates import parse_statement_date
+from typing import List, Dict, Callable, Optional
 
-# --- LLM Client Initialization ---
-# Configure the client once to be reused for all API calls.
-client = openai.OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=settings.OPENAI_API_KEY,
-)
-
-# --- Core Orchestration Function ---
-
-def extract_data_with_llm(page_data: List[Dict]) -> dict:
-    """
-    Processes a list of page data dictionaries by combining them into a single context
-    and then using a comprehensive, single-shot LLM prompt for extraction.
-    """
-    print("Initializing single-prompt LLM extraction...")
-    
-    if not page_data:
-        raise ValueError("Cannot process an empty document.")
+logger = logging.getLogger(__name__)
 
-    # --- Step 1: Aggregate Page Texts ---
-    # Combine the 'text' from each page dictionary into a single string, clearly
-    # marking the page breaks. This gives the LLM full context of the entire document.
-    print(f"Aggregating {len(page_data)} pages into a single context for the LLM.")
-    full_document_text = "\n\n--- Page Break ---\n\n".join([page['text'] for page in page_data])
+# Called as on_chunk(index, total, partial_result) when a window has been extracted.
+ChunkCallback = Callable[[int, int, dict], None]
 
-    # --- Step 2: Use Your Powerful, All-in-One Prompt ---
-    # This prompt is used exactly as you designed it, now with the complete
-    # document text passed into it.
-    prompt = f"""
+# --- Prompt Template ---
+# The all-in-one extraction prompt. '{full_document_text}' is filled in with the
+# text of every page; literal braces in the JSON examples are doubled.
+# Everything before the document text is identical in every request, and the
+# document comes last, so providers that cache prompt prefixes (OpenAI,
+# and OpenRouter for the models that support it) only process it once.
+PROMPT_TEMPLATE = """
 You are an expert financial analyst AI specialized in parsing diverse financial statements, including traditional bank statements (e.g., checking/savings accounts with balances), digital payment apps (e.g., Google Pay UPI transactions without running balances), credit card summaries, and hybrid formats from PDFs. These may be scanned, tabular, narrative, list-based, or semi-structured, with variations in layouts, currencies (₹, $, £, etc.), date formats (e.g., "01 Sep, 2025", "mm/dd/yyyy", "DD Month YYYY"), abbreviations (UPI, BACS, DD), and noise (headers, footers, notes, OCR errors like "eBAY" for "eBay"). Transaction types may be explicit (e.g., "Paid to" for debits, "Received from" for credits, "Debit"/"Credit" columns) or inferred from context/keywords (e.g., "Purchase" or "Withdrawal" implies debit; "Deposit" or "Refund" implies credit).
 
-The input is raw, unstructured text from the entire PDF (all pages combined).
+The input is raw, unstructured text from the entire PDF (all pages combined). Page headers and footers that repeat on every page appear only once, and tables are written one row per line with " | " between cells.
 
 Perform extraction via chain-of-thought reasoning (document internally; output ONLY JSON):
 1.  **Extract Metadata**: Scan for account_holder (e.g., name/email/phone like "ruchitdas36@gmail.com" or "Bit Manufacturing Ltd"; default "Unknown" if absent). account_number (e.g., "111-234-567-890", "12345678", or phone like "8433575939"; default "N/A"). period_start/end (e.g., "01 September 2025" → "09/01/2025"; infer from first/last transaction or "Issue Date" if missing; format as "MM/DD/YYYY"). When parsing numeric-only dates like '02/03/2025', assume the format is 'MM/DD/YYYY' unless the day value is greater than 12. beginning_balance (e.g., "Balance Brought Forward" or inferred from first balance; default 0.0). ending_balance (last balance or totals diff, e.g., Received - Sent; default 0.0). Normalize dates to "MM/DD/YYYY" strings; remove commas from floats (e.g., "8,313.30" → 8313.30).
@@ -54,11 +45,6 @@ Example 3 (Template/empty): Input: "Issue Date: mm/dd/yyyy Period: mm/dd/yyyy to
 
 IMPORTANT: Do not invent or infer any data that is not explicitly present in the text. If a value like account_holder or a balance is missing, you MUST use the specified default values ("Unknown", "N/A", 0.0).
 
-Full Input Text from all pages:
----
-{full_document_text}
----
-
 Output ONLY the valid JSON matching the schema. No text, explanations, or formatting.
 
 JSON Schema:
@@ -82,27 +68,478 @@ JSON Schema:
       "string"
   ]
 }}
+
+Full Input Text from all pages:
+---
+{full_document_text}
+---
 """
-    
-    print("Sending request to OpenRouter API with full document context...")
-
-    # --- Step 3: Make the API Call ---
-    response = client.chat.completions.create(
-        extra_headers={
-          "HTTP-Referer": "http://localhost",
-          "X-Title": "IntelliStatement",
-        },
-        model="qwen/qwen-2.5-72b-instruct:free", # Using the specified powerful model
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0,
-        response_format={"type": "json_object"}
+
+# A short fingerprint of the prompt, of the reduction of its input and of the
+# table reader. It is part of the result cache key, so any edit to one of them
+# automatically invalidates previously cached extractions.
+PROMPT_VERSION = hashlib.sha256(
+    (PROMPT_TEMPLATE + REDUCTION_VERSION + TABLES_VERSION).encode("utf-8")
+).hexdigest()[:12]
+
+# Settings that change the extracted data (besides the model, which is part of
+# the cache key on its own). Their values are part of the cache key too.
+EXTRACTION_SETTINGS = (
+    "TABLE_EXTRACTION", "PROMPT_REDUCTION", "LLM_CHUNKED_EXTRACTION", "LLM_CHUNK_TOKENS", "LLM_CHUNK_OVERLAP_TOKENS",
+)
+
+# Values the prompt tells the LLM to use when a header field is missing.
+METADATA_DEFAULTS = {
+    "account_holder": "Unknown",
+    "account_number": "N/A",
+    "period_start": "mm/dd/yyyy",
+    "period_end": "mm/dd/yyyy",
+    "beginning_balance": 0.0,
+    "ending_balance": 0.0,
+}
+
+PAGE_BREAK = "--- Page Break ---"
+
+# Put in front of the text left over after table extraction, so the LLM does
+# not look for the transactions it is not shown.
+TABLE_NOTE = (
+    "[{count} transactions from tables in this document were extracted separately and are not shown. "
+    "Extract the header fields, and only transactions that appear in the text below.]"
+)
+
+# Added to the warnings for every chunk whose extraction failed.
+FAILED_CHUNK_WARNING = (
+    "Pages {pages} could not be extracted ({error}); their transactions are missing. "
+    "Re-extract them to complete the statement."
+)
+
+# --- Core Orchestration Function ---
+
+def extract_data_with_llm(
+    page_data: List[Dict],
+    on_chunk: Optional[ChunkCallback] = None,
+    chunks: Optional[List[Dict]] = None,
+    allow_failures: bool = False,
+) -> dict:
+    """
+    Processes a list of page data dictionaries by combining them into a single context
+    and then using a comprehensive, single-shot LLM prompt for extraction.
+
+    Transactions in table grids (see b_tables.py) are read without the LLM,
+    which is then only sent the rest of the text. Documents larger than
+    LLM_CHUNK_TOKENS (after prompt reduction, see b_reduction.py) are handed
+    to the chunked extractor, which calls 'on_chunk' with each partial result
+    as soon as it arrives.
+
+    When a 'chunks' list is passed, the partial results the statement is
+    merged from are appended to it (see extract_chunks), so the caller can
+    store them for re-extraction. With 'allow_failures', a window of a chunked
+    extraction that fails is tolerated: it is recorded as a failed chunk and
+    named in the warnings, and can be re-extracted on its own later. Otherwise
+    any failure fails the whole extraction.
+    """
+    if not page_data:
+        raise ValueError("Cannot process an empty document.")
+
+    extracted = extract_chunks(page_data, on_chunk=on_chunk, allow_failures=allow_failures)
+    if chunks is not None:
+        chunks.extend(extracted)
+    return merge_chunks(extracted)
+
+
+def make_chunk(source: str, pages: List[int], result: Optional[dict] = None, error: Optional[str] = None) -> Dict:
+    """
+    Builds an extraction chunk: the partial result of one unit of extraction.
+
+    Args:
+        source (str): 'table' (read from table grids), 'llm' (one LLM call) or
+            'template' (a rule-based template, see b_templates.py).
+        pages (List[int]): The page numbers the chunk was extracted from.
+        result (dict, optional): The partial StatementData dict.
+        error (str, optional): Why the extraction failed; marks the chunk as failed.
+    """
+    return {
+        "source": source,
+        "pages": list(pages),
+        "status": "failed" if error is not None else "ok",
+        "result": result,
+        "error": error,
+    }
+
+
+def extract_chunks(
+    page_data: List[Dict],
+    on_chunk: Optional[ChunkCallback] = None,
+    only_pages: Optional[set] = None,
+    allow_failures: bool = False,
+) -> List[Dict]:
+    """
+    Extracts the statement as independently reusable chunks (see make_chunk):
+    at most one 'table' chunk with the transactions read from table grids, and
+    one 'llm' chunk per LLM call (a single one for a document that fits one
+    prompt, one per window for a chunked extraction).
+
+    Args:
+        page_data (List[Dict]): The structured pages.
+        on_chunk (ChunkCallback, optional): Called with every window's result.
+        only_pages (set, optional): Send only these pages to the LLM, for
+            re-extraction. Tables are always read from every page, since that
+            costs no LLM call.
+        allow_failures (bool): Record failed windows as failed chunks instead
+            of raising, unless every window failed.
+
+    Returns:
+        List[Dict]: The chunks, in merge order; see merge_chunks().
+    """
+    chunks = []
+    note = None
+    if settings.TABLE_EXTRACTION:
+        table_data, page_data = extract_table_transactions(page_data)
+        if table_data is not None:
+            count = len(table_data["transactions"])
+            chunks.append(make_chunk("table", table_data.pop("pages"), table_data))
+            if not any(page["text"].strip() for page in page_data):
+                logger.info("Tables hold the whole document; skipping the LLM.", extra={"transactions": count})
+                return chunks
+            note = TABLE_NOTE.format(count=count)
+            # The partial LLM results would lack the table rows, so they are not
+            # streamed; the caller reports the merged result as one batch instead.
+            on_chunk = None
+
+    # Drop repeated boilerplate and compact the text before paying for it. The
+    # whole document is reduced, so repeats are found on every page.
+    if settings.PROMPT_REDUCTION:
+        page_data, _ = reduce_pages(page_data)
+    if only_pages is not None:
+        page_data = [page for page in page_data if page["page"] in only_pages]
+    if not any(page["text"].strip() for page in page_data):
+        return chunks
+    if note is not None:
+        page_data = _with_note(page_data, note)
+
+    # Long statements are split into windows that are extracted concurrently.
+    if settings.LLM_CHUNKED_EXTRACTION:
+        total_tokens = sum(estimate_tokens(page['text']) for page in page_data)
+        if total_tokens > settings.LLM_CHUNK_TOKENS:
+            return chunks + _extract_windows(page_data, on_chunk=on_chunk, allow_failures=allow_failures)
+
+    result = _extract_single_prompt(page_data)
+    return chunks + [make_chunk("llm", [page["page"] for page in page_data], result)]
+
+
+def merge_chunks(chunks: List[Dict]) -> dict:
+    """
+    Builds the statement from its chunks. The LLM chunks are merged in order
+    (a single one is used as it is), failed chunks become warnings, and the
+    table chunk, if any, is merged in last (see merge_table_data).
+
+    Returns:
+        dict: The statement data, validated against the StatementData schema.
+    """
+    table = next((chunk["result"] for chunk in chunks if chunk["source"] == "table"), None)
+    results = [chunk["result"] for chunk in chunks if chunk["source"] != "table" and chunk["status"] == "ok"]
+    failed = [chunk for chunk in chunks if chunk["status"] == "failed"]
+
+    if not results:
+        data = {**METADATA_DEFAULTS, "transactions": []}
+    elif len(results) == 1:
+        data = results[0]
+    else:
+        data = merge_chunk_results(results)
+        logger.info("Merged chunks.", extra={"chunks": len(results), "transactions": len(data["transactions"])})
+
+    if failed:
+        warnings = list(data.get("warnings") or [])
+        for chunk in failed:
+            pages = chunk["pages"]
+            page_range = f"{pages[0]}-{pages[-1]}" if len(pages) > 1 else str(pages[0])
+            warnings.append(FAILED_CHUNK_WARNING.format(pages=page_range, error=chunk["error"]))
+        data = {**data, "warnings": warnings}
+
+    if table is not None:
+        return merge_table_data(table, data)
+    return StatementData(**data).model_dump()
+
+
+def _with_note(page_data: List[Dict], note: str) -> List[Dict]:
+    """Puts a note in front of the first page's text (and elements)."""
+    first = page_data[0]
+    noted = {**first, "text": f"{note}\n\n{first['text']}"}
+    if first.get("elements") is not None:
+        noted["elements"] = [{"category": "NarrativeText", "text": note}, *first["elements"]]
+    return [noted, *page_data[1:]]
+
+
+def merge_table_data(table_data: dict, llm_data: dict) -> dict:
+    """
+    Combines the transactions read from tables with the LLM's result for the
+    remaining text. Table values win; the LLM supplies the header fields and
+    any transactions outside the tables.
+    """
+    table_transactions = table_data["transactions"]
+    remaining = {}
+    for transaction in table_transactions:
+        key = _transaction_key(transaction)
+        remaining[key] = remaining.get(key, 0) + 1
+
+    extra = []
+    for transaction in llm_data.get("transactions") or []:
+        key = _transaction_key(transaction)
+        if remaining.get(key, 0) > 0:
+            remaining[key] -= 1
+            continue
+        extra.append(transaction)
+    transactions = _sort_chronologically(table_transactions + extra) if extra else list(table_transactions)
+
+    merged = {**llm_data, "transactions": transactions}
+    for field in ("beginning_balance", "ending_balance"):
+        if field in table_data:
+            merged[field] = table_data[field]
+    if "ending_balance" not in table_data and not merged.get("ending_balance") and transactions:
+        merged["ending_balance"] = transactions[-1]["balance"]
+    # Without the transactions the LLM may not have seen the period.
+    dates = [parse_statement_date(t["date"]) for t in transactions]
+    dates = [date for date in dates if date is not None]
+    if dates and parse_statement_date(merged.get("period_start")) is None:
+        merged["period_start"] = min(dates).strftime("%m/%d/%Y")
+    if dates and parse_statement_date(merged.get("period_end")) is None:
+        merged["period_end"] = max(dates).strftime("%m/%d/%Y")
+
+    logger.info(
+        "Merged table and LLM results.",
+        extra={"table_transactions": len(table_transactions), "llm_transactions": len(extra)},
     )
+    return StatementData(**merged).model_dump()
+
+
+def _extract_single_prompt(page_data: List[Dict]) -> dict:
+    """Extracts the statement from the (already reduced) page texts with one LLM prompt."""
+    logger.info("Initializing single-prompt LLM extraction...")
+
+    # --- Step 1: Aggregate Page Texts ---
+    # Combine the 'text' from each page dictionary into a single string, clearly
+    # marking the page breaks. This gives the LLM full context of the entire document.
+    logger.info("Aggregating pages into a single context for the LLM.", extra={"pages": len(page_data)})
+    full_document_text = "\n\n--- Page Break ---\n\n".join([page['text'] for page in page_data])
+
+    # --- Step 2: Use Your Powerful, All-in-One Prompt ---
+    # The complete document text is passed into the prompt template above.
+    prompt = PROMPT_TEMPLATE.format(full_document_text=full_document_text)
     
-    print("Received response from OpenRouter API.")
+    logger.info("Sending request to OpenRouter API with full document context...")
 
-    # --- Step 4: Validate and Return the Output ---
-    extracted_json_string = response.choices[0].message.content
-    validated_data = StatementData.model_validate_json(extracted_json_string)
+    # --- Step 3: Make the API Call and Validate the Output ---
+    # The gateway handles rate limits, retries and fallback models; output that
+    # does not validate against the schema is retried on the next model.
+    validated_data = llm_gateway.complete(prompt, StatementData.model_validate_json)
     
-    print("LLM output successfully validated against Pydantic schema.")
-    return validated_data.model_dump()
\ No newline at end of file
+    logger.info("LLM output successfully validated against Pydantic schema.")
+    return validated_data.model_dump()
+
+
+# --- Chunked Extraction ---
+
+def build_chunk_windows(page_data: List[Dict], budget: int, overlap: int) -> List[Dict]:
+    """
+    Splits the document into windows of at most 'budget' estimated tokens.
+
+    The document is cut at line boundaries. Each window after the first starts
+    with the last ~'overlap' tokens of the previous one, so a transaction that
+    straddles a window boundary is seen whole by at least one LLM call.
+
+    Returns:
+        List[Dict]: [{"text": ..., "pages": [page numbers covered]}, ...] in order.
+    """
+    # Never let the overlap eat the whole window, or windows would not advance.
+    overlap = min(overlap, budget // 2)
+
+    # Step 1: Flatten the pages into (page, line, tokens) units.
+    units = []
+    for index, page in enumerate(page_data):
+        if index > 0:
+            units.append((page['page'], PAGE_BREAK, estimate_tokens(PAGE_BREAK)))
+        for line in page['text'].splitlines():
+            if not line.strip():
+                continue
+            # A single line longer than the budget is sliced into pieces.
+            step = budget * 4
+            for start in range(0, len(line), step):
+                piece = line[start:start + step]
+                units.append((page['page'], piece, estimate_tokens(piece)))
+
+    # Step 2: Greedily pack units into windows, carrying an overlap tail forward.
+    windows, current, current_tokens = [], [], 0
+    for unit in units:
+        if current and current_tokens + unit[2] > budget:
+            windows.append(current)
+            tail, tail_tokens = [], 0
+            for previous in reversed(current):
+                if tail_tokens + previous[2] > overlap:
+                    break
+                tail.insert(0, previous)
+                tail_tokens += previous[2]
+            current, current_tokens = tail, tail_tokens
+        current.append(unit)
+        current_tokens += unit[2]
+    if current:
+        windows.append(current)
+
+    return [
+        {"text": "\n".join(text for _, text, _ in window), "pages": sorted({page for page, _, _ in window})}
+        for window in windows
+    ]
+
+
+def _transaction_key(transaction: dict) -> tuple:
+    """Identifies a transaction independently of whitespace and letter case."""
+    description = re.sub(r"\s+", " ", transaction['description']).strip().casefold()
+    return (
+        transaction['date'].strip(), description,
+        round(transaction['debit'], 2), round(transaction['credit'], 2), round(transaction['balance'], 2),
+    )
+
+
+def _sort_chronologically(transactions: List[dict]) -> List[dict]:
+    """Stable sort by date; rows with an unparseable date keep the position of the row before them."""
+    # Carry the last known date forward so undated rows stay in place.
+    sort_keys, last_date = [], None
+    for index, transaction in enumerate(transactions):
+        parsed = parse_statement_date(transaction['date'])
+        if parsed is not None:
+            last_date = parsed
+        sort_keys.append((last_date.toordinal() if last_date else 0, index))
+    return [transaction for _, transaction in sorted(zip(sort_keys, transactions), key=lambda pair: pair[0])]
+
+
+def _pick_metadata(results: List[dict], field: str, from_end: bool):
+    """
+    Takes a header field from the first (or last) chunk. If that chunk only has
+    the prompt's default value, the nearest chunk with a real value is used.
+    """
+    ordered = list(reversed(results)) if from_end else results
+    for result in ordered:
+        value = result.get(field)
+        if value is not None and value != METADATA_DEFAULTS.get(field):
+            return value
+    return ordered[0].get(field, METADATA_DEFAULTS.get(field))
+
+
+def merge_chunk_results(results: List[dict]) -> dict:
+    """
+    Deterministically merges the partial StatementData dicts of each window.
+
+    - Transactions repeated at a window boundary (because of the overlap) are
+      dropped: a transaction is skipped when an identical one is still unmatched
+      in the previous window. Genuine repeats inside a window are kept.
+    - Transactions are ordered chronologically. The sort is stable, and rows
+      with an unparseable date keep the position of the row before them.
+    - Opening metadata comes from the first window and closing metadata
+      (period_end, ending_balance) from the last one.
+    """
+    merged = []
+    previous_keys: Dict[tuple, int] = {}
+    for result in results:
+        available = dict(previous_keys)
+        current_keys: Dict[tuple, int] = {}
+        for transaction in result.get('transactions', []):
+            key = _transaction_key(transaction)
+            current_keys[key] = current_keys.get(key, 0) + 1
+            if available.get(key, 0) > 0:
+                available[key] -= 1
+                continue
+            merged.append(transaction)
+        previous_keys = current_keys
+
+    merged = _sort_chronologically(merged)
+
+    warnings = []
+    for result in results:
+        for warning in result.get('warnings') or []:
+            if warning not in warnings:
+                warnings.append(warning)
+
+    return {
+        "account_holder": _pick_metadata(results, "account_holder", from_end=False),
+        "account_number": _pick_metadata(results, "account_number", from_end=False),
+        "period_start": _pick_metadata(results, "period_start", from_end=False),
+        "period_end": _pick_metadata(results, "period_end", from_end=True),
+        "beginning_balance": _pick_metadata(results, "beginning_balance", from_end=False),
+        "ending_balance": _pick_metadata(results, "ending_balance", from_end=True),
+        "currency_symbol": next((r["currency_symbol"] for r in results if r.get("currency_symbol")), "$"),
+        "transactions": merged,
+        "warnings": warnings or None,
+    }
+
+
+async def _extract_windows_async(
+    windows: List[Dict], on_chunk: Optional[ChunkCallback] = None, allow_failures: bool = False,
+) -> List[dict | Exception]:
+    """
+    Sends every window to the LLM concurrently, at most LLM_MAX_CONCURRENCY at a time.
+
+    With 'allow_failures', a window the LLM could not extract (it stayed
+    unavailable, or never returned valid output) yields its exception in place
+    of a result instead of failing the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, settings.LLM_MAX_CONCURRENCY))
+
+    async def extract_window(index: int, window: Dict) -> dict | Exception:
+        excerpt = (
+            f"[Excerpt {index + 1} of {len(windows)}, pages {window['pages'][0]}-{window['pages'][-1]}.]\n"
+            f"{window['text']}"
+        )
+        prompt = PROMPT_TEMPLATE.format(full_document_text=excerpt)
+        async with semaphore:
+            try:
+                validated = await llm_gateway.complete_async(prompt, StatementData.model_validate_json)
+            except (llm_gateway.LLMUnavailableError, ValueError) as e:
+                if not allow_failures:
+                    raise
+                logger.warning(
+                    "Chunk failed; its pages can be re-extracted later.",
+                    extra={"chunk": index + 1, "chunks": len(windows), "pages": window["pages"], "error": str(e)},
+                )
+                return e
+        logger.info("Received response for chunk.", extra={"chunk": index + 1, "chunks": len(windows)})
+        result = validated.model_dump()
+        if on_chunk is not None:
+            on_chunk(index, len(windows), result)
+        return result
+
+    # gather() returns results in window order, which keeps the merge deterministic.
+    # The gateway loop outlives this document, so if one window fails the
+    # others are cancelled rather than left running.
+    tasks = [asyncio.ensure_future(extract_window(i, w)) for i, w in enumerate(windows)]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+def _extract_windows(
+    page_data: List[Dict], on_chunk: Optional[ChunkCallback] = None, allow_failures: bool = False,
+) -> List[Dict]:
+    """
+    Extracts the (already reduced) pages in token-budgeted, overlapping windows
+    that are sent to the LLM concurrently; returns one chunk per window.
+
+    Raises:
+        Exception: The first window's error if every window failed.
+    """
+    windows = build_chunk_windows(page_data, settings.LLM_CHUNK_TOKENS, settings.LLM_CHUNK_OVERLAP_TOKENS)
+    logger.info("Initializing chunked LLM extraction.", extra={"pages": len(page_data), "chunks": len(windows)})
+
+    results = llm_gateway.run(_extract_windows_async(windows, on_chunk=on_chunk, allow_failures=allow_failures))
+    if all(isinstance(result, Exception) for result in results):
+        raise results[0]
+    chunks = []
+    for window, result in zip(windows, results):
+        if isinstance(result, Exception):
+            # The first line is enough for the warning (validation errors run long).
+            error = (str(result).splitlines() or [type(result).__name__])[0]
+            chunks.append(make_chunk("llm", window["pages"], error=error))
+        else:
+            chunks.append(make_chunk("llm", window["pages"], result))
+    return chunks
@@ -0,0 +1,159 @@
+# --- Imports ---
+import re
+import math
+import logging
+from collections import defaultdict
+from typing import List, Dict
+
+from ..core import metrics
+from ..utils.llm_gateway import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# --- Prompt Reduction ---
+# Every character of page text sent to the LLM is paid for (in money and in
+# generation latency), but much of a statement is not transaction data: the
+# bank's letterhead, the column headings and the legal small print repeat on
+# every page. Before the text is put into the prompt this stage
+#
+#   - drops elements whose category never carries statement data,
+#   - drops page furniture that repeats across pages (keeping the first
+#     occurrence): headers, footers and titles, and long blocks of other text
+#     found at the same place on nearly every page (letterheads, small print),
+#   - collapses runs of whitespace, and
+#   - writes tables one row per line with ' | ' between cells, instead of the
+#     loosely spaced text unstructured produces for them.
+#
+# It works on the 'elements' that structuring records for every page. Pages
+# without them (e.g. from an older cache entry) are split into paragraphs.
+
+# Bump this whenever a change here alters the reduced text.
+REDUCTION_VERSION = "2"
+
+# Categories that never carry statement data.
+DROPPED_CATEGORIES = {"PageBreak", "PageNumber", "Image", "Figure", "FigureCaption"}
+
+# Categories that are page furniture: they are kept once if they repeat.
+REPEATING_CATEGORIES = {"Header", "Footer", "Title"}
+
+# Running headers and footers ('Page 2 of 9', 'Printed 03/04/2025 10:15')
+# usually differ from page to page only in their digits, so those are ignored
+# when comparing them. Other elements must match exactly: transaction rows
+# differ only in digits too.
+DIGIT_INSENSITIVE_CATEGORIES = {"Header", "Footer"}
+
+# Any other text counts as repeated page furniture only if it is this long
+# and sits at the same position (counted from the top or from the bottom of
+# the page) on this share of the pages. Transactions repeat as well (the same
+# merchant, 'Paid by Axis Bank 9934', the same amount), but as short lines
+# wherever they happen to fall, and must never be dropped.
+MIN_REPEATED_TEXT_CHARS = 40
+REPEATED_TEXT_PAGE_SHARE = 0.8
+
+_SPACE_RUN = re.compile(r"[ \t\u00a0]+")
+_COLUMN_GAP = re.compile(r"[ \t\u00a0]{2,}")
+_DIGITS = re.compile(r"\d+")
+
+
+def compact_whitespace(text: str) -> str:
+    """
+    Trims every line, drops blank lines and shortens runs of spaces. A gap of
+    two or more spaces stays a (two-space) gap, because in text-layer output
+    it separates columns.
+    """
+    lines = (_COLUMN_GAP.sub("  ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _page_elements(page: Dict) -> List[Dict]:
+    if page.get("elements") is not None:
+        return page["elements"]
+    return [{"category": None, "text": paragraph} for paragraph in page["text"].split("\n\n")]
+
+
+def _element_text(element: Dict) -> str:
+    if element.get("rows"):
+        return "\n".join(" | ".join(_SPACE_RUN.sub(" ", cell).strip() for cell in row) for row in element["rows"])
+    return compact_whitespace(element.get("text") or "")
+
+
+def _repeat_key(element: Dict, text: str) -> str:
+    key = _SPACE_RUN.sub(" ", text).strip().lower()
+    if element.get("category") in DIGIT_INSENSITIVE_CATEGORIES:
+        key = _DIGITS.sub("#", key)
+    return key
+
+
+def reduce_pages(page_data: List[Dict]) -> tuple[List[Dict], Dict]:
+    """
+    Shrinks the page texts before they are put into the prompt.
+
+    Args:
+        page_data (List[Dict]): The structured pages ('page', 'text' and
+            optionally 'elements').
+
+    Returns:
+        tuple[List[Dict], Dict]: Copies of the pages with the reduced 'text',
+            and statistics: estimated 'tokens_before' and 'tokens_after', and
+            the number of 'dropped_elements'.
+    """
+    # Pass 1: the reduced text of every element and where each text appears:
+    # the pages (for furniture categories) and the pages per position from the
+    # top and from the bottom (for other text). None marks an element dropped
+    # for its category.
+    pages = []
+    pages_by_key: dict[str, set] = defaultdict(set)
+    pages_by_position: dict[tuple, set] = defaultdict(set)
+    for index, page in enumerate(page_data):
+        elements = []
+        for element in _page_elements(page):
+            text = None if element.get("category") in DROPPED_CATEGORIES else _element_text(element)
+            elements.append((element, text, _repeat_key(element, text) if text else None))
+        keys = [key for _, _, key in elements if key]
+        for position, key in enumerate(keys):
+            pages_by_key[key].add(index)
+            pages_by_position[(key, position)].add(index)
+            pages_by_position[(key, position - len(keys))].add(index)
+        pages.append(elements)
+
+    # Text at a fixed position must be on this many pages to count as furniture.
+    required_pages = max(2, math.ceil(REPEATED_TEXT_PAGE_SHARE * len(page_data)))
+
+    def is_furniture(element: Dict, text: str, key: str, position: int, count: int) -> bool:
+        if element.get("category") in REPEATING_CATEGORIES:
+            return len(pages_by_key[key]) > 1
+        if len(text) < MIN_REPEATED_TEXT_CHARS:
+            return False
+        return max(
+            len(pages_by_position[(key, position)]), len(pages_by_position[(key, position - count)]),
+        ) >= required_pages
+
+    # Pass 2: keep only the first occurrence of repeated page furniture.
+    reduced_pages, dropped = [], 0
+    seen: set[str] = set()
+    for page, elements in zip(page_data, pages):
+        kept = []
+        count = sum(1 for _, _, key in elements if key)
+        position = -1
+        for element, text, key in elements:
+            if not text:
+                dropped += text is None
+                continue
+            position += 1
+            if is_furniture(element, text, key, position, count):
+                if key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+            kept.append(text)
+        reduced_pages.append({**page, "text": "\n".join(kept)})
+
+    stats = {
+        "tokens_before": sum(estimate_tokens(page["text"]) for page in page_data),
+        "tokens_after": sum(estimate_tokens(page["text"]) for page in reduced_pages),
+        "dropped_elements": dropped,
+    }
+    metrics.record(metrics.LLM_INPUT_TOKENS, stats["tokens_before"], text="raw")
+    metrics.record(metrics.LLM_INPUT_TOKENS, stats["tokens_after"], text="reduced")
+    logger.info("Reduced page text for the LLM.", extra=stats)
+    return reduced_pages, stats
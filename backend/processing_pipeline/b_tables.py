@@ -0,0 +1,293 @@
+# --- Imports ---
+import re
+import logging
+from typing import List, Dict, Optional
+
+from ..utils.dates import parse_statement_date
+
+logger = logging.getLogger(__name__)
+
+# --- Table Extraction ---
+# For hi_res pages unstructured already infers the cell structure of tables
+# (structuring keeps it as 'rows'). When a table has a recognisable header row
+# (a date, a description and debit/credit or amount columns), its rows are
+# turned into transactions directly, with no LLM involved. Only rows that
+# cannot be read that way, and the text outside the tables, are left for the
+# LLM, which then mostly has to find the statement's header fields.
+
+# Bump this whenever a change here alters the extracted transactions.
+TABLES_VERSION = "3"
+
+# Header cell texts (lower case, without punctuation or bracketed units) per
+# field, best first: when several columns match a field, the one whose text
+# comes earliest wins (so 'Description' beats 'Reference' in the same table).
+COLUMN_SYNONYMS = {
+    "date": (
+        "date", "txn date", "tran date", "trans date", "transaction date", "posting date", "post date", "value date",
+    ),
+    "description": (
+        "description", "details", "transaction details", "particulars", "narration", "narrative", "remarks",
+        "transaction", "transactions", "payee", "merchant", "reference",
+    ),
+    "debit": (
+        "debit", "debits", "dr", "debit amount", "withdrawal", "withdrawals", "withdrawal amt", "paid out",
+        "money out", "payments", "out",
+    ),
+    "credit": (
+        "credit", "credits", "cr", "credit amount", "deposit", "deposits", "deposit amt", "paid in", "money in",
+        "receipts", "in",
+    ),
+    "amount": ("amount", "amt", "transaction amount"),
+    "type": ("type", "dr/cr", "cr/dr", "debit/credit", "txn type"),
+    "balance": ("balance", "running balance", "closing balance", "balance amount"),
+}
+
+# Rows that carry the opening and closing balance instead of a transaction.
+_OPENING = re.compile(r"(?i)brought\s+forward|opening\s+balance|balance\s+b/?f|previous\s+balance")
+_CLOSING = re.compile(r"(?i)carried\s+forward|closing\s+balance|balance\s+c/?f")
+
+_UNITS = re.compile(r"\(.*?\)")
+_NOT_WORD = re.compile(r"[^a-z/ ]+")
+_HAS_DIGIT = re.compile(r"\d")
+
+# Amount cells: a number with optional thousands separators (also Indian
+# grouping, '1,00,000.00'), wrapped in an optional currency symbol or code,
+# sign, brackets and Dr/Cr marker. Anything else is not read as an amount.
+_CURRENCY = r"(?:rs\.?|inr|usd|gbp|eur|[₹$£€])"
+_AMOUNT = re.compile(
+    rf"^(?P<open>\()?\s*(?P<lead>[-+])?\s*{_CURRENCY}?\s*(?P<inner>[-+])?\s*"
+    r"(?P<number>\d{1,3}(?:,\d{2,3})*(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)"
+    rf"\s*{_CURRENCY}?\s*(?P<trail>-)?\s*(?P<marker>dr|cr)?\.?\s*(?P<close>\))?$",
+    re.IGNORECASE,
+)
+
+# How many rows at the top of a table may precede its header row (titles etc.).
+_HEADER_SEARCH_ROWS = 3
+
+
+def _header_key(cell: str) -> str:
+    text = _UNITS.sub(" ", cell.lower())
+    return " ".join(_NOT_WORD.sub(" ", text).split())
+
+
+def map_columns(row: List[str]) -> Optional[Dict[str, int]]:
+    """
+    Maps a table's header row to column indexes, e.g. {'date': 0,
+    'description': 1, 'debit': 2, 'credit': 3, 'balance': 4}.
+
+    Returns:
+        dict | None: The mapping, or None if the row is not a usable header
+                     (it needs a date, a description and at least one amount column).
+    """
+    ranked: Dict[str, tuple[int, int]] = {}
+    for index, cell in enumerate(row):
+        key = _header_key(cell)
+        for field, synonyms in COLUMN_SYNONYMS.items():
+            if key in synonyms:
+                rank = synonyms.index(key)
+                if field not in ranked or rank < ranked[field][0]:
+                    ranked[field] = (rank, index)
+                break
+    columns = {field: index for field, (_, index) in ranked.items()}
+    has_amounts = "debit" in columns or "credit" in columns or "amount" in columns
+    if "date" in columns and "description" in columns and has_amounts:
+        return columns
+    return None
+
+
+def _read_amount(cell: str) -> Optional[tuple[float, bool]]:
+    """
+    Reads an amount cell ('Rs. 1,200.00', '₹250', '(12.00)', '500.00-', '12.00 Dr').
+
+    Returns:
+        tuple[float, bool] | None: The amount (negative for a minus sign,
+            brackets or 'Dr') and whether the cell said which way the money
+            went (a sign, brackets or Dr/Cr); None if it is not an amount.
+    """
+    match = _AMOUNT.match(cell.strip())
+    if match is None or bool(match["open"]) != bool(match["close"]):
+        return None
+    signs = [sign for sign in (match["lead"], match["inner"], match["trail"]) if sign]
+    marker = (match["marker"] or "").lower()
+    value = float(match["number"].replace(",", ""))
+    negative = bool(match["open"]) or "-" in signs or marker == "dr"
+    return (-value if negative else value), bool(match["open"] or signs or marker)
+
+
+def _amount(cell: str) -> Optional[float]:
+    """A cell's amount (see _read_amount), or None if it holds none."""
+    amount = _read_amount(cell)
+    return amount[0] if amount is not None else None
+
+
+def _cell(row: List[str], columns: Dict[str, int], field: str) -> str:
+    index = columns.get(field)
+    return row[index].strip() if index is not None and index < len(row) else ""
+
+
+def _parse_row(row: List[str], columns: Dict[str, int], previous_balance: Optional[float]) -> Optional[Dict]:
+    """Turns one body row into a transaction, or returns None if it is not a transaction row."""
+    date = parse_statement_date(_cell(row, columns, "date"))
+    if date is None:
+        return None
+    # A number the amount reader does not understand (another currency format,
+    # OCR noise) makes the row the LLM's job rather than a wrong transaction.
+    for field in ("debit", "credit", "amount", "balance"):
+        text = _cell(row, columns, field)
+        if _HAS_DIGIT.search(text) and _read_amount(text) is None:
+            return None
+
+    balance = _amount(_cell(row, columns, "balance"))
+    debit = _amount(_cell(row, columns, "debit"))
+    credit = _amount(_cell(row, columns, "credit"))
+    if debit is None and credit is None:
+        read = _read_amount(_cell(row, columns, "amount"))
+        if read is None:
+            return None
+        amount, signed = read
+        kind = _cell(row, columns, "type").lower()
+        if kind.startswith(("cr", "credit")):
+            credit = abs(amount)
+        elif kind.startswith(("dr", "debit")):
+            debit = abs(amount)
+        elif balance is not None and previous_balance is not None:
+            # The running balance tells which way the money went.
+            if abs(previous_balance - abs(amount) - balance) < 0.005:
+                debit = abs(amount)
+            elif abs(previous_balance + abs(amount) - balance) < 0.005:
+                credit = abs(amount)
+            else:
+                return None
+        elif signed:
+            if amount < 0:
+                debit = -amount
+            else:
+                credit = amount
+        else:
+            # An unsigned amount with nothing saying whether it is a debit or a credit.
+            return None
+
+    return {
+        "date": date.strftime("%m/%d/%Y"),
+        "description": " ".join(_cell(row, columns, "description").split()),
+        "debit": abs(debit or 0.0),
+        "credit": abs(credit or 0.0),
+        "balance": balance if balance is not None else 0.0,
+    }
+
+
+def extract_table_transactions(page_data: List[Dict]) -> tuple[Optional[Dict], List[Dict]]:
+    """
+    Reads transactions out of the table grids of the structured pages.
+
+    A table without a header row is read with the columns of the last table
+    read only when it continues that table: it is the first table on the
+    page right after it, has the same number of columns, and its first row
+    starts with a date. Any other headerless table is left to the LLM.
+
+    Returns:
+        tuple[dict | None, List[Dict]]: The partial statement data ('transactions'
+            and, when a table states them, 'beginning_balance'/'ending_balance'),
+            with the numbers of the 'pages' they were read from, or None if no
+            table could be read; and copies of the pages with the
+            consumed table rows removed, for the LLM. Rows that were not
+            understood stay in their table, under its header.
+    """
+    transactions: List[Dict] = []
+    balances: Dict[str, float] = {}
+    remaining_pages: List[Dict] = []
+    columns: Optional[Dict[str, int]] = None
+    width = 0
+    tables_read = rows_left = 0
+    pages_read: List[int] = []
+    # The page of the last table transactions were read from.
+    last_table_page: Optional[int] = None
+
+    for page in page_data:
+        elements = page.get("elements")
+        if not elements:
+            remaining_pages.append(page)
+            continue
+
+        kept = []
+        first_table = True
+        for element in elements:
+            rows = element.get("rows")
+            if element.get("category") != "Table" or not rows:
+                kept.append(element)
+                continue
+            continues_previous = (
+                first_table and columns is not None and last_table_page is not None
+                and page["page"] == last_table_page + 1
+                and max(len(row) for row in rows) == width
+                and parse_statement_date(_cell(rows[0], columns, "date")) is not None
+            )
+            first_table = False
+
+            # Find this table's header, or continue the previous table.
+            header_index = None
+            for index, row in enumerate(rows[:_HEADER_SEARCH_ROWS]):
+                mapping = map_columns(row)
+                if mapping is not None:
+                    columns, width, header_index = mapping, len(row), index
+                    break
+            if header_index is None and not continues_previous:
+                kept.append(element)
+                continue
+
+            body = rows[header_index + 1:] if header_index is not None else rows
+            leftover = []
+            table_transactions = []
+            for row in body:
+                previous = table_transactions[-1]["balance"] if table_transactions else (
+                    transactions[-1]["balance"] if transactions else balances.get("beginning_balance")
+                )
+                transaction = _parse_row(row, columns, previous)
+                if transaction is not None:
+                    table_transactions.append(transaction)
+                    continue
+                description = " ".join(_cell(row, columns, "description").split()) or " ".join(" ".join(row).split())
+                row_balance = _amount(_cell(row, columns, "balance"))
+                amounts = [_amount(_cell(row, columns, field)) for field in ("debit", "credit", "amount")]
+                if row_balance is not None and _OPENING.search(description) and not transactions and not table_transactions:
+                    balances["beginning_balance"] = row_balance
+                elif row_balance is not None and _CLOSING.search(description):
+                    balances["ending_balance"] = row_balance
+                elif table_transactions and description and all(a is None for a in amounts) and row_balance is None:
+                    # A description wrapped onto the next row.
+                    table_transactions[-1]["description"] += " " + description
+                elif any(cell.strip() for cell in row):
+                    leftover.append(row)
+
+            if not table_transactions:
+                kept.append(element)
+                continue
+            tables_read += 1
+            last_table_page = page["page"]
+            transactions.extend(table_transactions)
+            if page["page"] not in pages_read:
+                pages_read.append(page["page"])
+            if leftover:
+                rows_left += len(leftover)
+                # Keep the header (and any title rows above it) as context.
+                header = rows[:header_index + 1] if header_index is not None else []
+                kept.append({
+                    **element,
+                    "rows": header + leftover,
+                    "text": "\n".join(" ".join(row) for row in header + leftover),
+                })
+
+        remaining_pages.append({
+            **page,
+            "elements": kept,
+            "text": "\n\n".join(element["text"] for element in kept if element.get("text")),
+        })
+
+    if not transactions:
+        return None, page_data
+
+    logger.info(
+        "Read transactions from table grids.",
+        extra={"tables": tables_read, "transactions": len(transactions), "rows_left": rows_left},
+    )
+    return {"transactions": transactions, **balances, "pages": pages_read}, remaining_pages
@@ -0,0 +1,239 @@
+# --- Imports ---
+import logging
+import re
+import copy
+import time
+from typing import List, Dict, Optional
+from sqlalchemy.orm import Session
+
+from .c_validation import validate_and_enrich_data
+from ..core.models import StatementData
+from ..database import crud
+from ..utils.dates import parse_statement_date
+
+logger = logging.getLogger(__name__)
+
+# --- Helpers ---
+
+def parse_amount(value: str) -> float:
+    """Parses amounts like '8,313.30', '(12.50)' or '₹1,200' into a float."""
+    text = value.strip()
+    negative = text.startswith("(") and text.endswith(")")
+    number = float(re.sub(r"[^\d.]", "", text) or 0)
+    return -number if negative else number
+
+
+def _normalize_date(value: str) -> str:
+    """Normalises a date to the 'MM/DD/YYYY' format the rest of the pipeline uses."""
+    parsed = parse_statement_date(value)
+    return parsed.strftime("%m/%d/%Y") if parsed else value.strip()
+
+
+# --- Template Definition ---
+
+class StatementTemplate:
+    """
+    A deterministic parser for one known statement layout.
+
+    A template recognises its layout with 'detect' regexes, reads the header
+    fields with 'header_patterns', and turns every line matching 'row_pattern'
+    into a transaction. No LLM is involved.
+
+    Attributes:
+        name (str): Unique template name, used in stats.
+        detect (List[str]): Regexes that must ALL match the document text.
+        header_patterns (Dict[str, str]): StatementData field -> regex whose first
+            group holds the value (e.g. 'account_number', 'beginning_balance').
+        row_pattern (str): Regex applied to every line. Named groups: 'date',
+            'description', 'balance' and either 'amount' or 'debit'/'credit'.
+            With a single 'amount', the direction is derived from the change
+            in the running balance.
+        currency_symbol (str): Currency of the layout.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        detect: List[str],
+        header_patterns: Dict[str, str],
+        row_pattern: str,
+        currency_symbol: str = "$",
+    ):
+        self.name = name
+        self.detect = [re.compile(pattern) for pattern in detect]
+        self.header_patterns = {field: re.compile(pattern) for field, pattern in header_patterns.items()}
+        self.row_pattern = re.compile(row_pattern, re.MULTILINE)
+        self.currency_symbol = currency_symbol
+
+    def matches(self, text: str) -> bool:
+        """Returns True if the document looks like this template's layout."""
+        return all(pattern.search(text) for pattern in self.detect)
+
+    def parse(self, page_data: List[Dict]) -> Optional[dict]:
+        """
+        Parses the page texts into a StatementData dict.
+
+        Returns:
+            dict | None: The parsed data, or None if no transactions were found or
+                         a row could not be interpreted unambiguously.
+        """
+        text = "\n".join(page['text'] for page in page_data)
+
+        # Step 1: Header fields, with the same defaults the LLM prompt uses.
+        header = {}
+        for field, pattern in self.header_patterns.items():
+            match = pattern.search(text)
+            if match:
+                header[field] = match.group(1).strip()
+
+        beginning_balance = parse_amount(header["beginning_balance"]) if "beginning_balance" in header else 0.0
+
+        # Step 2: Transactions, one per matching line.
+        transactions = []
+        previous_balance = beginning_balance
+        for match in self.row_pattern.finditer(text):
+            groups = match.groupdict()
+            balance = parse_amount(groups["balance"]) if groups.get("balance") else 0.0
+
+            if groups.get("amount") is not None:
+                amount = parse_amount(groups["amount"])
+                if abs(previous_balance - amount - balance) < 0.005:
+                    debit, credit = amount, 0.0
+                elif abs(previous_balance + amount - balance) < 0.005:
+                    debit, credit = 0.0, amount
+                else:
+                    # The balance does not explain the amount: leave it to the LLM.
+                    return None
+            else:
+                debit = parse_amount(groups["debit"]) if groups.get("debit") else 0.0
+                credit = parse_amount(groups["credit"]) if groups.get("credit") else 0.0
+
+            transactions.append({
+                "date": _normalize_date(groups["date"]),
+                "description": re.sub(r"\s+", " ", groups["description"]).strip(),
+                "debit": debit,
+                "credit": credit,
+                "balance": balance,
+            })
+            previous_balance = balance
+
+        if not transactions:
+            return None
+
+        if "ending_balance" in header:
+            ending_balance = parse_amount(header["ending_balance"])
+        else:
+            ending_balance = transactions[-1]["balance"]
+
+        data = StatementData(
+            account_holder=header.get("account_holder", "Unknown"),
+            account_number=header.get("account_number", "N/A"),
+            period_start=_normalize_date(header["period_start"]) if "period_start" in header else transactions[0]["date"],
+            period_end=_normalize_date(header["period_end"]) if "period_end" in header else transactions[-1]["date"],
+            beginning_balance=beginning_balance,
+            ending_balance=ending_balance,
+            currency_symbol=self.currency_symbol,
+            transactions=transactions,
+        )
+        return data.model_dump()
+
+
+# --- Template Registry ---
+# Templates are tried in registration order; the first one that matches and
+# produces a consistent result wins.
+TEMPLATES: List[StatementTemplate] = []
+
+def register_template(template: StatementTemplate) -> StatementTemplate:
+    """Adds a template to the registry. Names must be unique."""
+    if any(existing.name == template.name for existing in TEMPLATES):
+        raise ValueError(f"A template named '{template.name}' is already registered.")
+    TEMPLATES.append(template)
+    return template
+
+
+# --- Built-in Templates ---
+
+# Traditional ledger layout: "Date Description Paid Out Paid In Balance" with a
+# "Balance Brought Forward" line and one amount + running balance per row.
+register_template(StatementTemplate(
+    name="ledger_brought_forward",
+    detect=[
+        r"(?i)balance\s+brought\s+forward",
+        r"(?i)\bdate\b.*\bdescription\b.*\bbalance\b",
+    ],
+    header_patterns={
+        "account_holder": r"(?im)^\s*account\s+(?:name|holder)\s*:?\s*(.+?)\s*$",
+        "account_number": r"(?i)account\s+(?:number|no\.?)\s*:?\s*([\d][\d -]{5,}\d)",
+        "period_start": r"(?i)period\s*:?\s*(\d{2}/\d{2}/\d{4})",
+        "period_end": r"(?i)period\s*:?\s*\d{2}/\d{2}/\d{4}\s+(?:to|-)\s+(\d{2}/\d{2}/\d{4})",
+        "beginning_balance": r"(?i)balance\s+brought\s+forward\s+([\d,]+\.\d{2})",
+        "ending_balance": r"(?i)balance\s+carried\s+forward\s+([\d,]+\.\d{2})",
+    },
+    row_pattern=r"^\s*(?P<date>\d{2}/\d{2}/\d{4})\s+(?P<description>.+?)\s+(?P<amount>[\d,]+\.\d{2})\s+(?P<balance>[\d,]+\.\d{2})\s*$",
+))
+
+
+# --- Core Function ---
+
+def extract_with_templates(page_data: List[Dict], db: Session) -> Optional[dict]:
+    """
+    Tries every registered template against the structured pages.
+
+    A template result is only accepted when validate_and_enrich_data finds its
+    ending and running balances consistent; otherwise the caller falls back to the LLM. Attempts,
+    hits and rejections are recorded per template (with timings) in the shared
+    'pipeline_stats' counters.
+
+    Returns:
+        dict | None: The StatementData dict from the first accepted template.
+    """
+    text = "\n".join(page['text'] for page in page_data)
+
+    for template in TEMPLATES:
+        if not template.matches(text):
+            continue
+
+        started = time.perf_counter()
+        result = template.parse(page_data)
+        elapsed = time.perf_counter() - started
+        crud.increment_stat(db, f"template.{template.name}.attempt", total=elapsed)
+
+        if result is None:
+            logger.info("Template matched the layout but could not parse it.", extra={"template": template.name})
+            continue
+
+        # validate_and_enrich_data adds a summary in place, so check a copy.
+        summary = validate_and_enrich_data(copy.deepcopy(result))['summary']
+        if not (summary['is_consistent'] and summary['running_balance_consistent']):
+            logger.info("Template result is inconsistent; falling back to the LLM.", extra={"template": template.name})
+            crud.increment_stat(db, f"template.{template.name}.rejected", total=elapsed)
+            continue
+
+        logger.info(
+            "Template parsed the statement.",
+            extra={"template": template.name, "transactions": len(result['transactions']), "ms": round(elapsed * 1000, 1)},
+        )
+        crud.increment_stat(db, f"template.{template.name}.hit", total=elapsed)
+        return result
+
+    crud.increment_stat(db, "template.none")
+    return None
+
+
+def template_stats(db: Session) -> dict:
+    """Returns attempts, hits, hit rate and average parse time per template."""
+    counters = crud.get_stats(db, prefix="template.")
+    report = {}
+    for template in TEMPLATES:
+        attempt = counters.get(f"template.{template.name}.attempt", {"count": 0, "total": 0.0})
+        hit = counters.get(f"template.{template.name}.hit", {"count": 0, "total": 0.0})
+        rejected = counters.get(f"template.{template.name}.rejected", {"count": 0, "total": 0.0})
+        report[template.name] = {
+            "attempts": attempt["count"],
+            "hits": hit["count"],
+            "rejected": rejected["count"],
+            "hit_rate": round(hit["count"] / attempt["count"], 4) if attempt["count"] else 0.0,
+            "avg_parse_ms": round(1000 * attempt["total"] / attempt["count"], 3) if attempt["count"] else 0.0,
+        }
+    report["no_template_matched"] = counters.get("template.none", {"count": 0})["count"]
+    return report
@@ -1,60 +1,178 @@
 # --- Imports ---
-import pandas as pd
+import logging
+import numpy as np
+
+from ..core.columnar import TransactionBatch, to_minor_units
+
+logger = logging.getLogger(__name__)
+
+# --- Helpers ---
+
+def _is_digit_swap(a: int, b: int) -> bool:
+    """True if the two amounts differ only by two adjacent digits being swapped."""
+    x, y = str(abs(int(a))), str(abs(int(b)))
+    # A swap keeps the number of digits; 1000 vs 10000 is a missing digit, not a swap.
+    if len(x) != len(y):
+        return False
+    diff = [i for i in range(len(x)) if x[i] != y[i]]
+    return len(diff) == 2 and diff[1] == diff[0] + 1 and x[diff[0]] == y[diff[1]] and x[diff[1]] == y[diff[0]]
+
+
+def reconcile_transactions(batch: TransactionBatch, opening: int) -> dict:
+    """
+    Checks every row's balance against the running balance computed from the
+    beginning balance and the debits/credits before it.
+
+    Two per-row checks are made:
+      - 'balance_ok': the stated balance equals beginning + cumsum(credit - debit).
+        Once a row is wrong, every later row is usually wrong as well, so the
+        first False marks where the statement diverges.
+      - 'step_ok': the change from the previous stated balance equals the
+        credits - debits since it. This pinpoints the bad rows themselves,
+        because a single misread amount or balance only breaks its own step
+        (or the next one).
+
+    A balance of 0 means none was printed for the row (e.g. statements that
+    print one balance per day), so such rows pass both checks and the next
+    stated balance is checked against everything since the last one.
+
+    All amounts are integer minor units, so both checks are exact comparisons.
+
+    Rows whose step is off by a multiple of 9 minor units where the amount or
+    balance differs from the implied one by two swapped adjacent digits are
+    flagged as likely OCR digit swaps. Rows identical to an earlier row in every
+    field are flagged as duplicates.
+
+    Args:
+        batch (TransactionBatch): The statement's transactions.
+        opening (int): The beginning balance in minor units.
+
+    Returns:
+        dict: Per-row boolean masks ('balance_ok', 'step_ok',
+              'possible_digit_swap', 'duplicate') as lists, plus
+              'first_divergent_row' (index or None) and 'has_balances'.
+    """
+    count = len(batch)
+    debit, credit, balance = batch.debits, batch.credits, batch.balances
+    net = batch.net
+    # Rows without a printed balance come back with a balance of 0; statements
+    # without a balance column have no balances at all.
+    stated = balance != 0
+    has_balances = bool(np.any(stated))
+
+    # For each row, the last row before it with a stated balance (-1: the
+    # beginning balance), its balance and the running net up to it.
+    running = np.cumsum(net)
+    last_stated = np.maximum.accumulate(np.where(stated, np.arange(count), -1))
+    anchor = np.empty(count, dtype=np.int64)
+    anchor[:1] = -1
+    anchor[1:] = last_stated[:-1]
+    previous = np.where(anchor >= 0, balance[anchor], opening)
+    since = running - np.where(anchor >= 0, running[anchor], 0)
+
+    balance_ok = ~stated | (opening + running == balance)
+    step = balance - previous
+    step_ok = ~stated | (step == since)
+
+    divergent = np.flatnonzero(~balance_ok)
+    first_divergent_row = int(divergent[0]) if divergent.size else None
+
+    # Digit swaps: a transposition of two adjacent digits always changes an
+    # amount by a multiple of 9, so only those rows get the (slower) digit check.
+    possible_digit_swap = np.zeros(count, dtype=bool)
+    candidates = np.flatnonzero(~step_ok & ((step - since) % 9 == 0))
+    for i in candidates:
+        amount = credit[i] if net[i] > 0 else debit[i]
+        implied = step[i] - (since[i] - net[i])
+        if _is_digit_swap(amount, abs(implied)) or _is_digit_swap(balance[i], previous[i] + since[i]):
+            possible_digit_swap[i] = True
+
+    # Duplicates: the same date, description, amounts and balance as an earlier
+    # row. Only rows whose balance repeats can be duplicates, and with a running
+    # balance those are rare, so the full comparison runs on a handful of rows.
+    # Interned strings compare by their integer IDs.
+    duplicate = np.zeros(count, dtype=bool)
+    if count:
+        numbers = balance if has_balances else net
+        _, inverse, counts = np.unique(numbers, return_inverse=True, return_counts=True)
+        first_seen = {}
+        for i in np.flatnonzero(counts[inverse] > 1):
+            key = (batch.date_text_ids[i], batch.description_ids[i], debit[i], credit[i], balance[i])
+            duplicate[i] = first_seen.setdefault(key, i) != i
+
+    return {
+        'has_balances': has_balances,
+        'first_divergent_row': first_divergent_row,
+        'balance_ok': balance_ok.tolist(),
+        'step_ok': step_ok.tolist(),
+        'possible_digit_swap': possible_digit_swap.tolist(),
+        'duplicate': duplicate.tolist(),
+    }
+
 
 # --- Core Function ---
-def validate_and_enrich_data(statement_data: dict) -> dict:
+def validate_and_enrich_data(statement_data: dict, batch: TransactionBatch | None = None) -> dict:
     """
     Performs deterministic calculations and enriches the data for the frontend.
 
     This function takes the clean JSON data from the LLM and performs a final,
     critical validation step: checking if the financial arithmetic is correct.
     It calculates the ending balance based on the transactions and compares it
-    to the ending balance extracted by the LLM.
+    to the ending balance extracted by the LLM, and reconciles every row's
+    running balance (see reconcile_transactions).
 
     It also enriches the data with a 'summary' dictionary that the frontend
-    can use to display key metrics.
+    can use to display key metrics, and a 'validation' dictionary with the
+    per-row results.
 
     Args:
         statement_data (dict): The structured data extracted by the LLM.
+        batch (TransactionBatch, optional): The same transactions in columnar
+            form, if the caller already built it; otherwise it is built here.
 
     Returns:
-        dict: The original data, enriched with a 'summary' dictionary containing
-              calculated totals and a validation flag.
+        dict: The original data, enriched with 'summary' (calculated totals and
+              validation flags) and 'validation' (per-row masks).
     """
-    print("Performing final validation and data enrichment...")
+    logger.info("Performing final validation and data enrichment...")
 
-    # Convert the list of transaction dictionaries into a Pandas DataFrame for easy numerical operations.
-    df = pd.DataFrame(statement_data.get('transactions', []))
+    if batch is None:
+        batch = TransactionBatch.from_transactions(statement_data.get('transactions') or [])
+    opening, ending = to_minor_units(
+        [statement_data.get('beginning_balance'), statement_data.get('ending_balance')], batch.scale,
+    ).tolist()
 
-    # Ensure the debit and credit columns are numeric, coercing errors to NaN and then filling with 0.
-    df['credit'] = pd.to_numeric(df['credit'], errors='coerce').fillna(0.0)
-    df['debit'] = pd.to_numeric(df['debit'], errors='coerce').fillna(0.0)
-
-    # Calculate the sum of all credits and debits.
-    total_credits = df['credit'].sum()
-    total_debits = df['debit'].sum()
+    # Sum in integer minor units so the totals and the check below are exact.
+    total_credits = int(batch.credits.sum())
+    total_debits = int(batch.debits.sum())
 
     # Perform the core financial check.
-    calculated_balance = (
-        statement_data.get('beginning_balance', 0) + total_credits - total_debits
-    )
+    calculated_balance = opening + total_credits - total_debits
+    is_consistent = calculated_balance == ending
+
+    validation = reconcile_transactions(batch, opening)
+    running_balance_consistent = validation['first_divergent_row'] is None
 
-    # Compare the calculated balance to the statement's ending balance with a small tolerance.
-    is_consistent = abs(calculated_balance - statement_data.get('ending_balance', 0)) < 0.01
-    
     if is_consistent:
-        print("Validation successful: Balances are consistent.")
+        logger.info("Validation successful: Balances are consistent.")
     else:
-        print("Validation FAILED: Calculated balance does not match statement's ending balance.")
+        logger.warning("Validation FAILED: Calculated balance does not match statement's ending balance.")
+    if not running_balance_consistent:
+        logger.warning("Validation FAILED: Running balance diverges.", extra={"row": validation['first_divergent_row']})
 
     # Add a new 'summary' dictionary to the main data object for the frontend.
     statement_data['summary'] = {
-        'total_credits': round(total_credits, 2),
-        'total_debits': round(total_debits, 2),
-        'calculated_balance': round(calculated_balance, 2),
-        'is_consistent': bool(is_consistent)
+        'total_credits': total_credits / batch.scale,
+        'total_debits': total_debits / batch.scale,
+        'calculated_balance': calculated_balance / batch.scale,
+        'is_consistent': bool(is_consistent),
+        'running_balance_consistent': running_balance_consistent,
+        'first_divergent_row': validation['first_divergent_row'],
+        'possible_digit_swaps': sum(validation['possible_digit_swap']),
+        'duplicate_rows': sum(validation['duplicate']),
     }
-    
-    print("Data enrichment complete.")
+    statement_data['validation'] = validation
+
+    logger.info("Data enrichment complete.")
 
-    return statement_data
\ No newline at end of file
+    return statement_data
@@ -0,0 +1,305 @@
+# --- Imports ---
+import time
+import logging
+from typing import Callable, Iterable, Optional
+from sqlalchemy.orm import Session
+
+from .a_structuring import (
+    structure_document_by_page, structure_images_by_page, STRUCTURING_VERSION, STRUCTURING_SETTINGS,
+)
+from .b_extraction import (
+    extract_data_with_llm, extract_chunks, merge_chunks, make_chunk, PROMPT_VERSION, EXTRACTION_SETTINGS,
+)
+from .b_templates import extract_with_templates
+from .c_validation import validate_and_enrich_data
+from ..database import crud
+from ..core.config import settings
+from ..core.models import StatementData
+from ..core.columnar import TransactionBatch
+from ..core import metrics
+from ..utils import result_cache
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# The ordered stages of the pipeline. They are reported to the progress callback
+# so that job status polling can show where a document currently is.
+STAGES = ("structuring", "extracting", "persisting", "validating")
+
+# A progress callback receives the name of the stage that is starting and the
+# approximate completion percentage of the whole pipeline.
+ProgressCallback = Callable[[str, int], None]
+
+# An event callback receives an event name and a JSON-serialisable payload as
+# soon as a piece of the result is available (used for streaming responses).
+EventCallback = Callable[[str, dict], None]
+
+
+# --- Core Orchestration Function ---
+def run_pipeline(
+    file_path: str | list[str],
+    filename: str,
+    db: Session,
+    progress: Optional[ProgressCallback] = None,
+    on_event: Optional[EventCallback] = None,
+    persist: bool = True,
+    file_hash: Optional[str] = None,
+) -> dict:
+    """
+    Runs the full processing pipeline for a single uploaded document.
+
+    This is the same sequence the /parse endpoint has always used (structure ->
+    extract -> persist -> validate), pulled into one function so that it can be
+    executed inside a worker process instead of the API's event loop.
+
+    Each stage is timed with metrics.span(). Inside a worker the timings (and
+    the page and LLM measurements) go into the trace opened by the caller with
+    metrics.collect(), which is shipped back to the API process.
+
+    Args:
+        file_path (str | list[str]): Path to the saved temporary upload, or the
+            paths of the page images of a statement photographed one page per
+            image, in page order.
+        filename (str): The original filename of the uploaded document.
+        db (Session): The database session used to persist the statement.
+        progress (ProgressCallback, optional): Called at the start of each stage.
+        on_event (EventCallback, optional): Receives 'stage', 'page_structured',
+            'chunk_extracted', 'persisted' and 'validated' events with partial results.
+        persist (bool): Save the statement, with its pages and extraction chunks
+            for later re-extraction (see rerun_extraction). Batch uploads pass
+            False and save all of their statements, with those artifacts,
+            together in one database transaction. Unsaved runs fail on any
+            failed extraction window instead of saving a partial statement.
+        file_hash (str, optional): SHA-256 of the file (see
+            result_cache.combined_sha256 for page images) if the caller already
+            computed it while saving the upload; otherwise it is computed here.
+
+    Returns:
+        dict: The validated and enriched statement data, including the ID of the
+              saved statement under 'statement_id' (None when not persisted).
+              When not persisted, 'extraction_artifacts' holds the 'pages' and
+              'chunks' for crud.save_statements_bulk.
+    """
+
+    started = time.perf_counter()
+
+    def emit(event: str, **data):
+        if on_event is not None:
+            on_event(event, data)
+
+    def report(stage: str):
+        percent = int(100 * STAGES.index(stage) / len(STAGES))
+        if progress is not None:
+            progress(stage, percent)
+        emit("stage", stage=stage, progress=percent)
+
+    chunks_emitted = 0
+
+    def on_chunk(index: int, total: int, chunk_result: dict):
+        nonlocal chunks_emitted
+        chunks_emitted += 1
+        emit("chunk_extracted", chunk=index + 1, of=total, transactions=chunk_result.get("transactions", []))
+
+    # The SHA-256 of the upload identifies repeat uploads of the same file, so
+    # both expensive stages below can be served from the result cache.
+    if file_hash is None:
+        if isinstance(file_path, list):
+            file_hash = result_cache.combined_sha256([result_cache.file_sha256(path) for path in file_path])
+        else:
+            file_hash = result_cache.file_sha256(file_path)
+
+    def structure():
+        if isinstance(file_path, list):
+            return structure_images_by_page(file_path)
+        return structure_document_by_page(file_path)
+
+    # The settings the results depend on are part of their cache keys.
+    structuring_settings = result_cache.settings_fingerprint(STRUCTURING_SETTINGS)
+
+    # Step 1: Turn the document into per-page text.
+    report("structuring")
+    with metrics.span("structuring"):
+        page_texts = result_cache.get_or_compute(
+            db, "structure",
+            result_cache.make_key("structure", file_hash, STRUCTURING_VERSION, structuring_settings),
+            structure,
+        )
+    metrics.record(metrics.PIPELINE_PAGES, len(page_texts))
+    for page in page_texts:
+        emit("page_structured", page=page["page"], strategy=page.get("strategy", "hi_res"), chars=len(page["text"]))
+
+    # Step 2: Extract the structured statement data. Known layouts are parsed
+    # by a rule-based template; everything else goes to the LLM.
+    # The partial results the statement is merged from are kept with it, so
+    # its pages can be re-extracted later. A cache hit has none.
+    report("extracting")
+    chunks: list[dict] = []
+    with metrics.span("extracting"):
+        extracted_data_dict = None
+        if settings.TEMPLATES_ENABLED:
+            extracted_data_dict = extract_with_templates(page_texts, db)
+            if extracted_data_dict is not None:
+                chunks.append(make_chunk("template", [page["page"] for page in page_texts], extracted_data_dict))
+        if extracted_data_dict is None:
+            cache_key = result_cache.make_key(
+                "extraction", file_hash, STRUCTURING_VERSION, structuring_settings, PROMPT_VERSION,
+                result_cache.settings_fingerprint(EXTRACTION_SETTINGS), settings.LLM_MODEL,
+            )
+            if settings.CACHE_ENABLED:
+                extracted_data_dict = result_cache.get(db, "extraction", cache_key)
+            if extracted_data_dict is None:
+                extracted_data_dict = extract_data_with_llm(
+                    page_texts, on_chunk=on_chunk, chunks=chunks, allow_failures=persist,
+                )
+                # A result with failed chunks is incomplete, so it is not cached.
+                if settings.CACHE_ENABLED and all(chunk["status"] == "ok" for chunk in chunks):
+                    result_cache.put(db, "extraction", cache_key, extracted_data_dict)
+    if chunks_emitted == 0:
+        # Templates, cache hits and single-prompt runs produce one batch.
+        on_chunk(0, 1, extracted_data_dict)
+
+    # Step 3: Save the statement and its transactions to the database.
+    report("persisting")
+    pydantic_data = StatementData(**extracted_data_dict)
+    # Persistence and validation both read the transactions from one columnar
+    # batch instead of converting the row dicts separately.
+    batch = TransactionBatch.from_transactions(pydantic_data.transactions)
+    statement_id = None
+    if persist:
+        with metrics.span("persisting"):
+            statement_id = crud.save_statement_data(
+                db=db, data=pydantic_data, filename=filename, source_hash=file_hash, batch=batch,
+            )
+            crud.save_extraction_artifacts(db, statement_id, pages=page_texts, chunks=chunks)
+        emit("persisted", statement_id=statement_id)
+
+    # Step 4: Run the deterministic balance checks and add the summary.
+    report("validating")
+    with metrics.span("validating"):
+        final_data = validate_and_enrich_data(extracted_data_dict, batch=batch)
+    final_data["statement_id"] = statement_id
+    final_data["source_hash"] = file_hash
+    if not persist:
+        final_data["extraction_artifacts"] = {"pages": page_texts, "chunks": chunks}
+    emit("validated", summary=final_data["summary"])
+
+    # Report how each page was structured, so slow (OCR) pages are visible.
+    final_data["page_strategies"] = [
+        {"page": page["page"], "strategy": page.get("strategy", "hi_res")} for page in page_texts
+    ]
+
+    metrics.record(metrics.PIPELINE_SECONDS, time.perf_counter() - started)
+    return final_data
+
+
+# --- Re-Extraction ---
+
+def rerun_extraction(
+    statement_id: int,
+    db: Session,
+    pages: Iterable[int] = (),
+    page_text: Optional[dict[int, str]] = None,
+) -> dict:
+    """
+    Re-extracts some pages of a stored statement from its stored pages, and
+    merges the result with the stored chunks of the other pages. Nothing is
+    structured (OCR'd) again, and only the LLM calls for the changed pages
+    are repeated.
+
+    The pages re-extracted are the requested ones, the corrected ones and
+    those of chunks that failed before. An LLM chunk that covers any of them
+    is re-extracted as a whole (its result cannot be split by page), so all
+    of its pages are sent again. Table grids are always read again, which
+    costs no LLM call. The statement keeps its ID; its transactions, chunks
+    and (corrected) pages are replaced.
+
+    Args:
+        statement_id (int): The statement to update.
+        db (Session): The database session.
+        pages (Iterable[int]): Page numbers to re-extract.
+        page_text (dict[int, str], optional): Corrected text per page number.
+            It replaces the structured text of the page for good.
+
+    Returns:
+        dict: The validated and enriched statement data, as run_pipeline
+              returns it, plus the 'reextracted_pages'.
+
+    Raises:
+        LookupError: If the statement has no stored pages.
+        ValueError: If a page does not exist, or nothing needs re-extracting.
+    """
+    started = time.perf_counter()
+    page_text = page_text or {}
+
+    statement = crud.get_statement(db, statement_id)
+    page_data = [
+        {
+            "page": row.page, "text": row.text, "strategy": row.strategy,
+            "elements": row.elements, "corrected": row.corrected,
+        }
+        for row in crud.list_page_artifacts(db, statement_id)
+    ]
+    if statement is None or not page_data:
+        raise LookupError(f"Statement {statement_id} has no stored pages to re-extract.")
+
+    known = {page["page"] for page in page_data}
+    unknown = (set(pages) | set(page_text)) - known
+    if unknown:
+        raise ValueError(f"Statement {statement_id} has no page(s) {sorted(unknown)}.")
+
+    # A correction replaces the text; the elements no longer match it.
+    for page in page_data:
+        if page["page"] in page_text:
+            page.update(text=page_text[page["page"]], strategy="corrected", elements=None, corrected=True)
+
+    stored = [
+        make_chunk(row.source, row.pages, row.result, row.error)
+        for row in crud.list_chunk_artifacts(db, statement_id)
+    ]
+    llm_chunks = [chunk for chunk in stored if chunk["source"] != "table"]
+    redo = set(pages) | set(page_text)
+    redo |= {page for chunk in llm_chunks if chunk["status"] == "failed" for page in chunk["pages"]}
+    if not llm_chunks:
+        # Served from the cache, so there is nothing to reuse.
+        redo = set(known)
+    if not redo:
+        raise ValueError("Nothing to re-extract: no pages were given and no chunk of the statement failed.")
+
+    kept = [chunk for chunk in llm_chunks if not redo & set(chunk["pages"])]
+    send = redo | {page for chunk in llm_chunks if redo & set(chunk["pages"]) for page in chunk["pages"]}
+    logger.info(
+        "Re-extracting pages.",
+        extra={"statement_id": statement_id, "pages": sorted(send), "reused_chunks": len(kept)},
+    )
+
+    with metrics.span("extracting"):
+        fresh = extract_chunks(page_data, only_pages=send, allow_failures=True)
+    tables = [chunk for chunk in fresh if chunk["source"] == "table"]
+    # Chunks are merged in document order, so neighbours are deduplicated at their overlap.
+    ordered = sorted(
+        kept + [chunk for chunk in fresh if chunk["source"] != "table"],
+        key=lambda chunk: (chunk["pages"][0], chunk["pages"][-1]),
+    )
+    chunks = tables + ordered
+    extracted_data_dict = merge_chunks(chunks)
+
+    pydantic_data = StatementData(**extracted_data_dict)
+    batch = TransactionBatch.from_transactions(pydantic_data.transactions)
+    with metrics.span("persisting"):
+        crud.save_statement_data(
+            db=db, data=pydantic_data, filename=statement.filename, source_hash=statement.source_hash,
+            batch=batch, statement_id=statement_id,
+        )
+        crud.save_extraction_artifacts(db, statement_id, pages=page_data if page_text else None, chunks=chunks)
+
+    with metrics.span("validating"):
+        final_data = validate_and_enrich_data(extracted_data_dict, batch=batch)
+    final_data["statement_id"] = statement_id
+    final_data["source_hash"] = statement.source_hash
+    final_data["reextracted_pages"] = sorted(send)
+    final_data["page_strategies"] = [
+        {"page": page["page"], "strategy": page.get("strategy", "hi_res")} for page in page_data
+    ]
+
+    metrics.record(metrics.PIPELINE_SECONDS, time.perf_counter() - started)
+    return final_data
@@ -0,0 +1,46 @@
+# --- Imports ---
+import re
+import datetime
+
+# --- Constants ---
+# The date formats we see in statements, tried in order. The LLM is asked to
+# normalise dates to MM/DD/YYYY, so that format comes first; DD/MM/YYYY only
+# matches when the day is greater than 12, mirroring the extraction prompt.
+DATE_FORMATS = (
+    "%m/%d/%Y",
+    "%m/%d/%y",
+    "%d/%m/%Y",
+    "%Y-%m-%d",
+    "%d %b %Y",
+    "%d %B %Y",
+    "%d-%b-%Y",
+    "%d-%b-%y",
+    "%b %d %Y",
+    "%B %d %Y",
+)
+
+# Trailing times such as "11:59 AM" or "23:10:05" are ignored.
+_TIME_SUFFIX = re.compile(r"\s+\d{1,2}:\d{2}(:\d{2})?(\s*[AaPp][Mm])?$")
+
+# --- Core Function ---
+def parse_statement_date(value: str | None) -> datetime.date | None:
+    """
+    Parses a date string as it appears in extracted statement data.
+
+    Args:
+        value (str | None): e.g. "09/01/2025", "09/01/2025 11:59 AM", "01 Sep, 2025".
+
+    Returns:
+        datetime.date | None: The parsed date, or None if the value is missing,
+                              a placeholder like "mm/dd/yyyy", or unrecognised.
+    """
+    if not value:
+        return None
+    text = _TIME_SUFFIX.sub("", value.strip()).replace(",", "")
+    text = re.sub(r"\s+", " ", text)
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
@@ -0,0 +1,179 @@
+# --- Imports ---
+import io
+import csv
+import datetime
+import tempfile
+import importlib.util
+from typing import Iterable, Iterator
+
+# --- Exports ---
+# Transactions are exported straight from the database, one batch of rows at a
+# time (see crud.iter_transaction_rows), and every batch is written to the
+# response as soon as it is formatted. Nothing is built up front, so memory use
+# stays flat however many rows are exported.
+#
+#   - csv:     plain text, written batch by batch.
+#   - parquet: one row group per batch (needs the optional 'pyarrow').
+#   - arrow:   an Arrow IPC stream, one record batch per batch (needs 'pyarrow').
+#   - xlsx:    an openpyxl workbook in write-only mode, which streams its rows to
+#              a temporary file. The file is a ZIP archive that is only complete
+#              once saved, so it is sent when the last row has been written.
+
+# The exported columns, in the order of the rows crud.iter_transaction_rows yields.
+COLUMNS = ("statement_id", "date", "date_text", "description", "debit", "credit", "balance")
+
+# Format -> (media type, file extension, module it needs).
+FORMATS = {
+    "csv": ("text/csv", "csv", None),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx", "openpyxl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet", "pyarrow"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", "pyarrow"),
+}
+
+# Size of the pieces the finished workbook is sent in.
+_FILE_CHUNK_BYTES = 64 * 1024
+
+
+class ExportUnavailableError(Exception):
+    """Raised when a format needs a package that is not installed."""
+
+
+def check_format(export_format: str):
+    """
+    Makes sure a format can be produced before the response starts.
+
+    Raises:
+        ValueError: If the format is unknown.
+        ExportUnavailableError: If the package it needs is not installed.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}; expected one of {tuple(FORMATS)}.")
+    module = FORMATS[export_format][2]
+    if module is not None and importlib.util.find_spec(module) is None:
+        raise ExportUnavailableError(f"The {export_format} export needs the '{module}' package, which is not installed.")
+
+
+def stream_export(export_format: str, batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    """
+    Formats batches of transaction rows (see COLUMNS) as a file, piece by piece.
+
+    Args:
+        export_format (str): One of FORMATS.
+        batches (Iterable[list[tuple]]): The rows, in batches.
+
+    Returns:
+        Iterator[bytes]: The pieces of the file, produced as the batches are read.
+    """
+    check_format(export_format)
+    writers = {"csv": _csv_chunks, "xlsx": _xlsx_chunks, "parquet": _parquet_chunks, "arrow": _arrow_chunks}
+    return writers[export_format](batches)
+
+
+def _csv_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in batches:
+        writer.writerows(
+            (statement_id, date.isoformat() if date else "", *rest) for statement_id, date, *rest in rows
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _xlsx_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Transactions")
+    sheet.append(COLUMNS)
+    for rows in batches:
+        for row in rows:
+            sheet.append(row)
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(_FILE_CHUNK_BYTES):
+            yield chunk
+
+
+class _Drain(io.RawIOBase):
+    """A write-only file that hands out what was written to it since the last take()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("statement_id", pa.int64()),
+        ("date", pa.date32()),
+        ("date_text", pa.string()),
+        ("description", pa.string()),
+        ("debit", pa.float64()),
+        ("credit", pa.float64()),
+        ("balance", pa.float64()),
+    ])
+
+
+def _record_batch(rows: list[tuple], schema):
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+    )
+
+
+def _parquet_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for rows in batches:
+            writer.write_table(pa.Table.from_batches([_record_batch(rows, schema)]))
+            yield sink.take()
+    yield sink.take()
+
+
+def _arrow_chunks(batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema()
+    sink = _Drain()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for rows in batches:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def export_filename(stem: str, export_format: str) -> str:
+    """The download file name, e.g. 'statement_12_2025-01-31.csv'."""
+    return f"{stem}_{datetime.date.today().isoformat()}.{FORMATS[export_format][1]}"
@@ -1,58 +1,345 @@
 # --- Imports ---
+import logging
 import os
+import time
 import uuid
+import asyncio
+import hashlib
+import zipfile
 from pathlib import Path
-from fastapi import UploadFile
+from typing import BinaryIO, NamedTuple
+from fastapi import Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 # Define a directory to store temporary files.
 # Using a subdirectory within the project makes it easy to manage and clean up.
 TEMP_DIR = Path("temp_uploads")
 
+# The document types the processing pipeline understands.
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+SUPPORTED_EXTENSIONS = {".pdf"} | IMAGE_EXTENSIONS
+
+# Uploads are copied in blocks of this size.
+CHUNK_SIZE = 1024 * 1024
+
+# Allowance for the multipart boundaries and part headers around each file
+# when the request's Content-Length is checked against the size limit.
+_MULTIPART_OVERHEAD = 16 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured maximum size."""
+
+
+class SavedUpload(NamedTuple):
+    """One file of a multipart upload, saved to the temp directory."""
+
+    field: str
+    filename: str
+    content_type: str | None
+    path: str
+    sha256: str
+
+
+# --- Files In Use ---
+# Saved uploads the pipeline has not finished with yet (absolute paths).
+# sweep_temp_dir() never deletes them, however long they wait for a free
+# worker: a large batch can queue for longer than TEMP_FILE_MAX_AGE_SECONDS.
+# A file is claimed when it is saved, and released when it is removed or when
+# the pool task that processed it is done (see job_queue). Plain set
+# operations are atomic, so no lock is needed (or copied into forked workers).
+_in_use: set[str] = set()
+
+
+def release_temp_file(file_path: str | list[str]):
+    """Lets sweep_temp_dir() delete the upload(s) again once they are old enough."""
+    for path in file_path if isinstance(file_path, list) else [file_path]:
+        _in_use.discard(path)
+
+
+def _too_large(max_bytes: int) -> UploadTooLargeError:
+    return UploadTooLargeError(f"The file is larger than the {max_bytes / (1024 * 1024):g} MB limit.")
+
+
 # --- Core Function ---
-def save_temp_file(file: UploadFile) -> str:
+def _copy_and_hash(source: BinaryIO, target_path: Path, max_bytes: int | None) -> str:
+    """
+    Copies 'source' to 'target_path' in CHUNK_SIZE blocks while computing its
+    SHA-256, so the file is read exactly once. Stops as soon as more than
+    'max_bytes' have been read.
+
+    Returns:
+        str: The hex SHA-256 of the content.
+    """
+    digest = hashlib.sha256()
+    written = 0
+    with open(target_path, "wb") as f:
+        while chunk := source.read(CHUNK_SIZE):
+            written += len(chunk)
+            if max_bytes is not None and written > max_bytes:
+                raise _too_large(max_bytes)
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+class _MultipartWriter:
     """
-    Saves an uploaded file to a temporary directory and returns its path.
+    Callbacks for python-multipart's streaming parser: each file part is
+    written to its own temp file (and hashed) as its bytes are parsed.
+    Other form fields are ignored.
+    """
+
+    def __init__(self, max_bytes: int | None, max_files: int):
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.saved: list[SavedUpload] = []
+        self._headers: dict[str, str] = {}
+        self._header_field = self._header_value = b""
+        self._part: dict | None = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.decode("latin-1").lower()] = self._header_value.decode("latin-1")
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get("content-disposition", ""))
+        if b"filename" not in options:
+            self._part = None
+            return
+        if len(self.saved) >= self.max_files:
+            raise ValueError(f"At most {self.max_files} file(s) can be uploaded at once.")
+        filename = options[b"filename"].decode("utf-8", "replace")
+        # A unique name, so that simultaneous uploads never collide.
+        # Example: 'my_statement.pdf' -> 'a1b2c3d4-e5f6-7890-1234-567890abcdef.pdf'
+        path = (TEMP_DIR / f"{uuid.uuid4()}{Path(filename).suffix.lower()}").resolve()
+        _in_use.add(str(path))
+        self._part = {
+            "upload": SavedUpload(
+                field=options.get(b"name", b"").decode("utf-8", "replace"), filename=filename,
+                content_type=self._headers.get("content-type"), path=str(path), sha256="",
+            ),
+            "file": open(path, "wb"),
+            "digest": hashlib.sha256(),
+            "size": 0,
+        }
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        part = self._part
+        if part is None:
+            return
+        part["size"] += end - start
+        if self.max_bytes is not None and part["size"] > self.max_bytes:
+            raise UploadTooLargeError(f"'{part['upload'].filename}': {_too_large(self.max_bytes)}")
+        chunk = data[start:end]
+        part["digest"].update(chunk)
+        part["file"].write(chunk)
+
+    def _on_part_end(self):
+        part, self._part = self._part, None
+        if part is not None:
+            part["file"].close()
+            self.saved.append(part["upload"]._replace(sha256=part["digest"].hexdigest()))
+
+    def finish(self) -> list[SavedUpload]:
+        """The saved files, once the whole body has been parsed."""
+        if self._part is not None:
+            raise ValueError("The upload ended in the middle of a file.")
+        return self.saved
+
+    def discard(self):
+        """Closes and removes every file written so far."""
+        paths = [upload.path for upload in self.saved]
+        if self._part is not None:
+            self._part["file"].close()
+            paths.append(self._part["upload"].path)
+            self._part = None
+        remove_temp_file(paths)
+        self.saved = []
 
-    This function ensures that the temporary directory exists, generates a unique
-    filename to prevent conflicts between simultaneous uploads, and saves the
-    file content.
+
+async def receive_uploads(request: Request, max_bytes: int | None = None, max_files: int = 1) -> list[SavedUpload]:
+    """
+    Streams the files of a multipart/form-data request straight into the
+    temporary directory and returns where they were saved.
+
+    The request body is read as it arrives and parsed in CHUNK_SIZE blocks in
+    a worker thread, so the event loop is never blocked by file I/O. Each file
+    is hashed on the way, so the pipeline does not have to read it again, and
+    it is written exactly once: the body is never spooled anywhere else first.
 
     Args:
-        file (UploadFile): The file object received from the FastAPI endpoint.
+        request (Request): The incoming request, with its body not yet read.
+        max_bytes (int, optional): Reject files larger than this.
+        max_files (int): Reject requests with more files than this.
 
     Returns:
-        str: The absolute path to the saved temporary file.
+        list[SavedUpload]: The saved files, in the order they were sent.
+
+    Raises:
+        UploadTooLargeError: As soon as a file grows past max_bytes (or if the
+                             declared request size already exceeds the limit).
+        ValueError: If the request is not multipart/form-data, is malformed or
+                    has too many files.
+        Nothing is left behind in the temp directory when an error is raised.
     """
-    
-    # Step 1: Ensure the temporary directory exists.
-    # The 'exist_ok=True' argument prevents an error if the directory
-    # has already been created by a previous request.
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise ValueError("Expected a multipart/form-data upload.")
+
+    # Reject a request that declares a larger body than its files may have,
+    # before reading any of it. The limit is still enforced while copying
+    # because the declared size cannot be trusted.
+    declared = request.headers.get("content-length", "")
+    if max_bytes is not None and declared.isdigit() and int(declared) > max_files * (max_bytes + _MULTIPART_OVERHEAD):
+        raise _too_large(max_bytes)
+
     TEMP_DIR.mkdir(exist_ok=True)
+    writer = _MultipartWriter(max_bytes, max_files)
+    parser = MultipartParser(options[b"boundary"], writer.callbacks())
+    try:
+        block = bytearray()
+        async for data in request.stream():
+            block += data
+            if len(block) >= CHUNK_SIZE:
+                await asyncio.to_thread(parser.write, bytes(block))
+                block.clear()
+        await asyncio.to_thread(parser.write, bytes(block))
+        parser.finalize()
+        return writer.finish()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+def remove_temp_file(file_path: str | list[str]):
+    """Removes an upload, or every page image of a multi-image upload."""
+    for path in file_path if isinstance(file_path, list) else [file_path]:
+        if os.path.exists(path):
+            os.remove(path)
+            logger.debug("Cleaned up temporary file.", extra={"path": path})
+        _in_use.discard(path)
+
+
+def is_zip_upload(upload: SavedUpload) -> bool:
+    """Returns True if the upload is a ZIP archive (by extension or content type)."""
+    return Path(upload.filename).suffix.lower() == ".zip" or upload.content_type in (
+        "application/zip", "application/x-zip-compressed"
+    )
+
+
+def save_zip_members(archive: BinaryIO, max_files: int, max_member_bytes: int | None = None) -> list[tuple[str, str, str]]:
+    """
+    Extracts the supported documents of a ZIP archive into the temp directory.
+
+    Members are streamed to disk one block at a time (and hashed on the way),
+    so the archive is never decompressed into memory as a whole. Folders, macOS
+    metadata entries and unsupported file types are skipped.
+
+    Args:
+        archive (BinaryIO): A seekable file object containing the ZIP archive.
+        max_files (int): The maximum number of documents to extract.
+        max_member_bytes (int, optional): Reject members that decompress to
+                                          more than this many bytes.
 
-    # Step 2: Generate a unique filename.
-    # We combine a unique identifier (UUID) with the original file's extension.
-    # This is a robust way to avoid filename collisions and security issues.
-    # Example: 'my_statement.pdf' -> 'a1b2c3d4-e5f6-7890-1234-567890abcdef.pdf'
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    
-    # Step 3: Define the full path for the new file.
-    temp_file_path = TEMP_DIR / unique_filename
-
-    # Step 4: Save the uploaded file's content to the new path.
-    # We open the file in binary write mode ('wb') and write the content.
-    # The 'await file.read()' asynchronously reads the content from the upload stream.
+    Returns:
+        list[tuple[str, str, str]]: (member name, absolute temp path, SHA-256) per document.
+
+    Raises:
+        ValueError: If the archive is invalid or holds more than max_files documents.
+        UploadTooLargeError: If a member is larger than max_member_bytes.
+    """
+    TEMP_DIR.mkdir(exist_ok=True)
+    saved, paths = [], []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            members = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and Path(info.filename).suffix.lower() in SUPPORTED_EXTENSIONS
+            ]
+            if len(members) > max_files:
+                raise ValueError(f"The archive contains {len(members)} documents; the limit is {max_files}.")
+
+            for info in members:
+                temp_file_path = TEMP_DIR / f"{uuid.uuid4()}{Path(info.filename).suffix.lower()}"
+                # The declared size can be forged, so the copy enforces the limit too.
+                if max_member_bytes is not None and info.file_size > max_member_bytes:
+                    raise UploadTooLargeError(f"'{info.filename}' in the archive is larger than the upload limit.")
+                path = str(temp_file_path.resolve())
+                paths.append(path)
+                _in_use.add(path)
+                with zf.open(info) as source:
+                    saved.append((info.filename, path, _copy_and_hash(source, temp_file_path, max_member_bytes)))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid ZIP archive: {e}")
+    except Exception:
+        # Do not leave half an archive behind in the temp directory.
+        remove_temp_file(paths)
+        raise
+    return saved
+
+
+def save_zip_upload(archive_path: str, max_files: int, max_member_bytes: int | None = None) -> list[tuple[str, str, str]]:
+    """
+    Extracts an uploaded ZIP archive like save_zip_members() and removes the
+    archive itself afterwards (also when extraction fails).
+    """
     try:
-        with open(temp_file_path, "wb") as f:
-            # Read the file content in chunks to handle large files efficiently
-            while content := file.file.read(1024 * 1024): # Read in 1MB chunks
-                f.write(content)
+        with open(archive_path, "rb") as archive:
+            return save_zip_members(archive, max_files=max_files, max_member_bytes=max_member_bytes)
     finally:
-        # Ensure the file pointer is reset, although it's less critical here
-        # as we are done with the file object from the request.
-        file.file.seek(0)
+        remove_temp_file(archive_path)
+
+
+def sweep_temp_dir(max_age_seconds: float) -> int:
+    """
+    Deletes files in the temp directory that are older than max_age_seconds
+    and no longer in use (see 'Files In Use').
+
+    Uploads are normally removed by the worker that processed them; this
+    catches the ones left behind by crashed workers or server restarts.
 
-    # Step 5: Return the absolute path as a string.
-    # The processing libraries will need this full path to access the file.
-    return str(temp_file_path.resolve())
\ No newline at end of file
+    Returns:
+        int: The number of files removed.
+    """
+    if not TEMP_DIR.exists():
+        return 0
+    cutoff = time.time() - max_age_seconds
+    in_use = set(_in_use)
+    removed = 0
+    for path in TEMP_DIR.iterdir():
+        try:
+            if str(path.resolve()) in in_use:
+                continue
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Removed by its worker in the meantime.
+            continue
+    return removed
@@ -0,0 +1,375 @@
+# --- Imports ---
+import logging
+import os
+import queue
+import asyncio
+import threading
+import multiprocessing
+from typing import AsyncIterator
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from ..core.config import settings
+from ..core import metrics
+from ..database import database, crud
+from .file_handler import remove_temp_file, release_temp_file
+
+logger = logging.getLogger(__name__)
+
+# --- Module State ---
+# A single process pool is shared by every request. It is created lazily on the
+# first submission and shut down by the application's lifespan handler.
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+# The number of submitted tasks that have not finished yet (running + waiting).
+# Used for backpressure: once it reaches the limit, new uploads are rejected.
+_in_flight = 0
+
+# Streaming requests receive pipeline events from the workers through queues
+# owned by a multiprocessing manager. It is started on the first stream.
+_manager = None
+
+# Marks the end of a stream of events.
+_STREAM_END = "end"
+
+# Set by the application once its startup phase (model warm-up and forking the
+# workers) has finished. Until then nothing is submitted: forking a worker
+# while the warm-up thread holds an import lock would copy the held lock into
+# the child, which then deadlocks on its first import.
+startup_finished = threading.Event()
+
+
+class QueueFullError(Exception):
+    """Raised when the worker pool and its waiting queue are both full."""
+
+
+# --- Worker-Side Functions ---
+# These run inside the worker processes, so they must be top-level functions
+# that can be pickled and they must open their own database sessions. Each one
+# collects the run's measurements in a metrics.Trace and returns it, so the API
+# process (the one /metrics is served from) can record them.
+
+def _init_worker():
+    """
+    Runs once in every new worker process.
+
+    A forked worker inherits the parent's database connection pool. Sharing those
+    connections across processes is unsafe, so we drop them (without closing the
+    parent's sockets) and let the worker open fresh ones.
+    """
+    database.engine.dispose(close=False)
+
+
+def _warm_worker(warm_models: bool) -> int:
+    """
+    Makes sure this worker has its models loaded. Workers forked after the
+    parent warmed up inherit the models, so this is then a no-op.
+
+    Returns:
+        int: The worker's process ID.
+    """
+    if warm_models:
+        from ..processing_pipeline.a_structuring import warm_up
+        warm_up()
+    return os.getpid()
+
+
+def _run_pipeline_task(
+    file_path: str | list[str], filename: str, persist: bool = True, file_hash: str | None = None,
+) -> tuple[dict, metrics.Trace]:
+    """Runs the pipeline for a request that is waiting for the result."""
+    # Imported here so that the API process does not load the OCR and LLM
+    # libraries just to manage the queue.
+    from ..processing_pipeline.pipeline import run_pipeline
+
+    db = database.SessionLocal()
+    try:
+        with metrics.collect() as trace:
+            result = run_pipeline(file_path, filename, db, persist=persist, file_hash=file_hash)
+        return result, trace
+    finally:
+        db.close()
+        remove_temp_file(file_path)
+
+
+def _run_reextraction_task(statement_id: int, pages: list[int], page_text: dict[int, str]) -> tuple[dict, metrics.Trace]:
+    """Re-extracts pages of a stored statement for a request that is waiting for the result."""
+    from ..processing_pipeline.pipeline import rerun_extraction
+
+    db = database.SessionLocal()
+    try:
+        with metrics.collect() as trace:
+            result = rerun_extraction(statement_id, db, pages=pages, page_text=page_text)
+        return result, trace
+    finally:
+        db.close()
+
+
+def _run_pipeline_stream_task(file_path: str, filename: str, events, file_hash: str | None = None) -> metrics.Trace:
+    """
+    Runs the pipeline for a streaming request, forwarding every pipeline event
+    to the 'events' queue. Always finishes with a 'result' or an 'error' event
+    followed by the end marker.
+    """
+    from ..processing_pipeline.pipeline import run_pipeline
+
+    db = database.SessionLocal()
+    with metrics.collect() as trace:
+        try:
+            result = run_pipeline(
+                file_path, filename, db, on_event=lambda name, data: events.put((name, data)), file_hash=file_hash,
+            )
+            events.put(("result", result))
+        except Exception as e:
+            logger.exception("An error occurred during processing.")
+            trace.outcome = "failed"
+            events.put(("error", {"detail": f"An internal error occurred during document processing: {e}"}))
+        finally:
+            db.close()
+            remove_temp_file(file_path)
+            events.put((_STREAM_END, {}))
+    return trace
+
+
+def _run_pipeline_job(job_id: str, file_path: str | list[str], filename: str, file_hash: str | None = None) -> metrics.Trace:
+    """Runs the pipeline for a background job and records its progress."""
+    from ..processing_pipeline.pipeline import run_pipeline
+
+    db = database.SessionLocal()
+    with metrics.collect() as trace:
+        try:
+            crud.update_job(db, job_id, status="running")
+
+            def progress(stage: str, percent: int):
+                crud.update_job(db, job_id, stage=stage, progress=percent)
+
+            result = run_pipeline(file_path, filename, db, progress=progress, file_hash=file_hash)
+            crud.update_job(
+                db, job_id,
+                status="succeeded", stage="done", progress=100,
+                result=result, statement_id=result.get("statement_id"),
+            )
+        except Exception as e:
+            logger.exception("Job failed.", extra={"job_id": job_id})
+            trace.outcome = "failed"
+            db.rollback()
+            crud.update_job(db, job_id, status="failed", error=str(e))
+        finally:
+            db.close()
+            remove_temp_file(file_path)
+    return trace
+
+
+# --- API-Side Functions ---
+
+def get_executor() -> ProcessPoolExecutor:
+    """Returns the shared worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            logger.info("Starting pipeline worker pool.", extra={"processes": settings.JOB_WORKERS})
+            # Fork explicitly (newer Pythons default to other start methods) so
+            # the workers share the models the API process preloaded.
+            context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+            _executor = ProcessPoolExecutor(max_workers=settings.JOB_WORKERS, initializer=_init_worker, mp_context=context)
+        return _executor
+
+
+def start_workers(warm_models: bool) -> list[int]:
+    """
+    Starts every pipeline worker now instead of on the first upload, and waits
+    until each one has its models loaded. Blocking; called during startup.
+
+    Returns:
+        list[int]: The process IDs of the workers that ran a warm-up task. All
+                   workers are started, but when they inherited warm models
+                   the tasks are so quick that one worker may run them all.
+    """
+    executor = get_executor()
+    # Submitting one task per worker before any finishes makes the executor
+    # start all of its processes.
+    futures = [executor.submit(_warm_worker, warm_models) for _ in range(settings.JOB_WORKERS)]
+    return sorted({future.result() for future in futures})
+
+
+def shutdown_executor():
+    """Stops the worker pool. Called when the application shuts down."""
+    global _executor, _manager
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        if _manager is not None:
+            _manager.shutdown()
+            _manager = None
+
+
+def _get_manager():
+    global _manager
+    with _executor_lock:
+        if _manager is None:
+            _manager = multiprocessing.Manager()
+        return _manager
+
+
+async def wait_for_startup():
+    """Waits, without blocking the event loop, until the workers may be used."""
+    if not startup_finished.is_set():
+        await asyncio.to_thread(startup_finished.wait)
+
+
+def queue_depth() -> int:
+    """Returns the number of submitted tasks that have not finished yet."""
+    return _in_flight
+
+
+def _submit(fn, *args, inputs: str | list[str] | None = None) -> Future:
+    """
+    Submits a task to the worker pool, enforcing the backpressure limit.
+    'inputs' are the uploads the task processes; they are released for the
+    temp file sweep once the task is done (it removes them itself).
+
+    Raises:
+        QueueFullError: If all workers are busy and the waiting queue is full.
+    """
+    global _in_flight
+    with _executor_lock:
+        if _in_flight >= settings.JOB_WORKERS + settings.JOB_MAX_PENDING:
+            raise QueueFullError("All pipeline workers are busy. Please retry shortly.")
+        _in_flight += 1
+        metrics.JOB_QUEUE_DEPTH.set(_in_flight)
+
+    def _on_done(_future: Future):
+        global _in_flight
+        with _executor_lock:
+            _in_flight -= 1
+            metrics.JOB_QUEUE_DEPTH.set(_in_flight)
+        if inputs is not None:
+            release_temp_file(inputs)
+
+    try:
+        future = get_executor().submit(fn, *args)
+    except Exception:
+        _on_done(None)
+        raise
+    future.add_done_callback(_on_done)
+    return future
+
+
+def _apply_trace(done: Future):
+    """Done callback that records the metrics of a finished job or stream task."""
+    if done.cancelled() or done.exception() is not None:
+        metrics.PIPELINE_DOCUMENTS.inc(outcome="failed")
+    else:
+        metrics.apply(done.result())
+
+
+async def run_pipeline_in_pool(file_path: str | list[str], filename: str, persist: bool = True, file_hash: str | None = None) -> dict:
+    """
+    Runs the pipeline in a worker process and waits for the result without
+    blocking the event loop. The temporary file is removed by the worker.
+
+    Raises:
+        QueueFullError: If the pool cannot accept more work.
+    """
+    await wait_for_startup()
+    future = _submit(_run_pipeline_task, file_path, filename, persist, file_hash, inputs=file_path)
+    try:
+        result, trace = await asyncio.wrap_future(future)
+    except Exception:
+        metrics.PIPELINE_DOCUMENTS.inc(outcome="failed")
+        raise
+    # Applied here, in the request's context, so the stage timings also reach
+    # its Server-Timing header.
+    metrics.apply(trace)
+    return result
+
+
+async def run_reextraction_in_pool(statement_id: int, pages: list[int], page_text: dict[int, str]) -> dict:
+    """
+    Re-extracts pages of a stored statement (see pipeline.rerun_extraction) in
+    a worker process and waits for the result without blocking the event loop.
+
+    Raises:
+        QueueFullError: If the pool cannot accept more work.
+    """
+    await wait_for_startup()
+    future = _submit(_run_reextraction_task, statement_id, pages, page_text)
+    try:
+        result, trace = await asyncio.wrap_future(future)
+    except Exception:
+        metrics.PIPELINE_DOCUMENTS.inc(outcome="failed")
+        raise
+    metrics.apply(trace)
+    return result
+
+
+def submit_job(job_id: str, file_path: str | list[str], filename: str, file_hash: str | None = None) -> Future:
+    """
+    Queues a background job. Its progress is written to the 'jobs' table and
+    the temporary file is removed by the worker once the job has finished.
+
+    Raises:
+        QueueFullError: If the pool cannot accept more work.
+    """
+    future = _submit(_run_pipeline_job, job_id, file_path, filename, file_hash, inputs=file_path)
+
+    def _on_crash(done: Future):
+        # The job function catches its own errors, so an exception here means
+        # the worker process itself died (e.g. it ran out of memory).
+        if done.cancelled() or done.exception() is not None:
+            reason = "cancelled" if done.cancelled() else f"worker crashed: {done.exception()}"
+            db = database.SessionLocal()
+            try:
+                crud.update_job(db, job_id, status="failed", error=reason)
+            finally:
+                db.close()
+            remove_temp_file(file_path)
+
+    future.add_done_callback(_apply_trace)
+    future.add_done_callback(_on_crash)
+    return future
+
+
+def _next_event(events, timeout: float):
+    """Blocking read of the next event; returns None if nothing arrived in time."""
+    try:
+        return events.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+def start_stream(file_path: str, filename: str, file_hash: str | None = None) -> AsyncIterator[tuple[str, dict]]:
+    """
+    Starts the pipeline in a worker process and returns an async iterator over
+    its events as (event_name, payload) tuples. The last event is either
+    'result' (the same data /parse returns) or 'error'.
+
+    The task is submitted immediately, so a full queue is reported here
+    rather than in the middle of a streamed response.
+
+    Raises:
+        QueueFullError: If the pool cannot accept more work.
+    """
+    events = _get_manager().Queue()
+    future = _submit(_run_pipeline_stream_task, file_path, filename, events, file_hash, inputs=file_path)
+    future.add_done_callback(_apply_trace)
+
+    async def iterate():
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, _next_event, events, 0.5)
+            if event is None:
+                # No event yet. If the worker died it will never send the end
+                # marker, so report the crash instead of waiting forever.
+                if future.done() and (future.cancelled() or future.exception() is not None):
+                    reason = "cancelled" if future.cancelled() else future.exception()
+                    yield "error", {"detail": f"The processing worker stopped: {reason}"}
+                    return
+                continue
+            name, data = event
+            if name == _STREAM_END:
+                return
+            yield name, data
+
+    return iterate()
@@ -0,0 +1,365 @@
+# --- Imports ---
+import os
+import time
+import random
+import asyncio
+import logging
+import datetime
+import threading
+import contextvars
+import email.utils
+from typing import Callable, Optional, TypeVar
+
+import httpx
+import openai
+
+from ..core.config import settings
+from ..core import metrics
+from ..database import database, crud
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- LLM Gateway ---
+# Every LLM request of the pipeline goes through complete() / complete_async().
+# Per request the gateway
+#
+#   1. waits for the rate limits shared by all workers (token buckets in the
+#      'rate_limits' table, see crud.take_tokens), kept per model: providers
+#      limit each model separately, so a fallback model is not held back by
+#      the limits (or a Retry-After) of the one that failed,
+#   2. sends it over a pooled HTTP connection with connect/read timeouts,
+#   3. retries 429s, 5xx, timeouts and connection errors with jittered
+#      exponential backoff, honouring Retry-After, and
+#   4. moves on to the next of LLM_FALLBACK_MODELS when a model keeps failing,
+#      rejects the request, or returns output that does not parse.
+#
+# Each worker process owns one event loop in a background thread, and one
+# async client on it. The client (and its connection pool) lives as long as
+# the process, so consecutive documents reuse the open HTTPS connections
+# instead of paying for a new TLS handshake every time.
+
+# Bucket names; the model is appended, e.g. 'llm.requests:openai/gpt-4o-mini'.
+REQUESTS_BUCKET = "llm.requests"
+TOKENS_BUCKET = "llm.tokens"
+
+# Errors that say nothing about the request itself, so the same request may
+# succeed later or on another model.
+_TRANSIENT_OUTCOMES = {"rate_limited", "server_error", "timeout"}
+
+
+class LLMUnavailableError(Exception):
+    """
+    Raised when every configured model failed with a transient error (rate
+    limited, timed out or down). The API answers it with HTTP 503.
+    """
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        # Both go into args, so the error survives the trip back from a worker process.
+        super().__init__(message, retry_after)
+        self.message = message
+        self.retry_after = retry_after
+
+    def __str__(self) -> str:
+        return self.message
+
+
+def estimate_tokens(text: str) -> int:
+    """A cheap token estimate (about 4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+# --- Event Loop and Client ---
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_pid: int | None = None
+_loop_lock = threading.Lock()
+_client: openai.AsyncOpenAI | None = None
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns this process's gateway event loop, starting it on first use. A
+    forked worker inherits the parent's variables but not its threads, hence
+    the check on the process ID.
+    """
+    global _loop, _loop_pid, _client
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _client = None
+            threading.Thread(target=_loop.run_forever, name="llm-gateway", daemon=True).start()
+        return _loop
+
+
+def _get_client() -> openai.AsyncOpenAI:
+    """The pooled async client. Only called on the gateway loop."""
+    global _client
+    if _client is None:
+        timeout = httpx.Timeout(
+            settings.LLM_READ_TIMEOUT,
+            connect=settings.LLM_CONNECT_TIMEOUT,
+            pool=settings.LLM_READ_TIMEOUT,
+        )
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+        )
+        _client = openai.AsyncOpenAI(
+            base_url=settings.LLM_BASE_URL,
+            api_key=settings.OPENAI_API_KEY,
+            timeout=timeout,
+            # Retries are done here, with the shared rate limits and fallbacks.
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(timeout=timeout, limits=limits),
+        )
+    return _client
+
+
+def run(coroutine) -> T:
+    """
+    Runs a coroutine on the gateway loop and waits for its result. Callable
+    from any thread except the gateway's own.
+
+    The caller's context variables (e.g. the metrics trace of the current
+    pipeline run) are copied into the coroutine, so measurements made on the
+    gateway loop end up where they would have if it ran in the caller's thread.
+    """
+    context = contextvars.copy_context()
+
+    async def in_callers_context():
+        for variable, value in context.items():
+            variable.set(value)
+        return await coroutine
+
+    return asyncio.run_coroutine_threadsafe(in_callers_context(), _get_loop()).result()
+
+
+# --- Shared Rate Limits ---
+
+def _limits() -> list[tuple[str, int]]:
+    """(bucket name, allowance per minute) of the enabled limits."""
+    limits = [(REQUESTS_BUCKET, settings.LLM_REQUESTS_PER_MINUTE), (TOKENS_BUCKET, settings.LLM_TOKENS_PER_MINUTE)]
+    return [(name, per_minute) for name, per_minute in limits if per_minute > 0]
+
+
+def _bucket(name: str, model: str) -> str:
+    return f"{name}:{model}"
+
+
+def _take(name: str, model: str, cost: float, force: bool = False) -> float:
+    per_minute = dict(_limits())[name]
+    db = database.SessionLocal()
+    try:
+        return crud.take_tokens(
+            db, _bucket(name, model), cost, capacity=per_minute, per_second=per_minute / 60, force=force,
+        )
+    finally:
+        db.close()
+
+
+def _drain(model: str, seconds: float):
+    """Tells every worker to hold off 'model' for 'seconds' after the provider rate limited it."""
+    if settings.LLM_REQUESTS_PER_MINUTE <= 0:
+        return
+    per_minute = settings.LLM_REQUESTS_PER_MINUTE
+    db = database.SessionLocal()
+    try:
+        crud.drain_bucket(
+            db, _bucket(REQUESTS_BUCKET, model), capacity=per_minute, per_second=per_minute / 60, seconds=seconds,
+        )
+    finally:
+        db.close()
+
+
+async def _acquire(model: str, prompt_tokens: int):
+    """Waits until the shared limits of 'model' allow one more request of about 'prompt_tokens'."""
+    costs = {REQUESTS_BUCKET: 1, TOKENS_BUCKET: prompt_tokens}
+    for name, _ in _limits():
+        waited = 0.0
+        while True:
+            # The buckets live in the database, so don't block the loop on them.
+            wait = await asyncio.to_thread(_take, name, model, costs[name])
+            if wait <= 0:
+                break
+            # Jitter, so workers waiting on the same bucket don't wake up together.
+            wait += random.uniform(0, min(1.0, wait))
+            waited += wait
+            await asyncio.sleep(wait)
+        if waited:
+            metrics.record(metrics.LLM_THROTTLE_SECONDS, waited, reason="rate_limit")
+
+
+# --- Retries ---
+
+def _retry_after(error: Exception) -> float | None:
+    """Seconds the provider asked us to wait ('retry-after-ms' or 'Retry-After'), if it said."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # An HTTP date.
+            when = email.utils.parsedate_to_datetime(value)
+            return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _outcome(error: Exception) -> str:
+    """Classifies a failed request for the metrics and the retry decision."""
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code == 429:
+            return "rate_limited"
+        if error.status_code >= 500 or error.status_code in (408, 409):
+            return "server_error"
+        return "client_error"
+    if isinstance(error, openai.APIConnectionError):
+        return "timeout"
+    return "invalid_output"
+
+
+def _backoff(attempt: int) -> float:
+    """'Full jitter' exponential backoff: uniform in [0, base * 2^attempt], capped."""
+    return random.uniform(0, min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+def _request_kwargs(prompt: str, model: str) -> dict:
+    return dict(
+        extra_headers={
+          "HTTP-Referer": "http://localhost",
+          "X-Title": "IntelliStatement",
+        },
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        response_format={"type": "json_object"}
+    )
+
+
+def _record_response(prompt: str, content: str, response, model: str, seconds: float):
+    """Records the duration, payload sizes and token counts of one successful request."""
+    # Not every OpenAI-compatible provider reports usage; estimate it if missing.
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or estimate_tokens(prompt)
+    completion_tokens = getattr(usage, "completion_tokens", None) or estimate_tokens(content)
+
+    metrics.record(metrics.LLM_REQUEST_SECONDS, seconds)
+    metrics.record(metrics.LLM_PROMPT_BYTES, len(prompt.encode("utf-8")))
+    metrics.record(metrics.LLM_RESPONSE_BYTES, len(content.encode("utf-8")))
+    metrics.record(metrics.LLM_TOKENS, prompt_tokens, kind="prompt")
+    metrics.record(metrics.LLM_TOKENS, completion_tokens, kind="completion")
+    logger.info(
+        "LLM request finished.",
+        extra={
+            "model": model, "seconds": round(seconds, 3),
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+        },
+    )
+    return prompt_tokens, completion_tokens
+
+
+# --- Public API ---
+
+async def complete_async(prompt: str, parse: Callable[[str], T]) -> T:
+    """
+    Sends one prompt and returns parse(response content), with the rate
+    limits, retries and fallbacks described at the top of this module. Must
+    run on the gateway loop (i.e. be awaited inside run()).
+
+    Args:
+        prompt (str): The user message.
+        parse (Callable[[str], T]): Turns the content into the result. A
+            ValueError (which includes pydantic's ValidationError) counts as
+            unusable output, and the next model is tried.
+
+    Raises:
+        LLMUnavailableError: If every model failed with a transient error.
+        openai.APIError | ValueError: The last error, if it was not transient.
+    """
+    client = _get_client()
+    prompt_tokens = estimate_tokens(prompt)
+    models = [settings.LLM_MODEL, *[m for m in settings.LLM_FALLBACK_MODELS if m != settings.LLM_MODEL]]
+    last_error: Optional[Exception] = None
+    last_outcome = None
+    retry_after = None
+
+    for model_index, model in enumerate(models):
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            await _acquire(model, prompt_tokens)
+            started = time.perf_counter()
+            try:
+                response = await client.chat.completions.create(**_request_kwargs(prompt, model))
+                content = response.choices[0].message.content or ""
+                seconds = time.perf_counter() - started
+                _, completion_tokens = _record_response(prompt, content, response, model, seconds)
+                if TOKENS_BUCKET in dict(_limits()):
+                    # The completion size is only known now; charge it afterwards.
+                    await asyncio.to_thread(_take, TOKENS_BUCKET, model, completion_tokens, True)
+                result = parse(content)
+                metrics.record(metrics.LLM_REQUESTS, 1, model=model, outcome="ok")
+                if model_index:
+                    logger.warning("LLM request served by a fallback model.", extra={"model": model})
+                return result
+            except (openai.AuthenticationError, openai.PermissionDeniedError):
+                # Same key for every model; retrying or falling back cannot help.
+                raise
+            except (openai.APIError, ValueError) as e:
+                last_error, last_outcome = e, _outcome(e)
+
+            metrics.record(metrics.LLM_REQUESTS, 1, model=model, outcome=last_outcome)
+            if last_outcome not in _TRANSIENT_OUTCOMES:
+                # The request itself is the problem (or the output is unusable):
+                # try the next model straight away.
+                logger.warning(
+                    "LLM request failed; trying the next model.",
+                    extra={"model": model, "outcome": last_outcome, "error": str(last_error)[:300]},
+                )
+                break
+
+            retry_after = _retry_after(last_error)
+            if retry_after is not None:
+                await asyncio.to_thread(_drain, model, retry_after)
+                if retry_after > settings.LLM_RETRY_MAX_DELAY:
+                    logger.warning(
+                        "LLM rate limited for longer than LLM_RETRY_MAX_DELAY; trying the next model.",
+                        extra={"model": model, "retry_after": retry_after},
+                    )
+                    break
+            if attempt == settings.LLM_MAX_RETRIES:
+                break
+            # Honour Retry-After when given (with a little jitter so the workers
+            # it was sent to don't retry in lockstep), else back off exponentially.
+            if retry_after is not None:
+                delay = retry_after + random.uniform(0, settings.LLM_RETRY_BASE_DELAY)
+            else:
+                delay = _backoff(attempt)
+            logger.warning(
+                "LLM request failed; retrying.",
+                extra={"model": model, "outcome": last_outcome, "attempt": attempt + 1, "delay": round(delay, 2)},
+            )
+            metrics.record(metrics.LLM_THROTTLE_SECONDS, delay, reason="backoff")
+            await asyncio.sleep(delay)
+
+    if last_outcome in _TRANSIENT_OUTCOMES:
+        raise LLMUnavailableError(
+            f"The LLM is unavailable ({last_outcome} on {len(models)} model(s)): {last_error}", retry_after,
+        )
+    raise last_error
+
+
+def complete(prompt: str, parse: Callable[[str], T]) -> T:
+    """Blocking version of complete_async() for synchronous callers."""
+    return run(complete_async(prompt, parse))
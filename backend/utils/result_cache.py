@@ -0,0 +1,152 @@
+# --- Imports ---
+import logging
+import json
+import hashlib
+import datetime
+from typing import Any, Callable
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..database import models as db_models
+from ..database import crud
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# The kinds of results that are cached. Each kind gets its own hit/miss counters.
+KINDS = ("structure", "extraction")
+
+# --- Key Helpers ---
+
+def file_sha256(file_path: str) -> str:
+    """Returns the hex SHA-256 of a file, reading it in 1MB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def combined_sha256(file_hashes: list[str]) -> str:
+    """
+    Returns one hash for an ordered set of files (e.g. the page images of one
+    statement). The same images in a different order give a different hash.
+    """
+    return hashlib.sha256(("pages:" + ",".join(file_hashes)).encode()).hexdigest()
+
+
+def settings_fingerprint(names: tuple[str, ...]) -> str:
+    """
+    A short hash of the current values of the named settings, for cache keys:
+    results computed with other values of them are not reused.
+    """
+    values = json.dumps({name: getattr(settings, name) for name in names}, sort_keys=True, default=str)
+    return hashlib.sha256(values.encode("utf-8")).hexdigest()[:12]
+
+
+def make_key(kind: str, content_hash: str, *versions: str) -> str:
+    """
+    Builds a cache key from the kind of result, the hash of the uploaded file and
+    the versions of everything that influences the result (pipeline, prompt, model).
+    Example: 'extraction:9f86d0...:a1b2c3d4e5f6:qwen/qwen-2.5-72b-instruct:free'
+    """
+    return ":".join((kind, content_hash, *versions))
+
+# --- Core Functions ---
+
+def get(db: Session, kind: str, key: str) -> Any | None:
+    """
+    Looks up a cached result and records a hit or a miss.
+
+    Entries older than CACHE_MAX_AGE_SECONDS are treated as a miss.
+
+    Returns:
+        The cached payload, or None if there is no usable entry.
+    """
+    entry = db.get(db_models.CacheEntry, key)
+    now = datetime.datetime.utcnow()
+    max_age = datetime.timedelta(seconds=settings.CACHE_MAX_AGE_SECONDS)
+
+    if entry is None or now - entry.created_at > max_age:
+        crud.increment_stat(db, f"cache.{kind}.miss")
+        return None
+
+    entry.last_accessed_at = now
+    entry.hit_count = (entry.hit_count or 0) + 1
+    db.commit()
+    crud.increment_stat(db, f"cache.{kind}.hit")
+    return entry.payload
+
+
+def put(db: Session, kind: str, key: str, payload: Any):
+    """Stores a result in the cache, then evicts old entries if needed."""
+    size_bytes = len(json.dumps(payload).encode("utf-8"))
+    now = datetime.datetime.utcnow()
+    db.merge(db_models.CacheEntry(
+        key=key, kind=kind, payload=payload, size_bytes=size_bytes,
+        hit_count=0, created_at=now, last_accessed_at=now,
+    ))
+    db.commit()
+    evict(db)
+
+
+def get_or_compute(db: Session, kind: str, key: str, compute: Callable[[], Any]) -> Any:
+    """
+    Returns the cached result for the key, or runs 'compute' and caches its
+    result. When the cache is disabled, 'compute' is always run.
+    """
+    if not settings.CACHE_ENABLED:
+        return compute()
+
+    cached = get(db, kind, key)
+    if cached is not None:
+        logger.info("Cache hit.", extra={"kind": kind})
+        return cached
+
+    result = compute()
+    put(db, kind, key, result)
+    return result
+
+
+def evict(db: Session) -> int:
+    """
+    Removes expired entries, then removes the least recently used entries until
+    the total cache size is below CACHE_MAX_BYTES.
+
+    Returns:
+        int: The number of entries that were removed.
+    """
+    entry = db_models.CacheEntry
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=settings.CACHE_MAX_AGE_SECONDS)
+    removed = db.query(entry).filter(entry.created_at < cutoff).delete(synchronize_session=False)
+
+    total = db.query(func.coalesce(func.sum(entry.size_bytes), 0)).scalar()
+    if total > settings.CACHE_MAX_BYTES:
+        victims = []
+        for key, size_bytes in db.query(entry.key, entry.size_bytes).order_by(entry.last_accessed_at):
+            if total <= settings.CACHE_MAX_BYTES:
+                break
+            victims.append(key)
+            total -= size_bytes
+        removed += db.query(entry).filter(entry.key.in_(victims)).delete(synchronize_session=False)
+
+    db.commit()
+    return removed
+
+
+def stats(db: Session) -> dict:
+    """Returns hit/miss counters per kind plus the current size of the cache."""
+    counters = crud.get_stats(db, prefix="cache.")
+    report = {
+        kind: {
+            "hits": counters.get(f"cache.{kind}.hit", {}).get("count", 0),
+            "misses": counters.get(f"cache.{kind}.miss", {}).get("count", 0),
+        }
+        for kind in KINDS
+    }
+    entry = db_models.CacheEntry
+    report["entries"] = db.query(func.count(entry.key)).scalar()
+    report["size_bytes"] = db.query(func.coalesce(func.sum(entry.size_bytes), 0)).scalar()
+    report["max_bytes"] = settings.CACHE_MAX_BYTES
+    return report
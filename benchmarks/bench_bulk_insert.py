@@ -0,0 +1,108 @@
+# --- Imports ---
+import os
+import time
+import random
+import argparse
+
+# The backend settings require an API key, even though this benchmark never
+# calls the LLM.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database.database import Base
+from backend.database import crud
+from backend.database import models as db_models
+from backend.core.models import StatementData, Transaction
+from backend.utils.dates import parse_statement_date
+
+# --- Helpers ---
+
+def make_statement(rows: int, seed: int = 42) -> StatementData:
+    """Builds a synthetic statement with the given number of transactions."""
+    rng = random.Random(seed)
+    balance = 10_000.0
+    transactions = []
+    for i in range(rows):
+        amount = round(rng.uniform(1, 500), 2)
+        is_debit = rng.random() < 0.7
+        balance = round(balance - amount if is_debit else balance + amount, 2)
+        transactions.append(Transaction(
+            date=f"{1 + i % 12:02d}/{1 + i % 28:02d}/2025",
+            description=f"UPI/{rng.randrange(10**11, 10**12)}/MERCHANT {i % 97}",
+            debit=amount if is_debit else 0.0,
+            credit=0.0 if is_debit else amount,
+            balance=balance,
+        ))
+    return StatementData(
+        account_holder="Benchmark Ltd", account_number="000-111-222",
+        period_start="01/01/2025", period_end="12/28/2025",
+        beginning_balance=10_000.0, ending_balance=balance,
+        transactions=transactions,
+    )
+
+
+def legacy_save(db, data: StatementData, filename: str):
+    """The previous persistence path: one ORM object and db.add per row, then refresh."""
+    db_statement = db_models.Statement(
+        filename=filename,
+        account_holder=data.account_holder,
+        account_number=data.account_number,
+        period_start=parse_statement_date(data.period_start),
+        period_end=parse_statement_date(data.period_end),
+        beginning_balance=data.beginning_balance,
+        ending_balance=data.ending_balance,
+    )
+    for trans in data.transactions:
+        db.add(db_models.Transaction(
+            date=parse_statement_date(trans.date), date_text=trans.date, description=trans.description,
+            debit=trans.debit, credit=trans.credit, balance=trans.balance,
+            statement=db_statement,
+        ))
+    db.add(db_statement)
+    db.commit()
+    db.refresh(db_statement)
+    return db_statement.id
+
+
+def time_path(name: str, save, data: StatementData, repeats: int, db_url: str) -> float:
+    """Runs one persistence path against a fresh database; returns rows/second."""
+    engine = create_engine(db_url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    best = float("inf")
+    for i in range(repeats):
+        db = Session()
+        try:
+            started = time.perf_counter()
+            save(db, data, f"bench_{name}_{i}.pdf")
+            best = min(best, time.perf_counter() - started)
+        finally:
+            db.close()
+    engine.dispose()
+    return len(data.transactions) / best
+
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy ORM insert path with the bulk insert path.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--db-url", default="sqlite://", help="Defaults to an in-memory SQLite database.")
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'legacy rows/s':>15} {'bulk rows/s':>15} {'speedup':>8}")
+    for rows in args.rows:
+        data = make_statement(rows)
+        legacy = time_path("legacy", legacy_save, data, args.repeats, args.db_url)
+        # Each repeat re-ingests the same statement, so after the first run this
+        # also measures the upsert (delete + re-insert) path.
+        bulk = time_path("bulk", crud.save_statement_data, data, args.repeats, args.db_url)
+        print(f"{rows:>8} {legacy:>15,.0f} {bulk:>15,.0f} {bulk / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
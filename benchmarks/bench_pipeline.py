@@ -0,0 +1,275 @@
+# --- Imports ---
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks import synthetic
+from benchmarks.stub_llm import make_server
+
+# --- End-to-End Pipeline Benchmark ---
+# Generates synthetic statements (see benchmarks/synthetic.py) for every
+# combination of input kind, page count and transaction density, and measures
+#
+#   - each pipeline stage called directly (structuring, extraction,
+#     persistence, validation), and
+#   - the /api/v1/parse endpoint (/parse/images for page images), which adds
+#     the upload, the worker pool and the HTTP layer,
+#
+# against a local stub of the LLM API (benchmarks/stub_llm.py). Every scenario
+# runs in a fresh subprocess with its own database, so peak RSS is per scenario
+# and no state leaks between them. The result cache is disabled, so repeats
+# really run the pipeline.
+#
+# The report is JSON; compare two of them with benchmarks.compare_reports.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("structuring", "extracting", "persisting", "validating")
+KINDS = ("digital", "scanned", "images")
+
+
+# --- Helpers ---
+
+def _summary(seconds: list[float]) -> dict:
+    """p50/p99/mean in milliseconds of a list of durations."""
+    values = np.array(seconds) * 1000
+    return {
+        "runs": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
+
+
+def _peak_rss_mb(who: int) -> float:
+    """Peak resident set size of this process or its waited-for children (Linux reports KB)."""
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+def _git(*args: str) -> str | None:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def make_inputs(kind: str, pages: int, rows_per_page: int) -> tuple[list[tuple[str, bytes]], dict]:
+    """Returns the upload(s) for a scenario as (filename, bytes) pairs, and the expected data."""
+    page_lines, expected = synthetic.make_pages(pages, rows_per_page)
+    if kind == "digital":
+        return [("statement.pdf", synthetic.digital_pdf(page_lines))], expected
+    if kind == "scanned":
+        return [("scan.pdf", synthetic.scanned_pdf(page_lines))], expected
+    images = synthetic.page_images(page_lines)
+    return [(f"page-{number:03d}.jpg", image) for number, image in enumerate(images, start=1)], expected
+
+
+# --- One Scenario (runs in a subprocess) ---
+
+def run_scenario(spec: dict) -> dict:
+    """
+    Runs one scenario in this process. The environment (database, LLM URL,
+    cache and template switches) must be set before the backend is imported,
+    which is why scenarios run in their own interpreter.
+    """
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    os.chdir(workdir)  # temp_uploads/ is relative to the working directory.
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+
+    from fastapi.testclient import TestClient
+    from backend.main import app
+    from backend.core.models import StatementData
+    from backend.core.columnar import TransactionBatch
+    from backend.database import database, crud, search
+    from backend.processing_pipeline.a_structuring import structure_document_by_page, structure_images_by_page
+    from backend.processing_pipeline.b_extraction import extract_data_with_llm
+    from backend.processing_pipeline.c_validation import validate_and_enrich_data
+
+    uploads, expected = make_inputs(spec["kind"], spec["pages"], spec["rows_per_page"])
+    paths = []
+    for filename, data in uploads:
+        path = os.path.join(workdir, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+
+    database.Base.metadata.create_all(bind=database.engine)
+    search.ensure_search_index(database.engine)
+
+    # --- Stages, called directly ---
+    timings = {stage: [] for stage in STAGES}
+    rows_extracted = 0
+    db = database.SessionLocal()
+    try:
+        for run in range(spec["warmup"] + spec["repeats"]):
+            measured = {}
+            started = time.perf_counter()
+            page_texts = structure_images_by_page(paths) if spec["kind"] == "images" else structure_document_by_page(paths[0])
+            measured["structuring"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            data = extract_data_with_llm(page_texts)
+            measured["extracting"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            statement = StatementData(**data)
+            batch = TransactionBatch.from_transactions(statement.transactions)
+            crud.save_statement_data(db=db, data=statement, filename=uploads[0][0], batch=batch)
+            measured["persisting"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            validate_and_enrich_data(data, batch=batch)
+            measured["validating"] = time.perf_counter() - started
+
+            rows_extracted = len(statement.transactions)
+            if run >= spec["warmup"]:
+                for stage, seconds in measured.items():
+                    timings[stage].append(seconds)
+    finally:
+        db.close()
+    stages_rss_mb = _peak_rss_mb(resource.RUSAGE_SELF)
+
+    # --- The endpoint, through the worker pool ---
+    route = "/api/v1/parse/images" if spec["kind"] == "images" else "/api/v1/parse"
+    field = "files" if spec["kind"] == "images" else "file"
+    content_type = "image/jpeg" if spec["kind"] == "images" else "application/pdf"
+    latencies, errors = [], 0
+    with TestClient(app) as client:
+        while client.get("/healthz/ready").status_code != 200:
+            time.sleep(0.1)
+
+        def request(_) -> tuple[float, bool]:
+            files = [(field, (filename, data, content_type)) for filename, data in uploads]
+            started = time.perf_counter()
+            response = client.post(route, files=files)
+            return time.perf_counter() - started, response.status_code == 200
+
+        with ThreadPoolExecutor(max_workers=spec["concurrency"]) as pool:
+            list(pool.map(request, range(spec["warmup"])))
+            wall_started = time.perf_counter()
+            for seconds, ok in pool.map(request, range(spec["requests"])):
+                latencies.append(seconds)
+                errors += not ok
+            wall = time.perf_counter() - wall_started
+
+    # Reap the worker processes so their peak RSS shows up in RUSAGE_CHILDREN.
+    for child in multiprocessing.active_children():
+        child.join(timeout=30)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        **spec,
+        "input_bytes": sum(len(data) for _, data in uploads),
+        "rows_expected": len(expected["transactions"]),
+        "rows_extracted": rows_extracted,
+        "stages": {stage: _summary(values) for stage, values in timings.items()},
+        "endpoint": {
+            "route": route,
+            **_summary(latencies),
+            "errors": errors,
+            "docs_per_second": round(spec["requests"] / wall, 3),
+            "pages_per_second": round(spec["requests"] * spec["pages"] / wall, 3),
+        },
+        "peak_rss_mb": {
+            "stages": stages_rss_mb,
+            "api_process": _peak_rss_mb(resource.RUSAGE_SELF),
+            "workers": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+        },
+    }
+
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parse pipeline end to end on synthetic statements.")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--rows-per-page", type=int, nargs="+", default=[20, 50], help="Transaction density.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs of the directly called stages.")
+    parser.add_argument("--requests", type=int, default=10, help="Timed requests to the endpoint.")
+    parser.add_argument("--concurrency", type=int, default=2, help="Requests in flight at once.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs before measuring.")
+    parser.add_argument("--templates", action="store_true", help="Let layout templates bypass the LLM.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM seconds per response.")
+    parser.add_argument("--llm-ms-per-token", type=float, default=0.0, help="Stub LLM generation time per output token.")
+    parser.add_argument("--llm-rate-limit-every", type=int, default=0, help="Stub answers every Nth request with 429.")
+    parser.add_argument("--output", default="bench-pipeline.json", help="Where to write the JSON report.")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)  # Internal: run one scenario, print its JSON.
+    args = parser.parse_args()
+
+    if args.scenario:
+        print(json.dumps(run_scenario(json.loads(args.scenario))))
+        return
+
+    server = make_server("127.0.0.1", 0, args.llm_latency, args.llm_ms_per_token, args.llm_rate_limit_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "benchmark"),
+        "LLM_BASE_URL": f"http://127.0.0.1:{server.server_address[1]}/v1",
+        "CACHE_ENABLED": "false",
+        "TEMPLATES_ENABLED": "true" if args.templates else "false",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+
+    results = []
+    print(f"{'scenario':>22} {'struct p50':>11} {'extract p50':>12} {'e2e p50':>9} {'e2e p99':>9} {'docs/s':>7} {'rows':>9} {'rss MB':>7}")
+    for kind in args.kinds:
+        for pages in args.pages:
+            for rows_per_page in args.rows_per_page:
+                spec = {
+                    "name": f"{kind}-{pages}p-{rows_per_page}r", "kind": kind, "pages": pages,
+                    "rows_per_page": rows_per_page, "repeats": args.repeats, "requests": args.requests,
+                    "concurrency": args.concurrency, "warmup": args.warmup,
+                }
+                completed = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_pipeline", "--scenario", json.dumps(spec)],
+                    cwd=ROOT, env=env, capture_output=True, text=True,
+                )
+                if completed.returncode != 0:
+                    print(f"{spec['name']:>22} failed:\n{completed.stderr[-2000:]}")
+                    results.append({**spec, "error": completed.stderr[-2000:]})
+                    continue
+                result = json.loads(completed.stdout.strip().splitlines()[-1])
+                results.append(result)
+                rss = max(result["peak_rss_mb"]["api_process"], result["peak_rss_mb"]["workers"])
+                print(
+                    f"{result['name']:>22} {result['stages']['structuring']['p50_ms']:>11.1f}"
+                    f" {result['stages']['extracting']['p50_ms']:>12.1f} {result['endpoint']['p50_ms']:>9.1f}"
+                    f" {result['endpoint']['p99_ms']:>9.1f} {result['endpoint']['docs_per_second']:>7.2f}"
+                    f" {result['rows_extracted']:>4}/{result['rows_expected']:<4} {rss:>7.0f}"
+                )
+    server.shutdown()
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_commit": _git("rev-parse", "HEAD"),
+            "git_dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("scenario", "output")},
+        },
+        "scenarios": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# --- Imports ---
+import os
+import time
+import random
+import difflib
+import argparse
+
+# The backend settings require an API key, even though this benchmark never
+# calls the LLM.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import cv2
+import numpy as np
+
+from backend.processing_pipeline.a_preprocessing import preprocess_image, estimate_skew
+
+# OCR is optional: without pytesseract (and the tesseract binary, which the
+# hi_res strategy of unstructured uses as well) only preprocessing is timed.
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+# --- Synthetic Phone Photo ---
+
+def make_photo(width: int, height: int, skew: float, seed: int = 7) -> tuple[bytes, str]:
+    """
+    Renders a statement page the way a phone photographs it: large, rotated,
+    with a shadow gradient and sensor noise, saved as a JPEG.
+
+    Returns:
+        tuple[bytes, str]: The JPEG bytes and the text printed on the page.
+    """
+    rng = random.Random(seed)
+    page = np.full((height, width), 255, np.uint8)
+    scale = width / 1000
+    lines = ["Date        Description                       Paid Out     Paid In     Balance"]
+    balance = 8313.30
+    for i in range(28):
+        amount = round(rng.uniform(5, 900), 2)
+        balance = round(balance - amount, 2)
+        lines.append(f"{1 + i % 28:02d}/01/2025  CARD PAYMENT MERCHANT {i:<3}            {amount:>9,.2f}                 {balance:>10,.2f}")
+    for i, line in enumerate(lines):
+        y = int((120 + i * 30) * scale)
+        cv2.putText(page, line, (int(40 * scale), y), cv2.FONT_HERSHEY_SIMPLEX, 0.45 * scale, 0, max(1, int(1.2 * scale)))
+
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+    page = cv2.warpAffine(page, matrix, (width, height), borderValue=255).astype(np.float32)
+
+    # A shadow that darkens one corner, plus noise.
+    gradient = np.linspace(0.55, 1.0, width, dtype=np.float32)[None, :] * np.linspace(0.7, 1.0, height, dtype=np.float32)[:, None]
+    page = page * gradient + np.random.default_rng(seed).normal(0, 8, page.shape)
+    photo = cv2.cvtColor(np.clip(page, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+
+    ok, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return encoded.tobytes(), "\n".join(lines)
+
+
+def legacy_preprocess(image_bytes: bytes) -> bytes:
+    """The previous preprocessing: full resolution, global Otsu threshold, JPEG output."""
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ok, encoded = cv2.imencode(".jpg", thresh)
+    return encoded.tobytes()
+
+
+def ocr(image_bytes: bytes) -> tuple[str, float]:
+    """OCRs an encoded image with tesseract; returns the text and the seconds it took."""
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    started = time.perf_counter()
+    text = pytesseract.image_to_string(image, config="--psm 6")
+    return text, time.perf_counter() - started
+
+
+def accuracy(expected: str, actual: str) -> float:
+    """Character-level similarity (1.0 = identical), ignoring whitespace runs."""
+    normalise = lambda text: " ".join(text.split())
+    return difflib.SequenceMatcher(None, normalise(expected), normalise(actual)).ratio()
+
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the legacy and the new image preprocessing.")
+    parser.add_argument("--width", type=int, default=4032, help="Default: a 12 MP phone photo.")
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--skew", type=float, default=4.0, help="Rotation of the page in degrees.")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    photo, truth = make_photo(args.width, args.height, args.skew)
+    print(f"Input: {args.width}x{args.height} JPEG, {len(photo) / 1024:.0f} KB, skew {args.skew} deg")
+    if pytesseract is None:
+        print("pytesseract is not installed: OCR time and accuracy are skipped.")
+
+    print(f"{'variant':>8} {'prep ms':>9} {'out KB':>8} {'out px':>12} {'skew left':>10} {'ocr s':>7} {'accuracy':>9}")
+    for name, prepare in (("legacy", legacy_preprocess), ("new", preprocess_image)):
+        best = float("inf")
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            output = prepare(photo)
+            best = min(best, time.perf_counter() - started)
+
+        image = cv2.imdecode(np.frombuffer(output, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        ocr_seconds, score = "-", "-"
+        if pytesseract is not None:
+            text, seconds = ocr(output)
+            ocr_seconds, score = f"{seconds:.2f}", f"{accuracy(truth, text):.3f}"
+        print(
+            f"{name:>8} {best * 1000:>9.0f} {len(output) / 1024:>8.0f} {f'{image.shape[1]}x{image.shape[0]}':>12}"
+            f" {estimate_skew(image):>10.2f} {ocr_seconds:>7} {score:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# --- Imports ---
+import os
+import sys
+import time
+import argparse
+
+# The backend settings require an API key, even though this benchmark never
+# calls the LLM.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from backend.core.columnar import TransactionBatch, to_minor_units
+from backend.processing_pipeline.c_validation import reconcile_transactions
+from benchmarks.bench_bulk_insert import make_statement
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Time building a columnar batch and reconciling its running balance.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'build ms':>10} {'check ms':>10} {'us/row':>8} {'batch KB':>10} {'dicts KB':>10}")
+    for rows in args.rows:
+        data = make_statement(rows).model_dump()
+        opening = int(to_minor_units([data["beginning_balance"]])[0])
+        best_build = best_check = float("inf")
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            batch = TransactionBatch.from_transactions(data["transactions"])
+            built = time.perf_counter()
+            reconcile_transactions(batch, opening)
+            best_build = min(best_build, built - started)
+            best_check = min(best_check, time.perf_counter() - built)
+
+        # Rough size of the row-dict representation: the dicts, their float
+        # values and their strings.
+        dict_bytes = sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+            for row in data["transactions"]
+        )
+        total = best_build + best_check
+        print(
+            f"{rows:>8} {best_build * 1000:>10.2f} {best_check * 1000:>10.2f} {total * 1e6 / rows:>8.2f}"
+            f" {batch.nbytes / 1024:>10.0f} {dict_bytes / 1024:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
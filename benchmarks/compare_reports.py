@@ -0,0 +1,92 @@
+# --- Imports ---
+import sys
+import json
+import argparse
+
+# --- Report Comparison ---
+# Compares two reports of benchmarks.bench_pipeline (e.g. from the base branch
+# and from a change) scenario by scenario. Latencies and memory are better when
+# lower, throughput when higher. With --fail-above the exit code is 1 if any
+# metric regressed by more than that fraction, so CI can gate on it.
+
+# (path inside a scenario, True if higher is better)
+METRICS = [
+    (("stages", "structuring", "p50_ms"), False),
+    (("stages", "extracting", "p50_ms"), False),
+    (("stages", "persisting", "p50_ms"), False),
+    (("stages", "validating", "p50_ms"), False),
+    (("endpoint", "p50_ms"), False),
+    (("endpoint", "p99_ms"), False),
+    (("endpoint", "docs_per_second"), True),
+    (("peak_rss_mb", "api_process"), False),
+    (("peak_rss_mb", "workers"), False),
+]
+
+
+def _lookup(scenario: dict, path: tuple):
+    value = scenario
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(baseline: dict, candidate: dict, fail_above: float | None = None) -> list[dict]:
+    """
+    Returns one row per scenario and metric present in both reports, with the
+    relative change and whether it counts as a regression.
+    """
+    before = {scenario["name"]: scenario for scenario in baseline["scenarios"] if "error" not in scenario}
+    rows = []
+    for scenario in candidate["scenarios"]:
+        old = before.get(scenario["name"])
+        if old is None or "error" in scenario:
+            continue
+        for path, higher_is_better in METRICS:
+            a, b = _lookup(old, path), _lookup(scenario, path)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a if a else 0.0
+            worse = -change if higher_is_better else change
+            rows.append({
+                "scenario": scenario["name"],
+                "metric": ".".join(path),
+                "baseline": a,
+                "candidate": b,
+                "change": change,
+                "regression": fail_above is not None and worse > fail_above,
+            })
+    return rows
+
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two bench_pipeline reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--fail-above", type=float, help="Exit with 1 if a metric got worse by more than this fraction (e.g. 0.1).")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline  {baseline['meta'].get('git_commit')}  {baseline['meta'].get('created')}")
+    print(f"candidate {candidate['meta'].get('git_commit')}  {candidate['meta'].get('created')}")
+
+    rows = compare(baseline, candidate, args.fail_above)
+    print(f"{'scenario':>22} {'metric':>28} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['scenario']:>22} {row['metric']:>28} {row['baseline']:>10.2f} {row['candidate']:>10.2f}"
+            f" {row['change']:>+8.1%}{flag}"
+        )
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
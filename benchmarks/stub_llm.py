@@ -0,0 +1,167 @@
+# --- Imports ---
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Stub LLM Server ---
+# A local stand-in for the OpenRouter chat completions API, so the pipeline
+# benchmark measures our code and not a remote model. It answers
+# POST .../chat/completions with a StatementData JSON object parsed from the
+# statement text in the prompt by regular expressions, plus a 'usage' block.
+#
+# Model behaviour that matters for throughput is simulated and configurable:
+# a fixed latency per request, a generation delay per output token, an HTTP
+# 429 (with Retry-After) for every Nth request, and models that answer 503, to
+# exercise the LLM gateway's retries and fallbacks (backend/utils/llm_gateway.py).
+
+ROW = re.compile(r"^\s*(\d{2}/\d{2}/\d{4})\s+(.+?)\s+(-?[\d,]+\.\d{2})\s+(-?[\d,]+\.\d{2})\s*$")
+BROUGHT_FORWARD = re.compile(r"Balance Brought Forward\s+(-?[\d,]+\.\d{2})", re.IGNORECASE)
+CARRIED_FORWARD = re.compile(r"Balance Carried Forward\s+(-?[\d,]+\.\d{2})", re.IGNORECASE)
+ACCOUNT_NAME = re.compile(r"Account Name:\s*(.+)")
+ACCOUNT_NUMBER = re.compile(r"Account Number:\s*(\S+)")
+PERIOD = re.compile(r"Statement Period:\s*(\S+)\s+to\s+(\S+)")
+CREDIT_WORDS = ("SALARY", "REFUND", "RECEIVED", "DEPOSIT")
+
+
+def _amount(text: str) -> float:
+    return float(text.replace(",", ""))
+
+
+def extract_statement(prompt: str) -> dict:
+    """
+    Parses the statement rows in a prompt the way a perfect model would for the
+    benchmark's synthetic layout. Whether a row is a debit or a credit follows
+    from the change in balance; without a previous balance (the first row of a
+    chunk) it is guessed from the description.
+    """
+    opening = BROUGHT_FORWARD.search(prompt)
+    previous = _amount(opening.group(1)) if opening else None
+    transactions = []
+    for line in prompt.splitlines():
+        match = ROW.match(line)
+        if not match:
+            continue
+        date, description, amount, balance = match.group(1), match.group(2), _amount(match.group(3)), _amount(match.group(4))
+        if previous is not None:
+            is_credit = round(previous + amount, 2) == balance
+        else:
+            is_credit = any(word in description.upper() for word in CREDIT_WORDS)
+        transactions.append({
+            "date": date,
+            "description": description.strip(),
+            "debit": 0.0 if is_credit else amount,
+            "credit": amount if is_credit else 0.0,
+            "balance": balance,
+        })
+        previous = balance
+
+    closing = CARRIED_FORWARD.search(prompt)
+    name, number, period = ACCOUNT_NAME.search(prompt), ACCOUNT_NUMBER.search(prompt), PERIOD.search(prompt)
+    return {
+        "account_holder": name.group(1).strip() if name else "Unknown",
+        "account_number": number.group(1) if number else "N/A",
+        "period_start": period.group(1) if period else "mm/dd/yyyy",
+        "period_end": period.group(2) if period else "mm/dd/yyyy",
+        "beginning_balance": _amount(opening.group(1)) if opening else 0.0,
+        "ending_balance": _amount(closing.group(1)) if closing else (transactions[-1]["balance"] if transactions else 0.0),
+        "transactions": transactions,
+        "warnings": None,
+    }
+
+
+def make_server(host: str, port: int, latency: float = 0.05, ms_per_token: float = 0.0,
+                rate_limit_every: int = 0, retry_after_ms: int = 200,
+                unavailable_models: tuple = ()) -> ThreadingHTTPServer:
+    """
+    Creates (but does not start) the stub server. Port 0 picks a free port;
+    the chosen one is in server.server_address.
+
+    Args:
+        latency (float): Seconds added to every response (network + queueing).
+        ms_per_token (float): Generation time per output token.
+        rate_limit_every (int): Answer every Nth request with HTTP 429 (0 = never).
+        retry_after_ms (int): Delay suggested to rate-limited clients.
+        unavailable_models (tuple): Models that always answer HTTP 503.
+    """
+    counter = {"requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # One line per request would drown the benchmark output.
+
+        def _send(self, status: int, body: dict, headers: dict | None = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                return
+            if body.get("model") in unavailable_models:
+                self._send(503, {"error": {"message": f"{body['model']} is unavailable (stub).", "type": "unavailable"}})
+                return
+            with lock:
+                counter["requests"] += 1
+                number = counter["requests"]
+            if rate_limit_every and number % rate_limit_every == 0:
+                self._send(
+                    429, {"error": {"message": "Rate limit exceeded (stub).", "type": "rate_limit"}},
+                    {"Retry-After": str(max(1, retry_after_ms // 1000)), "retry-after-ms": str(retry_after_ms)},
+                )
+                return
+
+            prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+            content = json.dumps(extract_statement(prompt))
+            prompt_tokens, completion_tokens = max(1, len(prompt) // 4), max(1, len(content) // 4)
+            time.sleep(latency + completion_tokens * ms_per_token / 1000)
+            self._send(200, {
+                "id": f"stub-{number}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            })
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+# --- Entry Point ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stub of the OpenAI-compatible chat completions API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response.")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="Simulated generation time per output token.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with HTTP 429.")
+    parser.add_argument("--retry-after-ms", type=int, default=200, help="Retry-After sent with the 429s.")
+    parser.add_argument("--unavailable-models", nargs="*", default=[], help="Models that always answer HTTP 503.")
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.latency, args.ms_per_token, args.rate_limit_every,
+        args.retry_after_ms, tuple(args.unavailable_models),
+    )
+    host, port = server.server_address[:2]
+    print(f"Stub LLM listening on http://{host}:{port}/v1 (set LLM_BASE_URL to this).", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# --- Imports ---
+import zlib
+import random
+import datetime
+
+import cv2
+import numpy as np
+
+# --- Synthetic Bank Statements ---
+# Deterministic statements for the pipeline benchmark, in the three forms users
+# upload: a born-digital PDF (with a text layer), a scanned PDF (one JPEG per
+# page, no text layer) and photos/scans as separate page images. The same seed
+# always produces the same bytes, so runs on different commits see identical
+# inputs.
+
+# A4 in PDF points.
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE, LEADING = 8, 11
+
+ACCOUNT_HOLDER = "Benchmark Manufacturing Ltd"
+ACCOUNT_NUMBER = "111-234-567-890"
+OPENING_BALANCE = 25_000.00
+
+MERCHANTS = (
+    "CARD PAYMENT TESCO STORES", "FAST PAYMENT AMAZON UK", "DIRECT DEBIT BRITISH GAS",
+    "UPI/PAYTM/ZOMATO ORDER", "BACS SALARY ACME LTD", "STANDING ORDER RENT",
+    "CASH WITHDRAWAL ATM 0423", "REFUND EBAY MARKETPLACE", "CARD PAYMENT SHELL 2231",
+)
+
+
+def make_pages(pages: int, rows_per_page: int, seed: int = 7) -> tuple[list[list[str]], dict]:
+    """
+    Builds the text lines of every page and the statement they describe.
+
+    Returns:
+        tuple[list[list[str]], dict]: The lines per page, and the expected
+            StatementData as a dict (what a perfect extraction returns).
+    """
+    rng = random.Random(seed)
+    balance = OPENING_BALANCE
+    transactions = []
+    for i in range(pages * rows_per_page):
+        # Spread the rows over the year, in date order.
+        date = datetime.date(2025, 1, 1) + datetime.timedelta(days=i * 364 // (pages * rows_per_page))
+        merchant = MERCHANTS[rng.randrange(len(MERCHANTS))]
+        amount = round(rng.uniform(2, 1500), 2)
+        is_credit = merchant.startswith(("BACS", "REFUND")) or rng.random() < 0.3
+        balance = round(balance + amount if is_credit else balance - amount, 2)
+        transactions.append({
+            "date": date.strftime("%m/%d/%Y"),
+            "description": f"{merchant} {rng.randrange(10**5, 10**6)}",
+            "debit": 0.0 if is_credit else amount,
+            "credit": amount if is_credit else 0.0,
+            "balance": balance,
+        })
+
+    header = [
+        "Benchmark Bank plc - Current Account Statement",
+        f"Account Name: {ACCOUNT_HOLDER}",
+        f"Account Number: {ACCOUNT_NUMBER}",
+        "Statement Period: 01/01/2025 to 12/31/2025",
+        "",
+        f"{'Date':<12}{'Description':<40}{'Paid Out':>12}{'Paid In':>12}{'Balance':>14}",
+    ]
+    page_lines = []
+    for page in range(pages):
+        lines = list(header)
+        if page == 0:
+            lines.append(f"{'':<12}{'Balance Brought Forward':<40}{'':>12}{'':>12}{OPENING_BALANCE:>14,.2f}")
+        for row in transactions[page * rows_per_page:(page + 1) * rows_per_page]:
+            debit = f"{row['debit']:,.2f}" if row["debit"] else ""
+            credit = f"{row['credit']:,.2f}" if row["credit"] else ""
+            lines.append(f"{row['date']:<12}{row['description']:<40}{debit:>12}{credit:>12}{row['balance']:>14,.2f}")
+        if page == pages - 1:
+            lines.append(f"{'':<12}{'Balance Carried Forward':<40}{'':>12}{'':>12}{balance:>14,.2f}")
+        lines.append(f"Page {page + 1} of {pages}")
+        page_lines.append(lines)
+
+    expected = {
+        "account_holder": ACCOUNT_HOLDER,
+        "account_number": ACCOUNT_NUMBER,
+        "period_start": "01/01/2025",
+        "period_end": "12/31/2025",
+        "beginning_balance": OPENING_BALANCE,
+        "ending_balance": balance,
+        "transactions": transactions,
+    }
+    return page_lines, expected
+
+
+# --- PDF Writing ---
+# A minimal PDF writer (catalog, page tree, one content stream per page) is all
+# the benchmark needs, so no PDF library is required to generate inputs.
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _build_pdf(page_objects: list[tuple[bytes, dict[str, bytes]]]) -> bytes:
+    """
+    Assembles a PDF from (content stream, {resource name: object body}) pairs,
+    one per page. Resource bodies are written as separate objects.
+    """
+    objects: list[bytes] = [b"", b""]  # 1: catalog, 2: page tree (filled in below)
+    font_id = None
+    page_ids = []
+    for content, resources in page_objects:
+        resource_refs = []
+        for name, body in resources.items():
+            if name == "F1":
+                if font_id is None:
+                    objects.append(body)
+                    font_id = len(objects)
+                resource_refs.append(f"/Font << /F1 {font_id} 0 R >>".encode())
+            else:
+                objects.append(body)
+                resource_refs.append(f"/XObject << /{name} {len(objects)} 0 R >>".encode())
+        compressed = zlib.compress(content)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(compressed) + compressed + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, b" ".join(resource_refs), content_id)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+def digital_pdf(page_lines: list[list[str]]) -> bytes:
+    """A born-digital PDF: every page has a real text layer in a monospaced font."""
+    font = b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"
+    pages = []
+    for lines in page_lines:
+        stream = [f"BT /F1 {FONT_SIZE} Tf {LEADING} TL 36 {PAGE_HEIGHT - 48} Td"]
+        stream += [f"({_pdf_escape(line)}) Tj T*" for line in lines]
+        stream.append("ET")
+        pages.append(("\n".join(stream).encode("latin-1"), {"F1": font}))
+    return _build_pdf(pages)
+
+
+def render_page(lines: list[str], dpi: int = 150, skew: float = 0.0, seed: int = 7) -> np.ndarray:
+    """Renders one page as a grayscale scan: black text, slight noise, optional skew."""
+    scale = dpi / 72
+    width, height = int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)
+    page = np.full((height, width), 255, np.uint8)
+    # Hershey fonts are about 22 px tall at scale 1.0; match the PDF's font size.
+    font_scale = FONT_SIZE * scale / 22
+    # The Hershey fonts are proportional, so characters are placed one by one on
+    # the Courier grid (0.6 em per character) to keep the columns aligned.
+    advance = 0.6 * FONT_SIZE * scale
+    for i, line in enumerate(lines):
+        y = int((48 + i * LEADING) * scale)
+        for column, char in enumerate(line):
+            if char != " ":
+                x = int(36 * scale + column * advance)
+                cv2.putText(page, char, (x, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, 0, 1, cv2.LINE_AA)
+    if skew:
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+        page = cv2.warpAffine(page, matrix, (width, height), borderValue=255)
+    noise = np.random.default_rng(seed).normal(0, 6, page.shape)
+    return np.clip(page + noise, 0, 255).astype(np.uint8)
+
+
+def page_images(page_lines: list[list[str]], dpi: int = 150, skew: float = 0.0) -> list[bytes]:
+    """Each page as a JPEG, the way a phone or a sheet-fed scanner delivers it."""
+    images = []
+    for number, lines in enumerate(page_lines):
+        ok, encoded = cv2.imencode(".jpg", render_page(lines, dpi, skew, seed=number), [cv2.IMWRITE_JPEG_QUALITY, 85])
+        images.append(encoded.tobytes())
+    return images
+
+
+def scanned_pdf(page_lines: list[list[str]], dpi: int = 150) -> bytes:
+    """A scanned PDF: one JPEG per page and no text layer, so every page needs OCR."""
+    pages = []
+    for jpeg in page_images(page_lines, dpi):
+        height, width = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_GRAYSCALE).shape
+        image = (
+            b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray"
+            b" /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n" % (width, height, len(jpeg))
+            + jpeg + b"\nendstream"
+        )
+        content = b"q %d 0 0 %d 0 0 cm /Im1 Do Q" % (PAGE_WIDTH, PAGE_HEIGHT)
+        pages.append((content, {"Im1": image}))
+    return _build_pdf(pages)
@@ -3,11 +3,92 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 import requests
-from io import BytesIO
+import json
+from urllib.parse import urlencode
 
 # --- Configuration ---
 # This is the URL where your FastAPI backend will be running.
 BACKEND_API_URL = "http://127.0.0.1:8000/api/v1/parse"
+# The streaming variant sends progress events while the document is processed.
+BACKEND_STREAM_URL = "http://127.0.0.1:8000/api/v1/parse/stream"
+# Ranked full-text search over every statement stored by the backend.
+BACKEND_SEARCH_URL = "http://127.0.0.1:8000/api/v1/search/transactions"
+# Stored statements: their aggregates and their transactions, page by page.
+BACKEND_STATEMENTS_URL = "http://127.0.0.1:8000/api/v1/statements"
+# Matching transactions of every stored statement, as a file download.
+BACKEND_EXPORT_URL = "http://127.0.0.1:8000/api/v1/transactions/export"
+
+# Export formats offered in the Export tab: (button label, backend format).
+EXPORT_FORMATS = [
+    ("📥 Export as CSV", "csv"),
+    ("📗 Export as Excel", "xlsx"),
+    ("🗃️ Export as Parquet", "parquet"),
+]
+
+# Rows per page in the Transactions tab.
+PAGE_SIZES = [50, 100, 250]
+# Backend answers are reused across reruns for this long (seconds).
+FETCH_CACHE_SECONDS = 60
+
+# Human-readable labels for the pipeline stages reported by the backend.
+STAGE_LABELS = {
+    "structuring": "Reading the document pages...",
+    "extracting": "Extracting transactions...",
+    "persisting": "Saving to the database...",
+    "validating": "Verifying balances...",
+}
+
+# --- Helpers ---
+def iter_sse_events(response):
+    """Parses a Server-Sent Events response into (event_name, data) tuples."""
+    event_name, data_lines = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            # A blank line ends the current event.
+            if data_lines:
+                yield event_name, json.loads("\n".join(data_lines))
+            event_name, data_lines = "message", []
+        elif line.startswith("event:"):
+            event_name = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
+def filter_params(search_query, transaction_type):
+    """The backend's transaction filter query parameters for the Transactions tab's widgets."""
+    params = {}
+    if search_query:
+        params['q'] = search_query
+    if transaction_type == "Debits":
+        params['kind'] = 'debit'
+    elif transaction_type == "Credits":
+        params['kind'] = 'credit'
+    return params
+
+def export_url(base_url, export_format, search_query, transaction_type):
+    """A backend export link; the file is only generated when the link is followed."""
+    return f"{base_url}?{urlencode({'format': export_format, **filter_params(search_query, transaction_type)})}"
+
+# Streamlit reruns the whole script on every interaction, so backend answers
+# are cached here; the aggregates are also cached by the backend itself.
+@st.cache_data(ttl=FETCH_CACHE_SECONDS, show_spinner=False)
+def fetch_aggregates(statement_id, period, search_query="", transaction_type="All"):
+    """Totals per period, category and counterparty, computed by the backend."""
+    params = {"period": period, "top": 10, **filter_params(search_query, transaction_type)}
+    response = requests.get(f"{BACKEND_STATEMENTS_URL}/{statement_id}/aggregates", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(ttl=FETCH_CACHE_SECONDS, show_spinner=False)
+def fetch_transactions_page(statement_id, limit, cursor=None, search_query="", transaction_type="All"):
+    """One page of the statement's transactions, filtered by the backend."""
+    params = {"limit": limit, **filter_params(search_query, transaction_type)}
+    if cursor is not None:
+        params['cursor'] = cursor
+    response = requests.get(f"{BACKEND_STATEMENTS_URL}/{statement_id}/transactions", params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -22,8 +103,6 @@ if 'current_step' not in st.session_state:
     st.session_state.current_step = 'upload'
 if 'extracted_data' not in st.session_state:
     st.session_state.extracted_data = None
-if 'df' not in st.session_state:
-    st.session_state.df = pd.DataFrame()
 
 # --- Main App Layout ---
 st.title("📄 IntelliStatement: The Intelligent Bank Statement Analyzer")
@@ -46,8 +125,10 @@ if st.session_state.current_step == 'upload':
         # When a file is uploaded, show the "Analyze" button.
         if st.button(f"Analyze '{uploaded_file.name}'", type="primary", use_container_width=True):
             st.session_state.current_step = 'processing'
-            # Store file in memory to pass to the processing step.
-            st.session_state.uploaded_file_bytes = uploaded_file.getvalue()
+            # Keep the uploaded file object itself for the processing step.
+            # It is already held in memory by Streamlit, so this avoids making
+            # a second copy with getvalue().
+            st.session_state.uploaded_file = uploaded_file
             st.session_state.uploaded_file_name = uploaded_file.name
             st.rerun()
 
@@ -56,33 +137,56 @@ if st.session_state.current_step == 'upload':
 # =================================================================================================
 elif st.session_state.current_step == 'processing':
     st.header("Analyzing Document...")
-    with st.spinner("Please wait... The AI is processing your document. This may take a moment."):
-        try:
-            # Prepare the file for the API request.
-            files = {'file': (st.session_state.uploaded_file_name, st.session_state.uploaded_file_bytes)}
-            
-            # Make the POST request to the FastAPI backend.
-            response = requests.post(BACKEND_API_URL, files=files, timeout=120) # 2-minute timeout
-            
-            # Check if the request was successful.
-            if response.status_code == 200:
-                extracted_data = response.json()
-                st.session_state.extracted_data = extracted_data
-                
-                # Create and store the DataFrame in session state for easy use.
-                st.session_state.df = pd.DataFrame(extracted_data.get('transactions', []))
-                
-                st.session_state.current_step = 'display'
-                st.rerun()
-            else:
-                # Handle backend errors.
+    status_text = st.empty()
+    progress_bar = st.progress(0)
+    rows_placeholder = st.empty()
+    partial_rows = []
+
+    try:
+        # Prepare the file for the API request. requests reads the file object
+        # directly, so no extra copy of the bytes is made here.
+        uploaded_file = st.session_state.uploaded_file
+        uploaded_file.seek(0)
+        files = {'file': (st.session_state.uploaded_file_name, uploaded_file, uploaded_file.type)}
+
+        # Stream the response: the connection may stay open for as long as the
+        # document takes, so only the wait between two events is limited.
+        with requests.post(BACKEND_STREAM_URL, files=files, stream=True, timeout=(10, 300)) as response:
+            if response.status_code != 200:
+                # Handle backend errors (e.g. 503 when all workers are busy).
                 st.error(f"Error from backend: {response.status_code} - {response.text}")
                 st.session_state.current_step = 'upload'
+            else:
+                for event, payload in iter_sse_events(response):
+                    if event == "upload_saved":
+                        status_text.info("Upload received. Waiting for a free worker...")
+                    elif event == "stage":
+                        status_text.info(STAGE_LABELS.get(payload['stage'], payload['stage']))
+                        progress_bar.progress(payload['progress'])
+                    elif event == "page_structured":
+                        status_text.info(f"Read page {payload['page']} ({payload['strategy']}).")
+                    elif event == "chunk_extracted":
+                        # Show rows as soon as each part of the document is extracted.
+                        partial_rows.extend(payload['transactions'])
+                        status_text.info(f"Extracted part {payload['chunk']} of {payload['of']}.")
+                        rows_placeholder.dataframe(pd.DataFrame(partial_rows), use_container_width=True, hide_index=True)
+                    elif event == "result":
+                        st.session_state.extracted_data = payload
+                        st.session_state.current_step = 'display'
+                    elif event == "error":
+                        st.error(f"Error from backend: {payload['detail']}")
+                        st.session_state.current_step = 'upload'
+
+                if st.session_state.current_step == 'display':
+                    st.rerun()
+                elif st.session_state.current_step == 'processing':
+                    st.error("The backend closed the connection before the document was processed.")
+                    st.session_state.current_step = 'upload'
 
-        except requests.exceptions.RequestException as e:
-            # Handle network or connection errors.
-            st.error(f"Could not connect to the backend service. Please ensure it is running. Error: {e}")
-            st.session_state.current_step = 'upload'
+    except requests.exceptions.RequestException as e:
+        # Handle network or connection errors.
+        st.error(f"Could not connect to the backend service. Please ensure it is running. Error: {e}")
+        st.session_state.current_step = 'upload'
 
 # =================================================================================================
 # STEP 3: DATA DISPLAY AND INTERACTION VIEW
@@ -92,7 +196,9 @@ elif st.session_state.current_step == 'display':
     # Retrieve data from session state.
     data = st.session_state.extracted_data
     summary = data.get('summary', {})
-    df = st.session_state.df
+    # The statement as stored by the backend, which serves its aggregates and rows.
+    statement_id = data.get('statement_id')
+    total_rows = len(data.get('transactions', []))
 
     st.header("Step 2: Review and Interact with Your Data")
 
@@ -143,50 +249,136 @@ elif st.session_state.current_step == 'display':
         )
         st.altair_chart(chart, use_container_width=True)
 
+        # --- Aggregates computed by the backend ---
+        # Only the sums per period, category and counterparty are fetched, not
+        # the transactions, so large statements stay responsive.
+        if statement_id is None:
+            st.info("This statement was not stored, so no breakdown is available.")
+        else:
+            period = st.radio("Group by", ["month", "week", "day"], horizontal=True, format_func=str.title)
+            try:
+                aggregates = fetch_aggregates(statement_id, period)
+            except requests.exceptions.RequestException as e:
+                aggregates = None
+                st.warning(f"Could not load the breakdown: {e}")
+
+            if aggregates:
+                st.subheader(f"Credits and Debits per {period.title()}")
+                periods_df = pd.DataFrame(aggregates['periods'])
+                if not periods_df.empty:
+                    periods_df = periods_df.dropna(subset=['period'])
+                    period_chart = alt.Chart(periods_df).transform_fold(
+                        ['credit', 'debit'], as_=['Type', 'Amount']
+                    ).mark_bar().encode(
+                        x=alt.X('period:T', title=None),
+                        xOffset='Type:N',
+                        y=alt.Y('Amount:Q', title='Amount ($)', axis=alt.Axis(format='$,.0f')),
+                        color=alt.Color('Type:N', scale=alt.Scale(domain=['credit', 'debit'], range=['#4CAF50', '#F44336'])),
+                    )
+                    st.altair_chart(period_chart, use_container_width=True)
+
+                category_col, counterparty_col = st.columns(2)
+                with category_col:
+                    st.subheader("Spending by Category")
+                    categories_df = pd.DataFrame(aggregates['categories'])
+                    if not categories_df.empty:
+                        category_chart = alt.Chart(categories_df[categories_df['debit'] > 0]).mark_bar().encode(
+                            x=alt.X('debit:Q', title='Debits ($)', axis=alt.Axis(format='$,.0f')),
+                            y=alt.Y('name:N', title=None, sort='-x'),
+                        )
+                        st.altair_chart(category_chart, use_container_width=True)
+                with counterparty_col:
+                    st.subheader("Top Counterparties")
+                    counterparties_df = pd.DataFrame(aggregates['counterparties'])
+                    if not counterparties_df.empty:
+                        st.dataframe(
+                            counterparties_df[['name', 'count', 'debit', 'credit']],
+                            use_container_width=True, hide_index=True,
+                        )
+
     with tab2:
         # --- Interactive Transactions Tab ---
         st.subheader("Explore Transactions")
         
-        filter_col1, filter_col2 = st.columns([3, 1])
+        filter_col1, filter_col2, filter_col3 = st.columns([3, 1, 1])
         with filter_col1:
             search_query = st.text_input("Search Description", placeholder="e.g., Amazon, Morrisons Petrol...")
         with filter_col2:
             transaction_type = st.selectbox("Filter by Type", ["All", "Debits", "Credits"])
+        with filter_col3:
+            page_size = st.selectbox("Rows per page", PAGE_SIZES)
+        search_everywhere = st.checkbox("Also search all previously uploaded statements")
 
-        # Apply filters to the dataframe.
-        filtered_df = df.copy()
-        if search_query:
-            filtered_df = filtered_df[filtered_df['description'].str.contains(search_query, case=False, na=False)]
-        if transaction_type == "Debits":
-            filtered_df = filtered_df[filtered_df['debit'] > 0]
-        elif transaction_type == "Credits":
-            filtered_df = filtered_df[filtered_df['credit'] > 0]
-        
-        st.dataframe(filtered_df, use_container_width=True, hide_index=True)
-        st.write(f"Showing {len(filtered_df)} of {len(df)} total transactions.")
+        if statement_id is None:
+            st.info("This statement was not stored, so its transactions cannot be browsed.")
+        else:
+            # The backend filters and pages the rows. The cursors of the pages
+            # seen so far are kept to go back; changing a filter starts over.
+            view = (statement_id, search_query, transaction_type, page_size)
+            if st.session_state.get('transactions_view') != view:
+                st.session_state.transactions_view = view
+                st.session_state.page_cursors = [None]
+            cursors = st.session_state.page_cursors
+
+            try:
+                page = fetch_transactions_page(statement_id, page_size, cursors[-1], search_query, transaction_type)
+                matching = fetch_aggregates(statement_id, "month", search_query, transaction_type)['totals']['count']
+            except requests.exceptions.RequestException as e:
+                page, matching = None, 0
+                st.warning(f"Could not load the transactions: {e}")
+
+            if page is not None:
+                rows_df = pd.DataFrame(page['items'])
+                if not rows_df.empty:
+                    rows_df = rows_df[['date_text', 'description', 'debit', 'credit', 'balance']].rename(columns={'date_text': 'date'})
+                st.dataframe(rows_df, use_container_width=True, hide_index=True)
+
+                first_row = (len(cursors) - 1) * page_size
+                st.write(
+                    f"Showing {first_row + 1 if len(rows_df) else 0}-{first_row + len(rows_df)} of {matching} "
+                    f"matching transactions ({total_rows} in total)."
+                )
+                previous_col, next_col = st.columns(2)
+                with previous_col:
+                    if st.button("← Previous page", disabled=len(cursors) == 1, use_container_width=True):
+                        cursors.pop()
+                        st.rerun()
+                with next_col:
+                    if st.button("Next page →", disabled=page['next_cursor'] is None, use_container_width=True):
+                        cursors.append(page['next_cursor'])
+                        st.rerun()
+
+        if search_everywhere and search_query:
+            # The backend searches its full-text index, so this stays fast no
+            # matter how many statements have been stored.
+            try:
+                response = requests.get(BACKEND_SEARCH_URL, params={"q": search_query, "limit": 100}, timeout=10)
+                response.raise_for_status()
+                matches = response.json()["items"]
+                st.markdown(f"**Best matches across all statements** ({len(matches)} shown)")
+                if matches:
+                    matches_df = pd.DataFrame(matches)[['statement_id', 'date', 'description', 'debit', 'credit', 'balance']]
+                    st.dataframe(matches_df, use_container_width=True, hide_index=True)
+            except requests.exceptions.RequestException as e:
+                st.warning(f"Could not search the stored statements: {e}")
 
     with tab3:
         # --- Data Export Tab ---
         st.subheader("Export Your Data")
-        st.write("The exported file will contain the transactions currently displayed in the 'Transactions' tab (including any filters you've applied).")
-        
-        export_df = filtered_df.copy()
-
-        export_col1, export_col2 = st.columns(2)
-        with export_col1:
-            csv_buffer = export_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Export as CSV", data=csv_buffer, file_name='statement_export.csv',
-                mime='text/csv', use_container_width=True
-            )
-        with export_col2:
-            excel_buffer = BytesIO()
-            with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                export_df.to_excel(writer, index=False, sheet_name='Transactions')
-            st.download_button(
-                label="📗 Export as Excel", data=excel_buffer.getvalue(), file_name='statement_export.xlsx',
-                mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', use_container_width=True
-            )
+        st.write("The exported file will contain the transactions matching the filters of the 'Transactions' tab.")
+        # The backend streams the file straight from its database when a button
+        # is clicked, so nothing is built here on each rerun.
+        all_statements = st.checkbox("Include the matching transactions of every stored statement")
+        if statement_id is None and not all_statements:
+            st.info("This statement was not stored by the backend, so it cannot be exported on its own.")
+        else:
+            base_url = BACKEND_EXPORT_URL if all_statements else f"{BACKEND_STATEMENTS_URL}/{statement_id}/export"
+            for column, (label, export_format) in zip(st.columns(len(EXPORT_FORMATS)), EXPORT_FORMATS):
+                with column:
+                    st.link_button(
+                        label, export_url(base_url, export_format, search_query, transaction_type),
+                        use_container_width=True,
+                    )
 
     st.markdown("---")
     
@@ -0,0 +1,8 @@
+# --- Imports ---
+import os
+import tempfile
+
+# Settings require an API key; the tests only talk to a fake LLM provider.
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+# Tests that need the database get a throwaway one, never ./intellistatement.db.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
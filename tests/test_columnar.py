@@ -0,0 +1,50 @@
+# --- Imports ---
+import datetime
+from backend.core.columnar import EPOCH, NO_DATE, TransactionBatch, to_minor_units
+
+
+def test_amounts_become_exact_minor_units():
+    minor = to_minor_units([8313.3, "12.50", None, "n/a", -0.1, -1234.56])
+
+    assert minor.dtype == "int64"
+    assert minor.tolist() == [831330, 1250, 0, 0, -10, -123456]
+
+
+def test_half_minor_units_round_away_from_zero():
+    assert to_minor_units([1.005, 2.675, 0.125, 0.005, -0.125, -1.005]).tolist() == [101, 268, 13, 1, -13, -101]
+
+
+def test_to_major_round_trip():
+    amounts = [0.1, 0.2, 8313.3, -25.0, 1234567890.01]
+    batch = TransactionBatch.from_transactions(
+        {"date": "01/03/2025", "description": "x", "debit": amount, "credit": None, "balance": amount}
+        for amount in amounts
+    )
+
+    assert batch.to_major(batch.debits) == amounts
+    assert batch.to_major(batch.credits) == [0.0] * len(amounts)
+
+
+def test_dates_and_descriptions_are_interned():
+    batch = TransactionBatch.from_transactions([
+        {"date": "01/03/2025", "description": "Tesco", "debit": 1.0},
+        {"date": "01/03/2025", "description": "Shell", "debit": 2.0},
+        {"date": "mm/dd/yyyy", "description": "Tesco", "debit": 3.0},
+        {"date": "01/04/2025", "description": None, "debit": 4.0},
+    ])
+
+    assert batch.descriptions == ["Tesco", "Shell", ""]
+    assert batch.description_ids.tolist() == [0, 1, 0, 2]
+    assert batch.date_texts == ["01/03/2025", "mm/dd/yyyy", "01/04/2025"]
+    assert batch.date_text_ids.tolist() == [0, 0, 1, 2]
+    day = (datetime.date(2025, 1, 3) - EPOCH).days
+    assert batch.dates.tolist() == [day, day, NO_DATE, day + 1]
+
+    records = batch.to_records(statement_id=7)
+    assert [(r["date"], r["date_text"], r["description"]) for r in records] == [
+        (datetime.date(2025, 1, 3), "01/03/2025", "Tesco"),
+        (datetime.date(2025, 1, 3), "01/03/2025", "Shell"),
+        (None, "mm/dd/yyyy", "Tesco"),
+        (datetime.date(2025, 1, 4), "01/04/2025", ""),
+    ]
+    assert all(r["statement_id"] == 7 for r in records)
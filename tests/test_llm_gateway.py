@@ -0,0 +1,126 @@
+# --- Imports ---
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+from backend.core.config import settings
+from backend.database import database, models
+from backend.utils import llm_gateway
+from backend.utils.llm_gateway import LLMUnavailableError, complete
+
+
+class FakeProvider:
+    """
+    An OpenAI-compatible endpoint on localhost that answers each model's
+    requests with the scripted (status, headers) replies in order, then 200s.
+    """
+
+    def __init__(self):
+        self.script: dict[str, list[tuple[int, dict]]] = {}
+        self.requests: list[tuple[str, float]] = []
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                model = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["model"]
+                provider.requests.append((model, time.monotonic()))
+                replies = provider.script.get(model) or []
+                status, headers = replies.pop(0) if replies else (200, {})
+                body = {"error": {"message": f"HTTP {status}"}} if status != 200 else {
+                    "id": "fake", "object": "chat.completion", "created": 0, "model": model,
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": json.dumps({"model": model})}}],
+                }
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    @property
+    def models(self) -> list[str]:
+        return [model for model, _ in self.requests]
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = FakeProvider()
+    monkeypatch.setattr(settings, "LLM_BASE_URL", f"http://127.0.0.1:{provider.server.server_address[1]}/v1")
+    monkeypatch.setattr(settings, "LLM_MODEL", "primary")
+    monkeypatch.setattr(settings, "LLM_FALLBACK_MODELS", ["fallback"])
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_DELAY", 5.0)
+    monkeypatch.setattr(settings, "LLM_REQUESTS_PER_MINUTE", 600)
+    # A fresh client for the new base URL, and full rate limit buckets.
+    llm_gateway.run(_reset_client())
+    models.Base.metadata.create_all(bind=database.engine)
+    with database.SessionLocal() as db:
+        db.query(models.RateLimitBucket).delete()
+        db.commit()
+    yield provider
+    provider.server.shutdown()
+    provider.server.server_close()
+    llm_gateway.run(_reset_client())
+
+
+async def _reset_client():
+    llm_gateway._client = None
+
+
+def test_server_errors_are_retried(provider):
+    provider.script["primary"] = [(500, {}), (503, {})]
+
+    assert complete("prompt", json.loads) == {"model": "primary"}
+    assert provider.models == ["primary"] * 3
+
+
+def test_retry_after_is_honoured(provider):
+    provider.script["primary"] = [(429, {"retry-after-ms": "300"})]
+
+    assert complete("prompt", json.loads) == {"model": "primary"}
+    (_, first), (_, second) = provider.requests
+    assert second - first >= 0.3
+
+
+def test_long_retry_after_falls_back_without_waiting(provider):
+    # The primary model is rate limited for a minute, longer than
+    # LLM_RETRY_MAX_DELAY: the fallback answers, without waiting for it.
+    provider.script["primary"] = [(429, {"Retry-After": "60"})]
+    started = time.monotonic()
+
+    assert complete("prompt", json.loads) == {"model": "fallback"}
+    assert provider.models == ["primary", "fallback"]
+    assert time.monotonic() - started < 5
+
+
+def test_unusable_output_falls_back(provider):
+    def parse(content: str) -> dict:
+        if json.loads(content)["model"] == "primary":
+            raise ValueError("unusable")
+        return json.loads(content)
+
+    assert complete("prompt", parse) == {"model": "fallback"}
+    assert provider.models == ["primary", "fallback"]
+
+
+def test_unavailable_when_every_model_fails(provider):
+    provider.script["primary"] = [(503, {})] * 3
+    provider.script["fallback"] = [(429, {"retry-after-ms": "10"})] * 3
+
+    with pytest.raises(LLMUnavailableError) as error:
+        complete("prompt", json.loads)
+
+    assert error.value.retry_after == pytest.approx(0.01)
+    assert provider.models == ["primary"] * 3 + ["fallback"] * 3
@@ -0,0 +1,43 @@
+# --- Imports ---
+import datetime
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from backend.database import models
+from backend.database.database import Base
+from backend.database.migrations import upgrade_schema
+
+# The schema of the first release, which stored dates as extracted text.
+OLD_SCHEMA = """
+CREATE TABLE statements (id INTEGER PRIMARY KEY, filename VARCHAR, account_holder VARCHAR, account_number VARCHAR,
+    period_start VARCHAR, period_end VARCHAR, beginning_balance FLOAT, ending_balance FLOAT, created_at DATETIME);
+CREATE TABLE transactions (id INTEGER PRIMARY KEY, date VARCHAR, description VARCHAR, debit FLOAT, credit FLOAT,
+    balance FLOAT, statement_id INTEGER REFERENCES statements(id));
+INSERT INTO statements VALUES (1, 'a.pdf', 'Jane', '123', '09/01/2025', 'mm/dd/yyyy', 100, 90, '2025-09-30 10:00:00');
+INSERT INTO transactions VALUES (1, '09/02/2025 11:59 AM', 'Coffee', 10, NULL, 90, 1);
+INSERT INTO transactions VALUES (2, 'mm/dd/yyyy', 'Unknown', NULL, NULL, NULL, 1);
+"""
+
+
+def test_old_database_is_upgraded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA.split(";"):
+            if statement.strip():
+                connection.execute(text(statement))
+
+    Base.metadata.create_all(bind=engine)
+    assert "transactions.date_text" in upgrade_schema(engine)
+    assert upgrade_schema(engine) == []
+
+    with Session(engine) as db:
+        statement = db.get(models.Statement, 1)
+        assert (statement.period_start, statement.period_end) == (datetime.date(2025, 9, 1), None)
+        assert statement.updated_at == statement.created_at
+        assert [(t.date, t.date_text) for t in db.query(models.Transaction).order_by(models.Transaction.id)] == [
+            (datetime.date(2025, 9, 2), "09/02/2025 11:59 AM"), (None, "mm/dd/yyyy"),
+        ]
+
+        statement.transactions.append(models.Transaction(date=datetime.date(2025, 9, 3), date_text="09/03/2025"))
+        db.commit()
+        assert db.query(models.Transaction).filter(models.Transaction.date >= datetime.date(2025, 9, 2)).count() == 2
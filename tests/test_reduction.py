@@ -0,0 +1,45 @@
+# --- Imports ---
+from backend.processing_pipeline.b_reduction import reduce_pages
+
+SMALL_PRINT = "This is a computer generated statement and does not require a signature."
+
+
+def _page(number: int, transactions: list[list[str]]) -> dict:
+    """A UPI/GPay-style page: one element per printed line, as unstructured returns them."""
+    elements = [
+        {"category": "Header", "text": f"Transaction Statement  Page {number} of 2"},
+        {"category": "Title", "text": "Google Pay"},
+    ]
+    for lines in transactions:
+        elements.extend({"category": "NarrativeText", "text": line} for line in lines)
+    elements.append({"category": "NarrativeText", "text": SMALL_PRINT})
+    return {"page": number, "text": "", "elements": elements}
+
+
+def test_recurring_merchants_and_amounts_are_kept():
+    swiggy = ["Paid to Swiggy", "₹250", "Paid by Axis Bank 9934"]
+    pages = [
+        _page(1, [["01 Mar, 2025", *swiggy], ["02 Mar, 2025", "Received from Ranjan Das", "₹1,000"]]),
+        _page(2, [["05 Mar, 2025", *swiggy], ["06 Mar, 2025", "Paid to Zomato", "₹250"]]),
+    ]
+
+    reduced, stats = reduce_pages(pages)
+    second = reduced[1]["text"].splitlines()
+
+    # The second Swiggy payment and the repeated amount survive in full.
+    assert second[:4] == ["05 Mar, 2025", "Paid to Swiggy", "₹250", "Paid by Axis Bank 9934"]
+    assert second.count("₹250") == 2
+    # The page furniture is kept once: header, title and the small print.
+    assert "Page 2 of 2" not in reduced[1]["text"]
+    assert "Google Pay" not in second
+    assert SMALL_PRINT in reduced[0]["text"] and SMALL_PRINT not in second
+    assert stats["dropped_elements"] == 3
+
+
+def test_short_repeated_lines_at_the_same_position_are_kept():
+    pages = [_page(number, [["01 Mar, 2025", "Paid to Swiggy", "₹250"]]) for number in (1, 2, 3)]
+
+    reduced, _ = reduce_pages(pages)
+
+    for page in reduced:
+        assert "Paid to Swiggy\n₹250" in page["text"]
@@ -0,0 +1,80 @@
+# --- Imports ---
+from backend.processing_pipeline.b_tables import extract_table_transactions
+
+
+def _table(rows: list[list[str]]) -> dict:
+    return {"category": "Table", "rows": rows, "text": "\n".join(" ".join(row) for row in rows)}
+
+
+def _pages(*tables_per_page: list[dict]) -> list[dict]:
+    return [
+        {"page": number, "text": "", "elements": tables}
+        for number, tables in enumerate(tables_per_page, start=1)
+    ]
+
+
+def test_currency_prefixes_and_trailing_minus():
+    pages = _pages([_table([
+        ["Date", "Narration", "Withdrawal", "Deposit", "Balance"],
+        ["01/03/2025", "Salary", "", "Rs. 1,200.00", "Rs. 1,700.00"],
+        ["02/03/2025", "Swiggy", "Rs.500", "", "₹1,200.00"],
+        ["03/03/2025", "Fee", "25.00", "", "25.00-"],
+    ])])
+
+    data, _ = extract_table_transactions(pages)
+
+    assert [(t["debit"], t["credit"], t["balance"]) for t in data["transactions"]] == [
+        (0.0, 1200.0, 1700.0), (500.0, 0.0, 1200.0), (25.0, 0.0, -25.0),
+    ]
+
+
+def test_unreadable_amounts_are_left_to_the_llm():
+    pages = _pages([_table([
+        ["Date", "Description", "Debit", "Credit", "Balance"],
+        ["01/03/2025", "Amazon", "1.200,00", "", "800.00"],
+        ["02/03/2025", "Tesco", "12.00", "", "788.00"],
+    ])])
+
+    data, remaining = extract_table_transactions(pages)
+
+    assert [t["description"] for t in data["transactions"]] == ["Tesco"]
+    assert "Amazon" in remaining[0]["text"]
+
+
+def test_unsigned_amount_column_is_left_to_the_llm():
+    pages = _pages([_table([
+        ["Date", "Description", "Amount"],
+        ["01/03/2025", "Amazon", "250.00"],
+        ["02/03/2025", "Refund", "-40.00"],
+    ])])
+
+    data, remaining = extract_table_transactions(pages)
+
+    # Only the signed amount says which way the money went.
+    assert [(t["description"], t["debit"]) for t in data["transactions"]] == [("Refund", 40.0)]
+    assert "Amazon" in remaining[0]["text"]
+
+
+def test_headerless_tables_only_continue_the_previous_page():
+    header = ["Date", "Description", "Debit", "Credit", "Balance"]
+    pages = _pages(
+        [_table([header, ["01/03/2025", "Tesco", "10.00", "", "90.00"]])],
+        [_table([["02/03/2025", "Aldi", "5.00", "", "85.00"]]), _table([["Fees", "A", "B", "C", "D"]])],
+        [],
+        [_table([["03/03/2025", "Shell", "1.00", "", "84.00"]])],
+    )
+
+    data, _ = extract_table_transactions(pages)
+
+    assert [t["description"] for t in data["transactions"]] == ["Tesco", "Aldi"]
+
+
+def test_description_column_wins_over_reference():
+    pages = _pages([_table([
+        ["Date", "Reference", "Description", "Debit", "Credit", "Balance"],
+        ["01/03/2025", "TXN-0001", "Tesco Stores", "12.00", "", "988.00"],
+    ])])
+
+    data, _ = extract_table_transactions(pages)
+
+    assert [t["description"] for t in data["transactions"]] == ["Tesco Stores"]
@@ -0,0 +1,95 @@
+# --- Imports ---
+import io
+import hashlib
+import zipfile
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from backend.utils import file_handler
+from backend.utils.file_handler import UploadTooLargeError, receive_uploads, save_zip_members
+
+MAX_BYTES = 100_000
+
+app = FastAPI()
+
+
+@app.post("/upload")
+async def upload(request: Request):
+    try:
+        uploads = await receive_uploads(request, max_bytes=MAX_BYTES, max_files=2)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [upload._asdict() for upload in uploads]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # temp_uploads/ is relative to the working directory.
+    monkeypatch.chdir(tmp_path)
+    return TestClient(app)
+
+
+def _left_behind() -> list[str]:
+    return sorted(path.name for path in file_handler.TEMP_DIR.iterdir()) if file_handler.TEMP_DIR.exists() else []
+
+
+def test_files_are_saved_and_hashed_and_other_fields_ignored(client):
+    content = b"%PDF-1.7 " + bytes(range(256)) * 200
+    response = client.post(
+        "/upload", data={"note": "hello"},
+        files=[("file", ("statement.pdf", content, "application/pdf")), ("file", ("page.png", b"png", "image/png"))],
+    )
+
+    assert response.status_code == 200
+    first, second = response.json()
+    assert (first["field"], first["filename"], first["content_type"]) == ("file", "statement.pdf", "application/pdf")
+    assert first["sha256"] == hashlib.sha256(content).hexdigest()
+    assert open(first["path"], "rb").read() == content
+    assert second["path"].endswith(".png")
+    assert len(_left_behind()) == 2
+
+
+def test_file_over_the_limit_is_rejected_while_streaming(client):
+    # Small enough for the Content-Length check, so the copy has to stop it.
+    response = client.post("/upload", files={"file": ("big.pdf", b"x" * (MAX_BYTES + 1))})
+
+    assert response.status_code == 413
+    assert _left_behind() == []
+
+
+def test_too_many_files_are_rejected(client):
+    response = client.post("/upload", files=[("file", (f"{i}.pdf", b"%PDF")) for i in range(3)])
+
+    assert response.status_code == 400
+    assert "At most 2" in response.json()["detail"]
+    assert _left_behind() == []
+
+
+def test_truncated_body_leaves_nothing_behind(client):
+    body = (
+        b"--BND\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="a.pdf"\r\n'
+        b"Content-Type: application/pdf\r\n\r\n" + b"x" * 5000
+    )
+    response = client.post("/upload", content=body, headers={"Content-Type": "multipart/form-data; boundary=BND"})
+
+    assert response.status_code == 400
+    assert _left_behind() == []
+
+
+def test_zip_members_are_hashed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("statements/a.pdf", b"first")
+        zf.writestr("notes.txt", b"skipped")
+        zf.writestr("__MACOSX/._a.pdf", b"skipped")
+
+    [(name, path, sha256)] = save_zip_members(archive, max_files=5)
+
+    assert name == "statements/a.pdf"
+    assert open(path, "rb").read() == b"first"
+    assert sha256 == hashlib.sha256(b"first").hexdigest()
@@ -0,0 +1,71 @@
+# --- Imports ---
+from backend.core.columnar import TransactionBatch
+from backend.processing_pipeline.c_validation import reconcile_transactions
+
+
+def _batch(*rows: tuple) -> TransactionBatch:
+    """Rows are (date, description, debit, credit, balance); a balance of 0 means none was printed."""
+    return TransactionBatch.from_transactions([
+        {"date": date, "description": description, "debit": debit, "credit": credit, "balance": balance}
+        for date, description, debit, credit, balance in rows
+    ])
+
+
+def test_one_balance_per_day():
+    batch = _batch(
+        ("01/03/2025", "Tesco", 10.00, 0, 0),
+        ("01/03/2025", "Shell", 20.00, 0, 970.00),
+        ("01/04/2025", "Salary", 0, 50.00, 1020.00),
+    )
+
+    result = reconcile_transactions(batch, opening=100000)
+
+    assert result["has_balances"]
+    assert result["first_divergent_row"] is None
+    assert result["balance_ok"] == result["step_ok"] == [True, True, True]
+
+
+def test_swapped_digits_are_flagged():
+    # 21.34 was paid, but read as 12.34; the printed balance is right.
+    batch = _batch(
+        ("01/03/2025", "Tesco", 12.34, 0, 978.66),
+        ("01/04/2025", "Shell", 10.00, 0, 968.66),
+    )
+
+    result = reconcile_transactions(batch, opening=100000)
+
+    assert result["first_divergent_row"] == 0
+    assert result["step_ok"] == [False, True]
+    assert result["possible_digit_swap"] == [True, False]
+
+
+def test_missing_digit_is_not_a_swap():
+    # 10,000.00 was paid, but read as 1,000.00.
+    batch = _batch(("01/03/2025", "Rent", 1000.00, 0, 10000.00))
+
+    result = reconcile_transactions(batch, opening=2000000)
+
+    assert result["step_ok"] == [False]
+    assert result["possible_digit_swap"] == [False]
+
+
+def test_repeated_rows_are_duplicates():
+    batch = _batch(
+        ("01/03/2025", "Coffee", 5.00, 0, 995.00),
+        ("01/03/2025", "Coffee", 5.00, 0, 995.00),
+        ("01/04/2025", "Refund", 5.00, 0, 990.00),
+    )
+
+    result = reconcile_transactions(batch, opening=100000)
+
+    assert result["duplicate"] == [False, True, False]
+    assert result["step_ok"] == [True, False, True]
+
+
+def test_empty_batch():
+    result = reconcile_transactions(_batch(), opening=100000)
+
+    assert result == {
+        "has_balances": False, "first_divergent_row": None,
+        "balance_ok": [], "step_ok": [], "possible_digit_swap": [], "duplicate": [],
+    }